@@ -0,0 +1,62 @@
+import json
+import re
+from typing import Any, Callable, List
+
+from fastapi import Request
+from fastapi.routing import APIRoute
+
+import json_codec
+
+
+class JSONBodyRequest(Request):
+    """Тело запроса разбирается один раз через json_codec.
+
+    FastAPI валидирует модель из request.json(), поэтому результат
+    кэшируется и тот же объект получают проверка CSRF и обработчик.
+    Исходные байты доступны через request.body().
+    """
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = json_codec.loads(await self.body())
+        return self._json
+
+
+class JSONBodyRoute(APIRoute):
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request):
+            return await handler(JSONBodyRequest(request.scope, request.receive))
+
+        return route_handler
+
+
+async def raw_body_text(request: Request) -> str:
+    # Исходное тело запроса для raw_payload, без повторной сериализации
+    return (await request.body()).decode("utf-8", errors="replace")
+
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r"[ \t\n\r]*")
+
+
+def split_json_array(text: str) -> List[str]:
+    """Исходный текст каждого элемента JSON-массива верхнего уровня.
+    ValueError, если text - не массив."""
+    index = _whitespace.match(text).end()
+    if text[index:index + 1] != "[":
+        raise ValueError("Expected JSON array")
+    index = _whitespace.match(text, index + 1).end()
+    items = []
+    if text[index:index + 1] == "]":
+        return items
+    while True:
+        _, end = _decoder.raw_decode(text, index)
+        items.append(text[index:end])
+        index = _whitespace.match(text, end).end()
+        if text[index:index + 1] == "]":
+            return items
+        if text[index:index + 1] != ",":
+            raise ValueError(f"Expected ',' or ']' at {index}")
+        index = _whitespace.match(text, index + 1).end()
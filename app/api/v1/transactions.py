@@ -0,0 +1,221 @@
+import logging
+from datetime import datetime
+from typing import List
+
+import asyncpg
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import JSONResponse
+
+from api.body import JSONBodyRoute, raw_body_text, split_json_array
+
+from database import transfers
+from database.ids import get_id_generator
+from database.session import async_db_pool
+from models.transaction import TransactionNew
+from producer import Kafka_audit_topic, Kafka_transaction_topic, send_kafka, send_kafka_batch
+from security import verify_token
+from settings import settings
+
+logger = logging.getLogger("bank_app")
+
+router = APIRouter(route_class=JSONBodyRoute)
+
+if settings.transfer_mode not in transfers.TRANSFER_MODES:
+    raise ValueError(f"Unknown TRANSFER_MODE: {settings.transfer_mode}")
+transfer_funds = transfers.TRANSFER_MODES[settings.transfer_mode]
+generate_transaction_id = get_id_generator(settings.transaction_id_generator)
+
+
+# Ответы на отказ в переводе по кодам из database/transfers.py
+TRANSFER_ERRORS = {
+    transfers.SENDER_NOT_FOUND: (404, "Пользователь не найден", "User not found: {user_id}"),
+    transfers.RECEIVER_NOT_FOUND: (400, "Получатель не найден", "Invalid merchant: {receiver_id}"),
+    transfers.INSUFFICIENT_FUNDS: (400, "Недостаточно средств", "Insufficient funds: {user_id}"),
+    transfers.RECEIVER_RESTRICTED: (
+        400, "Аккаунт получателя ограничен. Невозможно отправить деньги.",
+        "Попытка отправить деньги аккаунту ID {receiver_id} с ограниченными привилегиями"
+    ),
+    transfers.SENDER_RESTRICTED: (
+        400, "Ваш аккаунт ограничен. Свяжитесь со службой поддержки.",
+        "Пользователь с ограниченным аккаунтом ID {true_user_id} попытался отправить деньги"
+    ),
+    transfers.INVALID_AMOUNT: (400, "Сумма должна быть положительной", "Invalid amount from {user_id}"),
+    transfers.SELF_TRANSFER: (400, "Вы не можете перевести деньги самому себе", "Attempt to send money yourself"),
+}
+
+
+def transfer_error_response(status_code, balance, user_id, true_user_id, receiver_id) -> JSONResponse:
+    http_status, message, log_message = TRANSFER_ERRORS[status_code]
+    logger.warning(log_message.format(user_id=user_id, true_user_id=true_user_id, receiver_id=receiver_id))
+    content = {"error": message}
+    if status_code == transfers.INSUFFICIENT_FUNDS:
+        content["balance"] = float(balance)
+    return JSONResponse(status_code=http_status, content=content)
+
+
+def transaction_event(transaction_id, user_id, amount, source_ip, raw_payload) -> dict:
+    return {
+        "id": transaction_id,
+        "timestamp": datetime.utcnow().isoformat(),
+        "account_id": user_id,
+        "amount": amount,
+        "status": "SUCCESS",
+        "source_ip": source_ip,
+        "raw_payload": raw_payload
+    }
+
+
+@router.post("/api/transaction")
+async def send_transaction(tx: TransactionNew, request: Request, token_data: tuple[str, str] = Depends(verify_token),):
+    user_id, true_user_id = token_data
+    transaction_id = None
+    # Исходные байты тела уходят в raw_payload как есть
+    raw_payload = await raw_body_text(request)
+    if tx.amount <= 0:
+        logger.warning(f"Invalid amount from {user_id}: {tx.amount}")
+        return JSONResponse(
+            status_code=400,
+            content={"error": "Сумма должна быть положительной"}
+        )
+
+    if tx.receiver_id == true_user_id:
+        logger.warning(f"Attempt to send money yourself")
+        return JSONResponse(
+            status_code=400,
+            content={"error": "Вы не можете перевести деньги самому себе"}
+        )
+
+    # ID выдаётся до начала перевода (при конфликте ключа - новый на
+    # каждую попытку), поэтому событие об ошибке несёт ID последней попытки
+    def next_transaction_id():
+        nonlocal transaction_id
+        transaction_id = generate_transaction_id()
+        return transaction_id
+
+    # Событие о переводе пишется в outbox в транзакции перевода,
+    # в Kafka его отправляет outbox_relay.py
+    def make_event(tx_id):
+        return Kafka_transaction_topic, transaction_event(
+            tx_id, user_id, tx.amount, request.client.host, raw_payload
+        )
+
+    try:
+        async with async_db_pool.acquire() as conn:
+            transaction_id, status_code, new_balance = await transfers.run_transfer(
+                conn, transfer_funds, next_transaction_id,
+                true_user_id, tx.receiver_id, tx.amount, datetime.utcnow(),
+                max_retries=settings.transfer_max_retries,
+                backoff=settings.transfer_retry_backoff,
+                make_event=make_event
+            )
+
+        if status_code != transfers.TRANSFER_OK:
+            return transfer_error_response(status_code, new_balance, user_id, true_user_id, tx.receiver_id)
+
+        logger.info(f"Transaction {transaction_id} completed for {user_id}")
+
+        return JSONResponse(
+            status_code=200,
+            content={
+                "status": "success",
+                "transaction_id": transaction_id,
+                "new_balance": str(new_balance)
+            }
+        )
+
+    except asyncpg.PostgresError as db_error:
+        tx_data = transaction_event(transaction_id, user_id, tx.amount, request.client.host, raw_payload)
+        await send_kafka(Kafka_audit_topic, tx_data)
+        logger.error(f"Database error: {str(db_error)}")
+        return JSONResponse(
+            status_code=500,
+            content={"error": "Ошибка базы данных"}
+        )
+
+    except Exception as e:
+        tx_data = transaction_event(transaction_id, user_id, tx.amount, request.client.host, raw_payload)
+        await send_kafka(Kafka_audit_topic, tx_data)
+        logger.error(f"Unexpected error: {str(e)}", exc_info=True)
+        return JSONResponse(
+            status_code=500,
+            content={"error": "Внутренняя ошибка сервера"}
+        )
+
+
+@router.post("/api/transactions/batch")
+async def send_transactions_batch(txs: List[TransactionNew], request: Request, token_data: tuple[str, str] = Depends(verify_token),):
+    user_id, true_user_id = token_data
+    if not txs:
+        return JSONResponse(status_code=400, content={"error": "Пустой список переводов"})
+    if len(txs) > settings.batch_max_items:
+        logger.warning(f"Batch of {len(txs)} transfers from {user_id} exceeds limit")
+        return JSONResponse(
+            status_code=400,
+            content={"error": f"Не более {settings.batch_max_items} переводов в одном запросе"}
+        )
+
+    items = [(tx.receiver_id, tx.amount) for tx in txs]
+    # raw_payload каждого перевода - его исходный текст из тела запроса
+    raw_payloads = split_json_array(await raw_body_text(request))
+    # ID последней попытки по переводам - для событий об ошибке
+    attempt_ids: List[str] = []
+
+    def next_transaction_id():
+        if len(attempt_ids) == len(txs):
+            attempt_ids.clear()
+        attempt_ids.append(generate_transaction_id())
+        return attempt_ids[-1]
+
+    def make_event(index, tx_id):
+        return Kafka_transaction_topic, transaction_event(
+            tx_id, user_id, txs[index].amount, request.client.host, raw_payloads[index]
+        )
+
+    try:
+        async with async_db_pool.acquire() as conn:
+            transaction_ids, statuses, new_balance = await transfers.run_batch_transfer(
+                conn, next_transaction_id, true_user_id, items, datetime.utcnow(),
+                max_retries=settings.transfer_max_retries,
+                backoff=settings.transfer_retry_backoff,
+                make_event=make_event
+            )
+    except Exception as e:
+        events = [
+            transaction_event(tx_id, user_id, tx.amount, request.client.host, raw_payload)
+            for tx_id, tx, raw_payload in zip(
+                attempt_ids + [None] * (len(txs) - len(attempt_ids)), txs, raw_payloads
+            )
+        ]
+        await send_kafka_batch(Kafka_audit_topic, events)
+        logger.error(f"Batch transfer error: {str(e)}", exc_info=True)
+        is_db_error = isinstance(e, asyncpg.PostgresError)
+        return JSONResponse(
+            status_code=500,
+            content={"error": "Ошибка базы данных" if is_db_error else "Внутренняя ошибка сервера"}
+        )
+
+    if statuses and statuses[0] == transfers.SENDER_NOT_FOUND:
+        return transfer_error_response(statuses[0], None, user_id, true_user_id, None)
+
+    results = []
+    completed = 0
+    for index, (transaction_id, status_code) in enumerate(zip(transaction_ids, statuses)):
+        if status_code == transfers.TRANSFER_OK:
+            completed += 1
+            results.append({"index": index, "status": "success", "transaction_id": transaction_id})
+        else:
+            _, message, _ = TRANSFER_ERRORS[status_code]
+            results.append({"index": index, "status": "error", "error": message})
+
+    logger.info(f"Batch from {user_id}: {completed} of {len(txs)} transfers completed")
+
+    if completed == len(txs):
+        batch_status = "success"
+    elif completed:
+        batch_status = "partial"
+    else:
+        batch_status = "failed"
+    return JSONResponse(
+        status_code=200,
+        content={"status": batch_status, "results": results, "new_balance": str(new_balance)}
+    )
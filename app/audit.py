@@ -1,26 +1,44 @@
+import asyncio
 import os
 import secrets
+import time
 from urllib.parse import quote_plus
 import ipaddress
 from dotenv import load_dotenv
 import logging
 from typing import Optional, Tuple, List
 from datetime import datetime, timezone, timedelta
+from decimal import Decimal
 from fastapi import FastAPI, Request, Response, HTTPException, Depends, status, Form
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import RedirectResponse, HTMLResponse, JSONResponse
+from fastapi.responses import RedirectResponse, HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.middleware import Middleware
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi.encoders import jsonable_encoder
+from fastapi.concurrency import run_in_threadpool
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 import psycopg2
 from pydantic import BaseModel
 from pydantic_settings import BaseSettings
-from kafka import KafkaConsumer
 import json
 from pydantic import Field
+from contextlib import asynccontextmanager
+from passwords import PasswordQueueFull, password_verifier
+from database.pool import ConnectionPool
+from revocation import RevocationCache
+from user_cache import UserCache
+from rendering import create_templates, precompile, prerender
+from ip_allowlist import ReloadableAllowList
+from audit_middleware import CSRFMiddleware, IPAllowListMiddleware
+from api.body import JSONBodyRoute
+from audit_logs import AuditLogEntry, AuditLogQuery, fetch_page
+from audit_stats import AuditStatsQuery, fetch_stats
+from incident_feed import (
+    IncidentBroadcaster, IncidentBuffer, IncidentIngestor, create_incident_consumer, parse_event_id
+)
+from token_cache import TokenCache, create_backend
+from metrics import metrics
 
 
 # Настройка логгера
@@ -42,12 +60,35 @@ class Settings(BaseSettings):
     postgres_audit_db: str = Field(..., env="POSTGRES_AUDIT_DB")
     postgres_audit_user: str = Field(..., env="POSTGRES_AUDIT_USER")
     postgres_audit_password: str = Field(..., env="POSTGRES_AUDIT_PASSWORD")
+    audit_db_pool_min_size: int = Field(2, env="AUDIT_DB_POOL_MIN_SIZE")
+    audit_db_pool_max_size: int = Field(10, env="AUDIT_DB_POOL_MAX_SIZE")
+    # Сколько секунд роль пользователя берётся из кэша без обращения к БД
+    role_cache_ttl: float = Field(60.0, env="ROLE_CACHE_TTL")
 
     kafka_bootstrap_servers: str = Field("kafka:9092", env="KAFKA_BOOTSTRAP_SERVERS")
     kafka_topic: str = Field("incidents", env="KAFKA_TOPIC")
+    # Сколько последних инцидентов держать в памяти для /api/incidents
+    incident_buffer_size: int = Field(10000, env="INCIDENT_BUFFER_SIZE")
+    incident_poll_timeout_ms: int = Field(1000, env="INCIDENT_POLL_TIMEOUT_MS")
+    # Клиент потока /api/incidents/stream, отставший больше чем на столько
+    # инцидентов, отключается и переподключается с Last-Event-ID
+    incident_stream_max_lag: int = Field(1000, env="INCIDENT_STREAM_MAX_LAG")
+    incident_stream_keepalive: float = Field(15.0, env="INCIDENT_STREAM_KEEPALIVE")
+    # Страницы audit_logs сначала ищутся в последних часах до курсора,
+    # чтобы читать только свежие суточные секции
+    audit_logs_recent_window_hours: float = Field(24.0, env="AUDIT_LOGS_RECENT_WINDOW_HOURS")
+
+    jwt_backend: str = Field("jose", env="JWT_BACKEND")
+    jwt_cache_size: int = Field(10000, env="JWT_CACHE_SIZE")
+
+    templates_bytecode_cache_dir: str = Field("", env="TEMPLATES_BYTECODE_CACHE_DIR")
+    templates_auto_reload: bool = Field(False, env="TEMPLATES_AUTO_RELOAD")
 
     allowed_hosts: str = Field("127.0.0.1,localhost", env="ALLOWED_HOSTS")
     allowed_ips: str = Field("127.0.0.1,192.168.1.0/24", env="ALLOWED_IPS")
+    # Дополнительные сети по одной на строку, перечитываются без перезапуска
+    allowed_ips_file: str = Field("", env="ALLOWED_IPS_FILE")
+    allowed_ips_reload_interval: float = Field(5.0, env="ALLOWED_IPS_RELOAD_INTERVAL")
 
     class Config:
         env_file = ".env"
@@ -96,69 +137,88 @@ class CSRFProtect:
 csrf = CSRFProtect()
 
 
-class CSRFMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, csrf_protect: CSRFProtect):
-        super().__init__(app)
-        self.csrf_protect = csrf_protect
-
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-
-        if not request.cookies.get(self.csrf_protect.cookie_name):
-            token = self.csrf_protect.generate_token()
-            response.set_cookie(
-                key=self.csrf_protect.cookie_name,
-                value=token,
-                httponly=False,
-                samesite="strict",
-                secure=False,
-                path="/",
-                max_age=3600
-            )
+csrf_protect = CSRFProtect()
 
-        return response
+AUDIT_DB_DSN = (
+    f"dbname='{settings.postgres_audit_db}' user=audit_user password='{settings.postgres_audit_password}' host=localhost port=5431")
 
+audit_db_pool = ConnectionPool(
+    AUDIT_DB_DSN,
+    min_size=settings.audit_db_pool_min_size,
+    max_size=settings.audit_db_pool_max_size
+)
 
-csrf_protect = CSRFProtect()
+# Отозванные при выходе токены, обновляется через LISTEN/NOTIFY
+revocation_cache = RevocationCache(AUDIT_DB_DSN)
+
+
+def load_user(username: str) -> Optional[Tuple[str, str]]:
+    with audit_db_pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT name_surname, role FROM users WHERE username = %s", (username,))
+            return cur.fetchone()
+
+
+# (name_surname, role) по username, сбрасывается по NOTIFY users_changed
+user_cache = UserCache(load_user, ttl=settings.role_cache_ttl, dsn=AUDIT_DB_DSN, name="role_cache")
 
 
-app = FastAPI(middleware=[
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    audit_db_pool.open()
+    revocation_cache.start()
+    user_cache.start()
+    incident_broadcaster.bind(asyncio.get_running_loop())
+    incident_ingestor.start()
+    precompile(templates)
+    yield
+    incident_ingestor.stop()
+    user_cache.stop()
+    revocation_cache.stop()
+    audit_db_pool.close()
+
+
+# Сети компилируются один раз, файл ALLOWED_IPS_FILE перечитывается при изменении
+ip_allow_list = ReloadableAllowList(
+    settings.allowed_ips, settings.allowed_ips_file, settings.allowed_ips_reload_interval
+)
+
+
+# Проверка IP - внешняя, до неё запрос не доходит ни до чего другого
+app = FastAPI(lifespan=lifespan, middleware=[
+    Middleware(IPAllowListMiddleware, allow_list=ip_allow_list, logger=logger),
     Middleware(CSRFMiddleware, csrf_protect=csrf_protect)
 ])
+# Тело запроса разбирается один раз: его же получают LoginPass и проверка CSRF
+app.router.route_class = JSONBodyRoute
 
 
 SECRET_KEY = settings.secret_key
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 20
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-# Подключение к Kafka
-try:
-    kafka_consumer = KafkaConsumer(
-        settings.kafka_topic,
-        bootstrap_servers=settings.kafka_bootstrap_servers.split(","),
-        value_deserializer=lambda x: json.loads(x.decode('utf-8')),
-        auto_offset_reset='earliest',
-        enable_auto_commit=False,
-        consumer_timeout_ms=1000
-    )
-except Exception as e:
-    logger.error(f"Failed to connect to Kafka: {e}")
-    raise
-
-
-def get_db_connection():
-    try:
-        conn_str = (
-            f"dbname='{settings.postgres_audit_db}' user=audit_user password='{settings.postgres_audit_password}' host=localhost port=5431")
-        conn = psycopg2.connect(conn_str)
-        #conn = psycopg2.connect("dbname=audit_db port=5431 host=localhost user=audit_user password=audit_password")
-        conn.autocommit = False
-        return conn
-    except Exception as e:
-        logger.error(f"Database connection failed: {e}")
-        raise
+token_cache = TokenCache(
+    create_backend(settings.jwt_backend, SECRET_KEY, ALGORITHM),
+    max_size=settings.jwt_cache_size
+)
+
+AUDIT_LOGS_RECENT_WINDOW = timedelta(hours=settings.audit_logs_recent_window_hours)
+
+# Лента инцидентов: один фоновый consumer на процесс, чтение из памяти
+incident_buffer = IncidentBuffer(settings.incident_buffer_size)
+incident_broadcaster = IncidentBroadcaster(
+    incident_buffer,
+    max_lag=settings.incident_stream_max_lag,
+    keepalive=settings.incident_stream_keepalive
+)
+incident_ingestor = IncidentIngestor(
+    incident_buffer,
+    settings.kafka_topic,
+    lambda: create_incident_consumer(settings.kafka_bootstrap_servers),
+    poll_timeout_ms=settings.incident_poll_timeout_ms,
+    on_ingest=incident_broadcaster.notify
+)
 
 
 class LoginPass(BaseModel):
@@ -166,15 +226,8 @@ class LoginPass(BaseModel):
     password: str
 
 
-class Incident(BaseModel):
-    id: str
-    timestamp: datetime
-    severity: str
-    description: str
-    status: str
-
-
-templates = Jinja2Templates(directory="audit_templates")
+templates = create_templates("audit_templates", settings.templates_bytecode_cache_dir, settings.templates_auto_reload)
+NOT_ENOUGH_PRIVILEGES_PAGE = prerender(templates, "not_enough_privileges.html")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 
@@ -204,7 +257,9 @@ async def verify_origin(request: Request):
             )
 
 
-async def verify_token(request: Request) -> Tuple[str, str, str]:
+# Синхронная: FastAPI выполняет её в пуле потоков, поэтому ожидание
+# соединения из audit_db_pool и запрос load_user не блокируют event loop
+def verify_token(request: Request) -> Tuple[str, str, str]:
     token = request.cookies.get("session_id")
     if not token:
         raise HTTPException(
@@ -213,18 +268,19 @@ async def verify_token(request: Request) -> Tuple[str, str, str]:
         )
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = token_cache.decode(token)
         user_id: str = payload.get("userid")
         true_user_id: str = payload.get("true_userid")
 
         if not user_id:
             raise JWTError()
+        if revocation_cache.is_revoked(payload.get("jti")):
+            raise JWTError("Token revoked")
 
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT role FROM users WHERE username = %s", (user_id,))
-                role = cur.fetchone()[0]
-                return user_id, true_user_id, role
+        user = user_cache.get(user_id)
+        if user is None:
+            raise JWTError("Unknown user")
+        return user_id, true_user_id, user[1]
 
     except Exception as e:
         logger.error(f"Token verification failed: {e}")
@@ -234,30 +290,16 @@ async def verify_token(request: Request) -> Tuple[str, str, str]:
         )
 
 
-# Middleware для проверки IP
-@app.middleware("http")
-async def check_local_network(request: Request, call_next):
-    client_ip = request.client.host
-    allowed_networks = settings.allowed_ips.split(",")
-
-    try:
-        if not any(
-                ipaddress.ip_address(client_ip) in ipaddress.ip_network(net)
-                for net in allowed_networks
-        ):
-            logger.warning(f"Blocked non-local access attempt from {client_ip}")
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Access denied"
-            )
-    except ValueError as e:
-        logger.error(f"Invalid IP address: {client_ip} - {e}")
+def require_auditor(user_data: Tuple[str, str, str] = Depends(verify_token)) -> Tuple[str, str, str]:
+    """Как verify_token, но только для роли auditor (роль - из user_cache)."""
+    user_id, true_user_id, role = user_data
+    if role != "auditor":
+        logger.warning(f"Non-auditor {user_id} tried to access audit data")
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="Invalid client IP"
+            detail="Not enough privileges"
         )
-
-    return await call_next(request)
+    return user_data
 
 
 # Роуты
@@ -266,6 +308,11 @@ async def root():
     return RedirectResponse("/home")
 
 
+@app.get("/metrics")
+def read_metrics():
+    return metrics.snapshot()
+
+
 @app.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request, response: Response):
     if request.cookies.get("session_id"):
@@ -290,6 +337,67 @@ async def login_page(request: Request, response: Response):
     return response
 
 
+def read_login_state(login: str, attempts_since: datetime):
+    """Строка users (hashed_password, user_id, role) и счётчик неудачных
+    попыток входа после attempts_since."""
+    with audit_db_pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT hashed_password, user_id, role FROM users WHERE username = %s",
+                (login,)
+            )
+            user_data = cur.fetchone()
+            if not user_data:
+                return None, None
+            cur.execute(
+                """SELECT attempt_value FROM bruteforce_protect 
+                WHERE user_id = %s AND last_attempt > %s""",
+                (user_data[1], attempts_since)
+            )
+            return user_data, cur.fetchone()
+
+
+def record_failed_login(true_user_id: str, now: datetime, has_attempts: bool):
+    with audit_db_pool.connection() as conn:
+        with conn.cursor() as cur:
+            if has_attempts:
+                cur.execute(
+                    """UPDATE bruteforce_protect 
+                    SET attempt_value = attempt_value + 1, last_attempt = %s 
+                    WHERE user_id = %s""",
+                    (now, true_user_id)
+                )
+            else:
+                cur.execute(
+                    """INSERT INTO bruteforce_protect 
+                    (user_id, last_attempt, attempt_value) 
+                    VALUES (%s, %s, 1)""",
+                    (true_user_id, now)
+                )
+        conn.commit()
+
+
+def open_session(login: str, true_user_id: str, token: str, expires_at: datetime, new_hash: Optional[str]):
+    with audit_db_pool.connection() as conn:
+        with conn.cursor() as cur:
+            if new_hash:
+                cur.execute(
+                    "UPDATE users SET hashed_password = %s WHERE user_id = %s",
+                    (new_hash, true_user_id)
+                )
+            cur.execute(
+                "DELETE FROM bruteforce_protect WHERE user_id = %s",
+                (true_user_id,)
+            )
+            cur.execute(
+                """INSERT INTO active_session 
+                (userid, token, expires_at) 
+                VALUES (%s, %s, %s)""",
+                (login, token, expires_at)
+            )
+        conn.commit()
+
+
 @app.post("/api/login")
 async def login(
         request: Request, auth: LoginPass):
@@ -305,110 +413,83 @@ async def login(
 
         now = datetime.now(timezone.utc)
 
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                # Проверка учетных данных
-                cur.execute(
-                    "SELECT hashed_password, user_id, role FROM users WHERE username = %s",
-                    (auth.login,)
-                )
-                user_data = cur.fetchone()
+        # Соединение из пула не удерживается на время bcrypt: иначе при
+        # max_size одновременных входов следующий ждёт его на event loop
+        user_data, brute_data = await run_in_threadpool(
+            read_login_state, auth.login, now - timedelta(minutes=20)
+        )
+        if not user_data:
+            return RedirectResponse(
+                "/login?error=invalid_credentials",
+                status_code=status.HTTP_303_SEE_OTHER
+            )
 
-                if not user_data:
-                    return RedirectResponse(
-                        "/login?error=invalid_credentials",
-                        status_code=status.HTTP_303_SEE_OTHER
-                    )
+        stored_hash, true_user_id, role = user_data
 
-                stored_hash, true_user_id, role = user_data
+        # Проверка защиты от брутфорса
+        if brute_data and brute_data[0] >= 5:
+            return RedirectResponse(
+                "/login?error=too_many_attempts",
+                status_code=status.HTTP_303_SEE_OTHER
+            )
 
-                # Проверка защиты от брутфорса
-                cur.execute(
-                    """SELECT attempt_value FROM bruteforce_protect 
-                    WHERE user_id = %s AND last_attempt > %s""",
-                    (true_user_id, now - timedelta(minutes=20))
-                )
-                brute_data = cur.fetchone()
-
-                if brute_data and brute_data[0] >= 5:
-                    return RedirectResponse(
-                        "/login?error=too_many_attempts",
-                        status_code=status.HTTP_303_SEE_OTHER
-                    )
-
-
-                if not pwd_context.verify(auth.password, stored_hash):
-                    if brute_data:
-                        cur.execute(
-                            """UPDATE bruteforce_protect 
-                            SET attempt_value = attempt_value + 1, last_attempt = %s 
-                            WHERE user_id = %s""",
-                            (now, true_user_id)
-                        )
-                    else:
-                        cur.execute(
-                            """INSERT INTO bruteforce_protect 
-                            (user_id, last_attempt, attempt_value) 
-                            VALUES (%s, %s, 1)""",
-                            (true_user_id, now)
-                        )
-                    conn.commit()
-                    return RedirectResponse(
-                        "/login?error=invalid_credentials",
-                        status_code=status.HTTP_303_SEE_OTHER
-                    )
-
-
-                expires_at = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-                token = create_access_token({
-                    "userid": auth.login,
-                    "true_userid": true_user_id,
-                    "exp": expires_at
-                })
 
+        # bcrypt выполняется в отдельном пуле и не блокирует event loop
+        try:
+            password_ok, new_hash = await password_verifier.verify_and_update(auth.password, stored_hash)
+        except PasswordQueueFull:
+            logger.warning(f"Login rejected, password verification queue is full: {auth.login}")
+            return JSONResponse(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content={"detail": "Service overloaded, try again later"},
+                headers={"Retry-After": "1"}
+            )
 
-                cur.execute(
-                    "DELETE FROM bruteforce_protect WHERE user_id = %s",
-                    (true_user_id,)
-                )
+        if not password_ok:
+            await run_in_threadpool(record_failed_login, true_user_id, now, brute_data is not None)
+            return RedirectResponse(
+                "/login?error=invalid_credentials",
+                status_code=status.HTTP_303_SEE_OTHER
+            )
 
 
-                cur.execute(
-                    """INSERT INTO active_session 
-                    (userid, token, expires_at) 
-                    VALUES (%s, %s, %s)""",
-                    (auth.login, token, expires_at)
-                )
-                conn.commit()
+        expires_at = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        token = create_access_token({
+            "userid": auth.login,
+            "true_userid": true_user_id,
+            "exp": expires_at,
+            "jti": secrets.token_urlsafe(16)
+        })
+        await run_in_threadpool(open_session, auth.login, true_user_id, token, expires_at, new_hash)
 
 
-                response = RedirectResponse(
-                    "/home",
-                    status_code=status.HTTP_303_SEE_OTHER
-                )
-                response.set_cookie(
-                    key="session_id",
-                    value=token,
-                    httponly=True,
-                    max_age=1200,
-                    samesite="strict",
-                    secure=False,
-                    path="/"
-                )
+        response = RedirectResponse(
+            "/home",
+            status_code=status.HTTP_303_SEE_OTHER
+        )
+        response.set_cookie(
+            key="session_id",
+            value=token,
+            httponly=True,
+            max_age=1200,
+            samesite="strict",
+            secure=False,
+            path="/"
+        )
 
-                # Установка нового CSRF токена
-                csrf_token = csrf_protect.generate_token()
-                response.set_cookie(
-                    key=csrf_protect.cookie_name,
-                    value=csrf_token,
-                    httponly=False,
-                    samesite="strict",
-                    secure=False,
-                    path="/",
-                    max_age=3600
-                )
+        # Установка нового CSRF токена
+        csrf_token = csrf_protect.generate_token()
+        response.set_cookie(
+            key=csrf_protect.cookie_name,
+            value=csrf_token,
+            httponly=False,
+            samesite="strict",
+            secure=False,
+            path="/",
+            max_age=3600
+        )
 
-                return response
+        return response
 
     except Exception as e:
         logger.error(f"Login error: {e}")
@@ -419,38 +500,22 @@ async def login(
 
 
 @app.get("/home", response_class=HTMLResponse)
-async def home_page(
+def home_page(
         request: Request,
         user_data: Tuple[str, str, str] = Depends(verify_token)
 ):
     user_id, true_user_id, role = user_data
-
-    with get_db_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                "SELECT username, name_surname, role FROM users WHERE username = %s",
-                (user_id,)
-            )
-            username, name_surname, role = cur.fetchone()
+    user = user_cache.get(user_id)
+    if user is None:
+        # Пользователь удалён после проверки токена
+        return RedirectResponse("/login", status_code=status.HTTP_303_SEE_OTHER)
+    name_surname, role = user
     #Получение инцидентов из бд аудита
-    incidents: List[Incident] = []
+    incidents: List[AuditLogEntry] = []
     try:
-        with get_db_connection() as conn:
+        with audit_db_pool.connection() as conn:
             with conn.cursor() as cur:
-                cur.execute("""
-                SELECT id, timestamp, account_id, amount, status, source_ip, raw_payload
-                FROM audit_logs
-                ORDER BY timestamp DESC
-                LIMIT %s
-                """,(20,))
-                for record in cur:
-                    incidents.append(Incident(
-                        id=record[0],
-                        timestamp=record[1],
-                        severity=record[2],
-                        description=record[3],
-                        status=record[4]
-                    ))
+                incidents, _ = fetch_page(cur, AuditLogQuery(limit=20), AUDIT_LOGS_RECENT_WINDOW)
     except Exception as e:
         logger.error(f"Failed to fetch incidents from DB: {e}")
     return templates.TemplateResponse(
@@ -492,18 +557,22 @@ async def home_page(
 
 
 @app.post("/api/logout")
-async def logout(
+def logout(
         request: Request,
         user_data: Tuple[str, str, str] = Depends(verify_token)
 ):
     token = request.cookies.get("session_id")
     if token:
-        with get_db_connection() as conn:
+        with audit_db_pool.connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "DELETE FROM active_session WHERE token = %s",
                     (token,)
                 )
+                token_cache.evict(token)
+                claims = jwt.get_unverified_claims(token)
+                if claims.get("jti"):
+                    revocation_cache.revoke(conn, claims["jti"], datetime.utcfromtimestamp(claims["exp"]))
                 conn.commit()
 
     response = RedirectResponse(
@@ -523,10 +592,7 @@ async def audit_page(
     user_id, true_user_id, role = user_data
 
     if role != "auditor":
-        return templates.TemplateResponse(
-            "not_enough_privileges.html",
-            {"request": request}
-        )
+        return HTMLResponse(NOT_ENOUGH_PRIVILEGES_PAGE)
 
     return templates.TemplateResponse(
         "audit.html",
@@ -542,19 +608,163 @@ async def get_incidents(
         request: Request,
         user_data: Tuple[str, str, str] = Depends(verify_token)
 ):
+    """Инциденты из памяти. Без since - последние limit, с since - начиная
+    с этого offset; next_offset и epoch передаются в since и epoch
+    следующего запроса. Курсор другой эпохи (буфер перезапущен) не
+    читается: ответ - последние limit с reset = true."""
+    await verify_origin(request)
+    await csrf_protect.validate_request(request)
+
+    body = await request.json()
+    limit = body.get("limit", 20)
+    since = body.get("since")
+    epoch = body.get("epoch")
+    if (
+        not isinstance(limit, int) or not 0 < limit <= 1000
+        or not (since is None or isinstance(since, int))
+        or not (epoch is None or isinstance(epoch, str))
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid since, epoch or limit"
+        )
+
+    reset = since is not None and epoch != incident_buffer.epoch
+    if since is None or reset:
+        incidents, next_offset = incident_buffer.latest(limit)
+    else:
+        incidents, next_offset = incident_buffer.since(since, limit)
+    return JSONResponse(content={
+        "incidents": incidents,
+        "epoch": incident_buffer.epoch,
+        "reset": reset,
+        "first_offset": incident_buffer.first_offset,
+        "next_offset": next_offset
+    })
+
+
+def read_audit_logs(query: AuditLogQuery):
+    with audit_db_pool.connection() as conn:
+        with conn.cursor() as cur:
+            return fetch_page(cur, query, AUDIT_LOGS_RECENT_WINDOW)
+
+
+def read_audit_stats(query: AuditStatsQuery):
+    with audit_db_pool.connection() as conn:
+        with conn.cursor() as cur:
+            return fetch_stats(cur, query)
+
+
+@app.post("/api/audit_logs")
+async def get_audit_logs(
+        request: Request,
+        query: AuditLogQuery,
+        user_data: Tuple[str, str, str] = Depends(require_auditor)
+):
+    """Записи audit_logs, новые первыми, с фильтрами. next_cursor
+    передаётся в cursor следующего запроса, null - страниц больше нет."""
+    await verify_origin(request)
+    await csrf_protect.validate_request(request)
+
+    try:
+        entries, next_cursor = await run_in_threadpool(read_audit_logs, query)
+    except ValueError as e:
+        logger.warning(f"Invalid audit log query: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    except Exception as e:
+        logger.error(f"Failed to fetch audit logs from DB: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+    return JSONResponse(content={
+        # Суммы - строками, без потери точности NUMERIC
+        "items": jsonable_encoder(entries, custom_encoder={Decimal: str}),
+        "next_cursor": next_cursor
+    })
+
+
+@app.post("/api/audit_stats")
+async def get_audit_stats(
+        request: Request,
+        query: AuditStatsQuery,
+        user_data: Tuple[str, str, str] = Depends(require_auditor)
+):
+    """Число событий и сумма по status, account_id или source_ip за
+    окно, по минутам, часам или суткам. Читает только агрегаты."""
     await verify_origin(request)
     await csrf_protect.validate_request(request)
 
-    incidents = []
     try:
-        for _ in range(20):
-            msg = next(kafka_consumer)
-            if msg:
-                incidents.append(msg.value)
-    except StopIteration:
-        pass
-
-    return JSONResponse(content=incidents)
+        series = await run_in_threadpool(read_audit_stats, query)
+    except ValueError as e:
+        logger.warning(f"Invalid audit stats query: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid stats window"
+        )
+    except Exception as e:
+        logger.error(f"Failed to fetch audit stats from DB: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+    return JSONResponse(content={
+        "dimension": query.dimension,
+        "granularity": query.granularity,
+        "series": series
+    })
+
+
+@app.get("/api/incidents/stream")
+async def stream_incidents(
+        request: Request,
+        user_data: Tuple[str, str, str] = Depends(require_auditor)
+):
+    """Новые инциденты через Server-Sent Events. id события - "epoch:offset"
+    в буфере, EventSource присылает его в Last-Event-ID при переподключении.
+    Поток закрывается, как только сессия отозвана (логаут) или истекла,
+    или пользователь перестал быть аудитором."""
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id is not None:
+        try:
+            last_event_id = parse_event_id(last_event_id)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid Last-Event-ID"
+            )
+
+    # Токен уже проверен в verify_token
+    claims = jwt.get_unverified_claims(request.cookies.get("session_id"))
+    jti, expires_at = claims.get("jti"), claims.get("exp")
+    user_id = user_data[0]
+    role_checked_at = time.monotonic()
+
+    async def session_active() -> bool:
+        nonlocal role_checked_at
+        if expires_at is not None and expires_at <= datetime.now(timezone.utc).timestamp():
+            return False
+        if revocation_cache.is_revoked(jti):
+            return False
+        # Роль - не чаще раза за keepalive: промах user_cache идёт в БД
+        now = time.monotonic()
+        if now - role_checked_at >= settings.incident_stream_keepalive:
+            role_checked_at = now
+            user = await run_in_threadpool(user_cache.get, user_id)
+            if user is None or user[1] != "auditor":
+                logger.warning(f"Closing incident stream of {user_id}: no longer an auditor")
+                return False
+        return True
+
+    return StreamingResponse(
+        incident_broadcaster.stream(last_event_id, session_active),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,173 @@
+"""Загрузка событий в audit_logs через COPY ... FROM STDIN.
+
+События копятся в CSV-буфере в памяти и уходят в БД одним COPY, когда
+набирается max_rows строк, max_bytes байт или проходит max_interval
+секунд с первой строки в буфере. Промежуточных файлов нет. Агрегаты
+событий (audit_consumer/rollups.py) пишутся в той же транзакции.
+
+CLI догружает audit_logs из диапазона offset'ов одной партиции топика,
+например после простоя консьюмера. Запуск из каталога app/:
+
+    python -m audit_consumer.copy_loader --partition 0 --start-offset 0 --end-offset 500000
+"""
+import argparse
+import io
+import logging
+import time
+from typing import List
+
+from kafka import KafkaConsumer
+from kafka.structs import TopicPartition
+
+from audit_consumer.rollups import RollupAccumulator
+from audit_consumer.start_consumer import decode_event, event_row, get_db_connection
+from settings import settings
+
+logger = logging.getLogger("audit_consumer")
+
+COPY_AUDIT_LOGS = """
+    COPY audit_logs
+    (tx_id, account_id, receiver_id, amount, status, timestamp, source_ip, raw_payload)
+    FROM STDIN WITH (FORMAT csv)
+"""
+
+
+def csv_field(value) -> str:
+    # В CSV-режиме COPY NULL - пустое поле без кавычек, поэтому все
+    # значения берутся в кавычки и пустая строка остаётся пустой строкой
+    if value is None:
+        return ""
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+class AuditCopyLoader:
+    def __init__(self, conn, max_rows: int = 10000, max_bytes: int = 8 * 1024 * 1024, max_interval: float = 1.0):
+        self.conn = conn
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_interval = max_interval
+        self.rows_loaded = 0
+        self.seconds_loading = 0.0
+        self._rollups = RollupAccumulator()
+        self._reset()
+
+    def _reset(self):
+        self._buffer = io.StringIO()
+        self._rows = 0
+        self._first_row_at = None
+        self._rollups.clear()
+
+    def extend(self, events: List[dict]):
+        # Без проверки порогов: пачка уходит одним COPY при flush()
+        for event in events:
+            self._buffer.write(",".join(map(csv_field, event_row(event))) + "\n")
+        self._rollups.extend(events)
+        self._rows += len(events)
+        if self._first_row_at is None:
+            self._first_row_at = time.monotonic()
+
+    def add(self, event: dict) -> bool:
+        """Добавляет событие в буфер, возвращает True, если буфер был сброшен."""
+        self.extend([event])
+        if self.should_flush():
+            self.flush()
+            return True
+        return False
+
+    def should_flush(self) -> bool:
+        if not self._rows:
+            return False
+        return (
+            self._rows >= self.max_rows
+            or self._buffer.tell() >= self.max_bytes
+            or time.monotonic() - self._first_row_at >= self.max_interval
+        )
+
+    def flush(self) -> int:
+        rows = self._rows
+        if not rows:
+            return 0
+        started = time.perf_counter()
+        self._buffer.seek(0)
+        with self.conn:
+            with self.conn.cursor() as cur:
+                cur.copy_expert(COPY_AUDIT_LOGS, self._buffer)
+                self._rollups.save(cur)
+        self.seconds_loading += time.perf_counter() - started
+        self.rows_loaded += rows
+        self._reset()
+        return rows
+
+    @property
+    def pending(self) -> int:
+        return self._rows
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_loaded / self.seconds_loading if self.seconds_loading else 0.0
+
+
+def copy_to_audit_db(conn, events: List[dict]):
+    # Пачка консьюмера одним COPY вместо INSERT (AUDIT_CONSUMER_WRITE_MODE=copy)
+    loader = AuditCopyLoader(conn)
+    loader.extend(events)
+    loader.flush()
+
+
+def backfill(topic: str, partition: int, start_offset: int, end_offset: int = None,
+             max_rows: int = 10000, max_interval: float = 1.0) -> int:
+    consumer = KafkaConsumer(
+        bootstrap_servers=settings.kafka_bootstrap_servers.split(","),
+        enable_auto_commit=False,
+        consumer_timeout_ms=10000
+    )
+    tp = TopicPartition(topic, partition)
+    consumer.assign([tp])
+    if end_offset is None:
+        end_offset = consumer.end_offsets([tp])[tp]
+    if start_offset >= end_offset:
+        consumer.close()
+        logger.info(f"Nothing to backfill in {topic}[{partition}] {start_offset}..{end_offset}")
+        return 0
+    consumer.seek(tp, start_offset)
+
+    conn = get_db_connection()
+    loader = AuditCopyLoader(conn, max_rows=max_rows, max_interval=max_interval)
+    started = time.perf_counter()
+    skipped = 0
+    try:
+        for message in consumer:
+            if message.offset >= end_offset:
+                break
+            event = decode_event(message.value)
+            if event is None:
+                skipped += 1
+            elif loader.add(event):
+                elapsed = time.perf_counter() - started
+                logger.info(f"offset {message.offset}: {loader.rows_loaded} rows, "
+                            f"{loader.rows_loaded / elapsed:.0f} rows/s")
+            if message.offset == end_offset - 1:
+                break
+        loader.flush()
+    finally:
+        consumer.close()
+        conn.close()
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Backfill {topic}[{partition}] {start_offset}..{end_offset}: "
+                f"{loader.rows_loaded} rows in {elapsed:.2f}s ({loader.rows_loaded / elapsed if elapsed else 0:.0f} rows/s, "
+                f"COPY {loader.rows_per_second:.0f} rows/s), skipped {skipped}")
+    return loader.rows_loaded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--topic", default=settings.kafka_transaction_topic)
+    parser.add_argument("--partition", type=int, default=0)
+    parser.add_argument("--start-offset", type=int, required=True)
+    parser.add_argument("--end-offset", type=int, default=None, help="не включительно, по умолчанию - конец партиции")
+    parser.add_argument("--max-rows", type=int, default=10000)
+    parser.add_argument("--max-interval", type=float, default=1.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    backfill(args.topic, args.partition, args.start_offset, args.end_offset, args.max_rows, args.max_interval)
@@ -0,0 +1,165 @@
+"""Обслуживание суточных секций audit_logs (005_audit_logs_partitioned.sql).
+
+ensure_partitions создаёт секции audit_logs_pYYYYMMDD на days_ahead
+суток вперёд, чтобы запись никогда не попадала в audit_logs_default.
+apply_retention отсоединяет (DETACH) секции, целиком лежащие раньше
+retention_days суток назад, и при drop=True удаляет их. Отсоединённая
+секция - обычная таблица: её можно выгрузить в архив и удалить вручную.
+
+Консьюмер выполняет обслуживание при старте и затем раз в interval
+секунд. Разовый запуск из каталога app/:
+
+    python -m audit_consumer.partitions --retention-days 90 --drop
+"""
+import argparse
+import logging
+import re
+import threading
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+import psycopg2
+
+from audit_consumer.rollups import prune_minute_rollups
+from settings import settings
+
+logger = logging.getLogger("audit_consumer")
+
+PARTITION_BOUNDS = """
+    SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'audit_logs'::regclass
+"""
+BOUND_RE = re.compile(r"FROM \((MINVALUE|'[^']*')\) TO \((MAXVALUE|'[^']*')\)")
+
+
+def partition_name(day: date) -> str:
+    return f"audit_logs_p{day:%Y%m%d}"
+
+
+def parse_bound(value: str) -> Optional[datetime]:
+    if value in ("MINVALUE", "MAXVALUE"):
+        return None
+    return datetime.fromisoformat(value.strip("'"))
+
+
+def partition_bounds(cur) -> List[Tuple[str, Optional[datetime], Optional[datetime]]]:
+    """(имя, нижняя граница, верхняя граница) секций по диапазону, None -
+    без границы. Секция по умолчанию в список не входит."""
+    cur.execute(PARTITION_BOUNDS)
+    bounds = []
+    for name, expr in cur.fetchall():
+        match = BOUND_RE.search(expr)
+        if match:
+            bounds.append((name, parse_bound(match.group(1)), parse_bound(match.group(2))))
+    return bounds
+
+
+def overlaps(bounds, start: datetime, end: datetime) -> bool:
+    return any(
+        (lower is None or lower < end) and (upper is None or start < upper)
+        for _, lower, upper in bounds
+    )
+
+
+def ensure_partitions(conn, today: date, days_ahead: int) -> List[str]:
+    created = []
+    with conn:
+        with conn.cursor() as cur:
+            bounds = partition_bounds(cur)
+            for offset in range(days_ahead + 1):
+                day = today + timedelta(days=offset)
+                start = datetime.combine(day, datetime.min.time())
+                end = start + timedelta(days=1)
+                if overlaps(bounds, start, end):
+                    continue
+                # Если в audit_logs_default уже есть строки этих суток,
+                # секцию создать нельзя - остальные создаём без неё
+                cur.execute("SAVEPOINT create_partition")
+                try:
+                    cur.execute(
+                        f"CREATE TABLE {partition_name(day)} PARTITION OF audit_logs "
+                        "FOR VALUES FROM (%s) TO (%s)",
+                        (start, end)
+                    )
+                except psycopg2.Error as e:
+                    cur.execute("ROLLBACK TO SAVEPOINT create_partition")
+                    logger.error(f"Не удалось создать секцию {partition_name(day)}: {e}")
+                    continue
+                created.append(partition_name(day))
+    for name in created:
+        logger.info(f"Создана секция {name}")
+    return created
+
+
+def apply_retention(conn, today: date, retention_days: int, drop: bool = False) -> List[str]:
+    """Отсоединяет секции, верхняя граница которых не позже today - retention_days."""
+    cutoff = datetime.combine(today - timedelta(days=retention_days), datetime.min.time())
+    expired = []
+    with conn:
+        with conn.cursor() as cur:
+            for name, _, upper in partition_bounds(cur):
+                if upper is not None and upper <= cutoff:
+                    cur.execute(f"ALTER TABLE audit_logs DETACH PARTITION {name}")
+                    if drop:
+                        cur.execute(f"DROP TABLE {name}")
+                    expired.append(name)
+    for name in expired:
+        logger.info(f"Секция {name} {'удалена' if drop else 'отсоединена'} по retention")
+    return expired
+
+
+def maintain_partitions(conn, today: date, days_ahead: int, retention_days: int, drop: bool = False):
+    ensure_partitions(conn, today, days_ahead)
+    # retention_days = 0 - хранить всё
+    if retention_days > 0:
+        apply_retention(conn, today, retention_days, drop)
+
+
+class PartitionMaintainer:
+    def __init__(self, connect, days_ahead: int, retention_days: int, drop: bool = False,
+                 interval: float = 3600.0, rollup_minute_retention_days: int = 0):
+        self.connect = connect
+        self.days_ahead = days_ahead
+        self.retention_days = retention_days
+        self.drop = drop
+        self.interval = interval
+        self.rollup_minute_retention_days = rollup_minute_retention_days
+        self.stopped = threading.Event()
+
+    def run_once(self):
+        conn = self.connect()
+        try:
+            now = datetime.utcnow()
+            maintain_partitions(conn, now.date(), self.days_ahead, self.retention_days, self.drop)
+            if self.rollup_minute_retention_days > 0:
+                prune_minute_rollups(conn, now, self.rollup_minute_retention_days)
+        finally:
+            conn.close()
+
+    def maintain(self):
+        try:
+            self.run_once()
+        except psycopg2.Error as e:
+            logger.error(f"Ошибка обслуживания секций audit_logs: {e}")
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.maintain()
+
+
+if __name__ == "__main__":
+    from audit_consumer.start_consumer import get_db_connection
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days-ahead", type=int, default=settings.audit_partition_days_ahead)
+    parser.add_argument("--retention-days", type=int, default=settings.audit_retention_days)
+    parser.add_argument("--drop", action="store_true", default=settings.audit_retention_drop,
+                        help="удалять секции, а не только отсоединять")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    PartitionMaintainer(
+        get_db_connection, args.days_ahead, args.retention_days, args.drop,
+        rollup_minute_retention_days=settings.audit_rollup_minute_retention_days
+    ).run_once()
@@ -1,62 +1,268 @@
 from kafka import KafkaConsumer
+from kafka.structs import TopicPartition
 import psycopg2
+from psycopg2.extras import execute_values
+import argparse
 import json
 import threading
-from datetime import datetime
-from settings import settings  # импортируй свою конфигурацию
+import time
+from typing import List
+from settings import settings
+import json_codec
 import logging
+from audit_consumer.partitions import PartitionMaintainer
+from audit_consumer.rollups import save_rollups
 
 logger = logging.getLogger("audit_consumer")
 
+# Консьюмер забирает сообщения пачками (до batch_size или пока не истечёт
+# linger_ms), пишет пачку в audit_logs одним INSERT на постоянном
+# соединении и только после COMMIT в БД фиксирует offset в Kafka.
+# При сбое записи offset не фиксируется, консьюмер возвращается к началу
+# пачки (at-least-once). Воркеры - отдельные KafkaConsumer в одной группе,
+# Kafka распределяет между ними партиции топика.
+
+INSERT_AUDIT_LOGS = """
+    INSERT INTO audit_logs
+    (tx_id, account_id, receiver_id, amount, status, timestamp, source_ip, raw_payload)
+    VALUES %s
+"""
+
+
+# Ошибки в самих событиях: повтор той же пачки их не исправит. Остальные
+# ошибки psycopg2 (соединение, отсутствующая таблица) - повод перечитать
+# пачку позже
+DATA_ERRORS = (psycopg2.DataError, psycopg2.IntegrityError)
+
+
+def is_data_error(error: Exception) -> bool:
+    if isinstance(error, DATA_ERRORS):
+        return True
+    # ProgrammingError без pgcode - psycopg2 не смог адаптировать значение
+    # (например, вложенный объект), запрос до сервера не дошёл
+    if isinstance(error, psycopg2.ProgrammingError):
+        return error.pgcode is None
+    # Сбой при построении строки из события
+    return isinstance(error, (TypeError, ValueError, AttributeError))
+
+
 def get_db_connection():
     return psycopg2.connect(
-        dbname=settings.postgres_db,
-        user=settings.postgres_user,
-        password=settings.postgres_password,
-        host=settings.postgres_host,
-        port=settings.postgres_port
+        dbname=settings.postgres_audit_db,
+        user=settings.postgres_audit_user,
+        password=settings.postgres_audit_password,
+        host=settings.postgres_audit_host,
+        port=settings.postgres_audit_port
+    )
+
+
+def event_row(event: dict) -> tuple:
+    return (
+        event.get("transaction_id", event.get("id")),
+        event.get("account_id"),
+        event.get("receiver_id"),
+        event.get("amount"),
+        event.get("status"),
+        event.get("timestamp"),
+        event.get("source_ip"),
+        json_codec.dumps_str(event)
     )
 
-def save_to_audit_db(event: dict):
+
+def decode_event(value: bytes):
     try:
-        conn = get_db_connection()
-        with conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    INSERT INTO audit_logs
-                    (tx_id, account_id, receiver_id, amount, status, timestamp, source_ip, raw_payload)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    """,
-                    (
-                        event.get("transaction_id"),
-                        event.get("account_id"),
-                        event.get("receiver_id"),
-                        event.get("amount"),
-                        event.get("status"),
-                        event.get("timestamp"),
-                        event.get("source_ip"),
-                        json.dumps(event)
-                    )
-                )
-    except Exception as e:
-        logger.error(f"Ошибка при записи в audit_logs: {e}")
-    finally:
-        if conn:
-            conn.close()
-
-def start_consumer():
-    consumer = KafkaConsumer(
+        event = json_codec.loads(value)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        logger.error(f"Не удалось разобрать сообщение: {e}")
+        return None
+    if not isinstance(event, dict):
+        logger.error(f"Сообщение не является JSON-объектом: {value[:200]!r}")
+        return None
+    return event
+
+
+def save_to_audit_db(conn, events: List[dict]):
+    with conn:
+        with conn.cursor() as cur:
+            execute_values(cur, INSERT_AUDIT_LOGS, [event_row(event) for event in events], page_size=len(events))
+            save_rollups(cur, events)
+
+
+def save_dead_letter(conn, event: dict, error: Exception):
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO audit_dead_letters (raw_payload, error) VALUES (%s, %s)",
+                (json_codec.dumps_str(event), str(error).strip())
+            )
+
+
+def poll_batch(consumer, batch_size: int, linger_ms: int) -> list:
+    # Добираем пачку до batch_size, но ждём не дольше linger_ms
+    records = []
+    deadline = time.monotonic() + linger_ms / 1000
+    while len(records) < batch_size:
+        timeout_ms = int((deadline - time.monotonic()) * 1000)
+        if timeout_ms <= 0 and records:
+            break
+        polled = consumer.poll(timeout_ms=max(timeout_ms, 0), max_records=batch_size - len(records))
+        for partition_records in polled.values():
+            records.extend(partition_records)
+        if timeout_ms <= 0:
+            break
+    return records
+
+
+class AuditWorker:
+    def __init__(self, consumer, connect=get_db_connection, batch_size: int = 500,
+                 linger_ms: int = 200, retry_backoff: float = 1.0, write=save_to_audit_db):
+        self.consumer = consumer
+        self.connect = connect
+        self.write = write
+        self.batch_size = batch_size
+        self.linger_ms = linger_ms
+        self.retry_backoff = retry_backoff
+        self.conn = None
+        self.stopped = threading.Event()
+
+    def write_or_split(self, events: List[dict]) -> int:
+        """Пишет события; при ошибке в данных делит пачку пополам, пока
+        не найдёт события, которые не записываются, и откладывает их в
+        audit_dead_letters. Транзиентные ошибки пробрасываются: пачка
+        перечитывается целиком, и уже записанные половины повторяются
+        (at-least-once, как и при сбое до commit в Kafka)."""
+        try:
+            self.write(self.conn, events)
+            return len(events)
+        except Exception as e:
+            if not is_data_error(e):
+                raise
+            if len(events) > 1:
+                middle = len(events) // 2
+                return self.write_or_split(events[:middle]) + self.write_or_split(events[middle:])
+            logger.error(f"Событие не записано в audit_logs, отложено в audit_dead_letters: {e}")
+            try:
+                save_dead_letter(self.conn, events[0], e)
+            except Exception as dead_letter_error:
+                if not is_data_error(dead_letter_error):
+                    raise
+                logger.error(f"Не удалось сохранить событие в audit_dead_letters: "
+                             f"{dead_letter_error}; событие: {events[0]}")
+            return 0
+
+    def process_batch(self, records) -> int:
+        events = [event for event in (decode_event(r.value) for r in records) if event is not None]
+        saved = 0
+        try:
+            if events:
+                if self.conn is None or self.conn.closed:
+                    self.conn = self.connect()
+                saved = self.write_or_split(events)
+        except psycopg2.Error as e:
+            logger.error(f"Ошибка при записи в audit_logs: {e}")
+            if self.conn is not None and not self.conn.closed:
+                self.conn.close()
+            self.conn = None
+            self.rewind(records)
+            self.stopped.wait(self.retry_backoff)
+            return 0
+        # Позиция консьюмера стоит сразу за пачкой, её и фиксируем
+        self.consumer.commit()
+        return saved
+
+    def rewind(self, records):
+        # Повторно читаем пачку с первого незаписанного сообщения каждой партиции
+        first = {}
+        for record in records:
+            partition = TopicPartition(record.topic, record.partition)
+            first[partition] = min(first.get(partition, record.offset), record.offset)
+        for partition, offset in first.items():
+            self.consumer.seek(partition, offset)
+
+    def run(self):
+        logger.info("Kafka consumer started")
+        try:
+            while not self.stopped.is_set():
+                records = []
+                try:
+                    records = poll_batch(self.consumer, self.batch_size, self.linger_ms)
+                    if records:
+                        saved = self.process_batch(records)
+                        logger.info(f"Записано в audit_logs: {saved} из {len(records)}")
+                except Exception as e:
+                    # Непредвиденная ошибка не должна останавливать поток:
+                    # пачка перечитывается после паузы
+                    logger.exception(f"Ошибка обработки пачки: {e}")
+                    try:
+                        if records:
+                            self.rewind(records)
+                    except Exception as rewind_error:
+                        logger.error(f"Не удалось вернуться к началу пачки: {rewind_error}")
+                    self.stopped.wait(self.retry_backoff)
+        finally:
+            self.consumer.close()
+            if self.conn is not None:
+                self.conn.close()
+
+
+def create_consumer():
+    return KafkaConsumer(
         settings.kafka_transaction_topic,
-        bootstrap_servers=[settings.kafka_bootstrap_servers],
-        value_deserializer=lambda m: json.loads(m.decode("utf-8")),
+        bootstrap_servers=settings.kafka_bootstrap_servers.split(","),
         auto_offset_reset="earliest",
-        enable_auto_commit=True,
-        group_id="audit-group"
+        enable_auto_commit=False,
+        group_id=settings.audit_consumer_group,
+        max_poll_records=settings.audit_consumer_batch_size
+    )
+
+
+def start_consumer(workers: int = None, batch_size: int = None, linger_ms: int = None):
+    workers = workers or settings.audit_consumer_workers
+    write = save_to_audit_db
+    if settings.audit_consumer_write_mode == "copy":
+        from audit_consumer.copy_loader import copy_to_audit_db
+        write = copy_to_audit_db
+    audit_workers = [
+        AuditWorker(
+            create_consumer(),
+            batch_size=batch_size or settings.audit_consumer_batch_size,
+            linger_ms=linger_ms if linger_ms is not None else settings.audit_consumer_linger_ms,
+            write=write
+        )
+        for _ in range(workers)
+    ]
+    # Секции на ближайшие сутки должны существовать до первой записи
+    maintainer = PartitionMaintainer(
+        get_db_connection,
+        settings.audit_partition_days_ahead,
+        settings.audit_retention_days,
+        settings.audit_retention_drop,
+        settings.audit_partition_maintenance_interval,
+        settings.audit_rollup_minute_retention_days
     )
+    maintainer.maintain()
+    threading.Thread(target=maintainer.run, name="audit-partitions", daemon=True).start()
+
+    threads = [threading.Thread(target=w.run, name=f"audit-consumer-{i}") for i, w in enumerate(audit_workers)]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        maintainer.stopped.set()
+        for worker in audit_workers:
+            worker.stopped.set()
+        for thread in threads:
+            thread.join()
+
 
-    logger.info("Kafka consumer started")
-    for message in consumer:
-        event = message.value
-        logger.info(f"Получено сообщение из Kafka: {event}")
-        save_to_audit_db(event)
+if __name__ == "__main__":
+    # Запуск из каталога app/: python -m audit_consumer.start_consumer --workers 4
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=None, help="потоков, не больше числа партиций топика")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--linger-ms", type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    start_consumer(args.workers, args.batch_size, args.linger_ms)
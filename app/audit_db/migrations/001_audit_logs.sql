@@ -0,0 +1,13 @@
+-- Журнал событий переводов, который пишет audit_consumer. Запуск из app/:
+--     python -m database.migrate audit_db/migrations --dsn "dbname=audit_db ..."
+CREATE TABLE IF NOT EXISTS audit_logs (
+    id BIGSERIAL PRIMARY KEY,
+    tx_id TEXT,
+    account_id TEXT,
+    receiver_id TEXT,
+    amount NUMERIC,
+    status TEXT,
+    timestamp TIMESTAMP,
+    source_ip TEXT,
+    raw_payload JSONB
+);
@@ -0,0 +1,17 @@
+-- Уведомление об изменении пользователя для кэша ролей audit.py
+-- (user_cache.py). Полезная нагрузка - username, запись по нему
+-- удаляется из кэша, и следующий запрос перечитывает строку users.
+CREATE OR REPLACE FUNCTION notify_users_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('users_changed', OLD.username);
+    IF TG_OP = 'UPDATE' AND NEW.username IS DISTINCT FROM OLD.username THEN
+        PERFORM pg_notify('users_changed', NEW.username);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_changed_notify ON users;
+CREATE TRIGGER users_changed_notify
+    AFTER UPDATE OR DELETE ON users
+    FOR EACH ROW EXECUTE FUNCTION notify_users_changed();
@@ -0,0 +1,14 @@
+-- Индексы для постраничного чтения audit_logs (audit_logs.py): страница
+-- - условие (timestamp, id) < курсор и ORDER BY timestamp DESC, id DESC,
+-- фильтр по полю - префикс индекса (поле, timestamp, id).
+-- database.migrate выполняет файл в транзакции, поэтому без CONCURRENTLY:
+-- на большой таблице индексы лучше заранее создать вручную с CONCURRENTLY
+-- под теми же именами, IF NOT EXISTS их пропустит.
+CREATE INDEX IF NOT EXISTS audit_logs_timestamp_id_idx
+    ON audit_logs (timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS audit_logs_account_timestamp_id_idx
+    ON audit_logs (account_id, timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS audit_logs_status_timestamp_id_idx
+    ON audit_logs (status, timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS audit_logs_source_ip_timestamp_id_idx
+    ON audit_logs (source_ip, timestamp DESC, id DESC);
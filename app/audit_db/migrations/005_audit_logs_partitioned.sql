@@ -0,0 +1,89 @@
+-- audit_logs секционируется по timestamp: по секции на сутки
+-- (audit_logs_pYYYYMMDD), новые секции заранее создаёт и старые
+-- отсоединяет audit_consumer/partitions.py.
+--
+-- Существующая таблица не переписывается: она становится секцией
+-- audit_logs_legacy с диапазоном до конца суток последней записи и
+-- уходит по retention целиком, когда её время выйдет. Строки без
+-- timestamp переносятся в секцию по умолчанию audit_logs_default.
+-- ATTACH проверяет диапазон одним чтением старой таблицы.
+--
+-- Первичного ключа у секционированной таблицы нет: он обязан включать
+-- timestamp, а тот допускает NULL. id по-прежнему берётся из
+-- audit_logs_id_seq, страницы читаются по индексу (timestamp, id).
+DO $$
+DECLARE
+    v_upper TIMESTAMP;
+    v_day DATE;
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'audit_logs' AND relkind = 'p') THEN
+        RETURN;
+    END IF;
+
+    ALTER TABLE audit_logs RENAME TO audit_logs_legacy;
+    ALTER INDEX audit_logs_pkey RENAME TO audit_logs_legacy_pkey;
+    ALTER INDEX audit_logs_timestamp_id_idx RENAME TO audit_logs_legacy_timestamp_id_idx;
+    ALTER INDEX audit_logs_account_timestamp_id_idx RENAME TO audit_logs_legacy_account_timestamp_id_idx;
+    ALTER INDEX audit_logs_status_timestamp_id_idx RENAME TO audit_logs_legacy_status_timestamp_id_idx;
+    ALTER INDEX audit_logs_source_ip_timestamp_id_idx RENAME TO audit_logs_legacy_source_ip_timestamp_id_idx;
+
+    CREATE TABLE audit_logs (
+        id BIGINT NOT NULL DEFAULT nextval('audit_logs_id_seq'),
+        tx_id TEXT,
+        account_id TEXT,
+        receiver_id TEXT,
+        amount NUMERIC,
+        status TEXT,
+        timestamp TIMESTAMP,
+        source_ip TEXT,
+        raw_payload JSONB
+    ) PARTITION BY RANGE (timestamp);
+    -- Последовательность не должна удалиться вместе со старой секцией
+    ALTER SEQUENCE audit_logs_id_seq OWNED BY audit_logs.id;
+    ALTER TABLE audit_logs_legacy ALTER COLUMN id DROP DEFAULT;
+
+    CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT;
+    INSERT INTO audit_logs_default SELECT * FROM audit_logs_legacy WHERE timestamp IS NULL;
+    DELETE FROM audit_logs_legacy WHERE timestamp IS NULL;
+
+    SELECT date_trunc('day', max(timestamp)) + interval '1 day' INTO v_upper FROM audit_logs_legacy;
+    IF v_upper IS NULL THEN
+        DROP TABLE audit_logs_legacy;
+        v_upper := date_trunc('day', now() AT TIME ZONE 'utc');
+    ELSE
+        EXECUTE format(
+            'ALTER TABLE audit_logs ATTACH PARTITION audit_logs_legacy FOR VALUES FROM (MINVALUE) TO (%L)',
+            v_upper
+        );
+    END IF;
+
+    -- Секции на неделю вперёд, дальше их создаёт audit_consumer
+    FOR v_day IN
+        SELECT generate_series(
+            GREATEST(v_upper, date_trunc('day', now() AT TIME ZONE 'utc')),
+            date_trunc('day', now() AT TIME ZONE 'utc') + interval '7 days',
+            interval '1 day'
+        )::DATE
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF audit_logs FOR VALUES FROM (%L) TO (%L)',
+            'audit_logs_p' || to_char(v_day, 'YYYYMMDD'), v_day, v_day + 1
+        );
+    END LOOP;
+END;
+$$;
+
+-- Индексы создаются на всех секциях. У audit_logs_legacy индексы из
+-- 004_audit_logs_keyset.sql совпадают по определению и подключаются
+-- без перестройки. BRIN по timestamp - для чтения широких окон времени
+-- (сотни байт на секцию), B-tree (timestamp, id) - для страниц.
+CREATE INDEX IF NOT EXISTS audit_logs_timestamp_id_idx
+    ON audit_logs (timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS audit_logs_account_timestamp_id_idx
+    ON audit_logs (account_id, timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS audit_logs_status_timestamp_id_idx
+    ON audit_logs (status, timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS audit_logs_source_ip_timestamp_id_idx
+    ON audit_logs (source_ip, timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS audit_logs_timestamp_brin_idx
+    ON audit_logs USING brin (timestamp);
@@ -0,0 +1,48 @@
+-- Агрегаты audit_logs по минутам, часам и суткам для дашбордов аудита.
+-- Их пополняет audit_consumer (audit_consumer/rollups.py) в той же
+-- транзакции, что и запись событий; audit.py читает только их.
+-- value - значение измерения (status, account_id или source_ip),
+-- пустая строка вместо NULL.
+--
+-- Миграция один раз заполняет агрегаты по уже записанным событиям,
+-- поэтому на время её выполнения консьюмер нужно остановить.
+CREATE TABLE IF NOT EXISTS audit_rollup_minute (
+    dimension TEXT NOT NULL,
+    value TEXT NOT NULL,
+    bucket TIMESTAMP NOT NULL,
+    events BIGINT NOT NULL,
+    amount NUMERIC NOT NULL,
+    PRIMARY KEY (dimension, bucket, value)
+);
+CREATE TABLE IF NOT EXISTS audit_rollup_hour (LIKE audit_rollup_minute INCLUDING ALL);
+CREATE TABLE IF NOT EXISTS audit_rollup_day (LIKE audit_rollup_minute INCLUDING ALL);
+
+-- Ряды одного значения измерения за окно
+CREATE INDEX IF NOT EXISTS audit_rollup_minute_value_idx ON audit_rollup_minute (dimension, value, bucket);
+CREATE INDEX IF NOT EXISTS audit_rollup_hour_value_idx ON audit_rollup_hour (dimension, value, bucket);
+CREATE INDEX IF NOT EXISTS audit_rollup_day_value_idx ON audit_rollup_day (dimension, value, bucket);
+
+DO $$
+DECLARE
+    v_granularity TEXT;
+BEGIN
+    FOREACH v_granularity IN ARRAY ARRAY['minute', 'hour', 'day'] LOOP
+        EXECUTE format($sql$
+            INSERT INTO %I (dimension, value, bucket, events, amount)
+            SELECT d.dimension, d.value, date_trunc(%L, l.timestamp), count(*), coalesce(sum(l.amount), 0)
+            FROM audit_logs l
+            CROSS JOIN LATERAL (VALUES
+                ('status', coalesce(l.status, '')),
+                ('account_id', coalesce(l.account_id, '')),
+                ('source_ip', coalesce(l.source_ip, ''))
+            ) AS d (dimension, value)
+            WHERE l.timestamp IS NOT NULL
+            GROUP BY 1, 2, 3
+            ON CONFLICT DO NOTHING
+        $sql$, 'audit_rollup_' || v_granularity, v_granularity);
+    END LOOP;
+END;
+$$;
+
+-- Статистика после заполнения, иначе планировщик считает таблицы пустыми
+ANALYZE audit_rollup_minute, audit_rollup_hour, audit_rollup_day;
@@ -0,0 +1,11 @@
+-- События, которые audit_consumer не смог записать в audit_logs из-за
+-- ошибки в данных (нечисловой amount, неразбираемый timestamp и т.п.).
+-- Пачка с такими событиями делится пополам до отдельных событий, они
+-- попадают сюда, остальные записываются, offset фиксируется - партиция
+-- топика не останавливается на одном сообщении.
+CREATE TABLE IF NOT EXISTS audit_dead_letters (
+    id BIGSERIAL PRIMARY KEY,
+    raw_payload TEXT NOT NULL,
+    error TEXT NOT NULL,
+    failed_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+);
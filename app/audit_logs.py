@@ -0,0 +1,154 @@
+"""Постраничное чтение audit_logs для audit.py.
+
+Страницы - keyset по (timestamp, id): курсор хранит ключ последней
+строки, и следующая страница начинается с условия
+(timestamp, id) < (курсор), а не с OFFSET. Поэтому запрос к любой
+странице - один проход по индексу из 004_audit_logs_keyset.sql
+на limit строк, независимо от глубины и размера таблицы.
+
+Фильтр по account_id, status или source_ip использует индекс
+(поле, timestamp, id), окно времени - диапазон того же индекса,
+диапазон суммы проверяется на прочитанных строках.
+
+audit_logs секционирована по суткам (005_audit_logs_partitioned.sql):
+условия на timestamp - константы, и планировщик оставляет только
+секции из окна, поэтому свежие страницы не трогают старые секции.
+"""
+import base64
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import List, Optional, Tuple
+
+from pydantic import BaseModel, Field, field_validator
+
+import json_codec
+
+COLUMNS = "id, tx_id, account_id, receiver_id, amount, status, timestamp, source_ip"
+
+
+class AuditLogQuery(BaseModel):
+    account_id: Optional[str] = None
+    status: Optional[str] = None
+    source_ip: Optional[str] = None
+    min_amount: Optional[Decimal] = None
+    max_amount: Optional[Decimal] = None
+    # Окно времени [since, until)
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    limit: int = Field(50, ge=1, le=1000)
+    cursor: Optional[str] = None
+
+    @field_validator("since", "until")
+    @classmethod
+    def to_naive_utc(cls, value: Optional[datetime]) -> Optional[datetime]:
+        # audit_logs.timestamp - TIMESTAMP без зоны в UTC; время с зоной
+        # нельзя ни сравнить с курсором и now, ни передать в SQL как есть
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+
+class AuditLogEntry(BaseModel):
+    id: int
+    tx_id: Optional[str] = None
+    account_id: Optional[str] = None
+    receiver_id: Optional[str] = None
+    amount: Optional[Decimal] = None
+    status: Optional[str] = None
+    timestamp: datetime
+    source_ip: Optional[str] = None
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    raw = json_codec.dumps([timestamp.isoformat(), row_id])
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """ValueError, если курсор повреждён."""
+    try:
+        timestamp, row_id = json_codec.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if not isinstance(row_id, int):
+            raise ValueError(row_id)
+        return datetime.fromisoformat(timestamp), row_id
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def build_query(query: AuditLogQuery, since: Optional[datetime] = None,
+                until: Optional[datetime] = None, limit: Optional[int] = None) -> Tuple[str, list]:
+    """SELECT страницы. since и until заменяют окно времени из query,
+    limit - число строк (по умолчанию query.limit + 1)."""
+    since = since if since is not None else query.since
+    until = until if until is not None else query.until
+    # Строки без timestamp не имеют ключа страницы и в выдачу не попадают
+    conditions = ["timestamp IS NOT NULL"]
+    params: list = []
+    for column in ("account_id", "status", "source_ip"):
+        value = getattr(query, column)
+        if value is not None:
+            conditions.append(f"{column} = %s")
+            params.append(value)
+    if query.min_amount is not None:
+        conditions.append("amount >= %s")
+        params.append(query.min_amount)
+    if query.max_amount is not None:
+        conditions.append("amount <= %s")
+        params.append(query.max_amount)
+    if since is not None:
+        conditions.append("timestamp >= %s")
+        params.append(since)
+    if until is not None:
+        conditions.append("timestamp < %s")
+        params.append(until)
+    if query.cursor is not None:
+        timestamp, row_id = decode_cursor(query.cursor)
+        # Сравнение строк секции не отсекает, отдельное условие на timestamp - да
+        conditions.append("timestamp <= %s AND (timestamp, id) < (%s, %s)")
+        params.extend((timestamp, timestamp, row_id))
+
+    # Одна лишняя строка показывает, есть ли следующая страница
+    params.append(limit if limit is not None else query.limit + 1)
+    sql = (
+        f"SELECT {COLUMNS} FROM audit_logs WHERE {' AND '.join(conditions)} "
+        "ORDER BY timestamp DESC, id DESC LIMIT %s"
+    )
+    return sql, params
+
+
+def fetch_rows(cur, sql: str, params: list) -> list:
+    cur.execute(sql, params)
+    return cur.fetchall()
+
+
+def fetch_page(cur, query: AuditLogQuery, window: Optional[timedelta] = None,
+               now: Optional[datetime] = None) -> Tuple[List[AuditLogEntry], Optional[str]]:
+    """Страница записей (новые первыми) и курсор следующей, если она есть.
+
+    С window и без since страница сначала ищется в последних window до
+    курсора (или до now), так что читаются только свежие секции. Старые
+    секции затрагиваются, только если там не набралось страницы.
+    """
+    limit = query.limit + 1
+    if window is None or query.since is not None:
+        rows = fetch_rows(cur, *build_query(query))
+    else:
+        bounds = [query.until, decode_cursor(query.cursor)[0] if query.cursor else None]
+        upper = min([bound for bound in bounds if bound is not None] or [now or datetime.utcnow()])
+        lower = upper - window
+        rows = fetch_rows(cur, *build_query(query, since=lower))
+        if len(rows) < limit:
+            rows += fetch_rows(cur, *build_query(query, until=lower, limit=limit - len(rows)))
+
+    entries = [
+        AuditLogEntry(
+            id=row[0], tx_id=row[1], account_id=row[2], receiver_id=row[3],
+            amount=row[4], status=row[5], timestamp=row[6], source_ip=row[7]
+        )
+        for row in rows[:query.limit]
+    ]
+    next_cursor = None
+    if len(rows) > query.limit:
+        last = entries[-1]
+        next_cursor = encode_cursor(last.timestamp, last.id)
+    return entries, next_cursor
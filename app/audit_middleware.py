@@ -0,0 +1,70 @@
+"""ASGI-middleware audit.py.
+
+Обе работают только с заголовками: запрос и тело ответа проходят
+насквозь, без BaseHTTPMiddleware и его отдельной задачи и обёртки
+потока ответа на каждый запрос.
+"""
+from starlette.datastructures import MutableHeaders
+from starlette.requests import cookie_parser
+from starlette.responses import JSONResponse
+
+from ip_allowlist import DENIED, INVALID, ReloadableAllowList
+
+
+class IPAllowListMiddleware:
+    """Отклоняет запросы с адресов вне списка разрешённых сетей (403)."""
+
+    def __init__(self, app, allow_list: ReloadableAllowList, logger):
+        self.app = app
+        self.allow_list = allow_list
+        self.logger = logger
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        client = scope.get("client")
+        client_ip = client[0] if client else ""
+        decision = self.allow_list.decide(client_ip)
+        if decision == DENIED:
+            self.logger.warning(f"Blocked non-local access attempt from {client_ip}")
+            response = JSONResponse({"detail": "Access denied"}, status_code=403)
+            return await response(scope, receive, send)
+        if decision == INVALID:
+            self.logger.error(f"Invalid IP address: {client_ip}")
+            response = JSONResponse({"detail": "Invalid client IP"}, status_code=403)
+            return await response(scope, receive, send)
+        await self.app(scope, receive, send)
+
+
+def request_cookie(scope, name: str):
+    for key, value in scope["headers"]:
+        if key == b"cookie":
+            return cookie_parser(value.decode("latin-1")).get(name)
+    return None
+
+
+class CSRFMiddleware:
+    """Выдаёт CSRF-cookie, если у клиента её ещё нет. Cookie добавляется
+    в заголовки сообщения http.response.start."""
+
+    def __init__(self, app, csrf_protect, max_age: int = 3600):
+        self.app = app
+        self.csrf_protect = csrf_protect
+        self.max_age = max_age
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or request_cookie(scope, self.csrf_protect.cookie_name):
+            return await self.app(scope, receive, send)
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "set-cookie",
+                    f"{self.csrf_protect.cookie_name}={self.csrf_protect.generate_token()}; "
+                    f"Max-Age={self.max_age}; Path=/; SameSite=strict"
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
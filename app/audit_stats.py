@@ -0,0 +1,116 @@
+"""Статистика audit_logs для дашбордов audit.py.
+
+Читаются только агрегаты audit_rollup_minute/hour/day, которые
+пополняет audit_consumer (audit_consumer/rollups.py), поэтому время
+запроса зависит от числа интервалов в окне и значений измерения, а не
+от объёма событий: 30 суток по часам - 720 строк на значение, а итоги
+для выбора самых частых значений - 30 строк на значение из суточной
+таблицы. Суммы отдаются строками, без потери точности NUMERIC.
+
+Окно [since, until) расширяется до целых интервалов granularity.
+"""
+from datetime import datetime, timedelta
+from typing import List, Literal, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from audit_consumer.rollups import ROLLUP_TABLES, parse_timestamp, truncate
+
+GRANULARITY_STEPS = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+# От крупных интервалов к мелким
+LEVELS = ("day", "hour", "minute")
+DEFAULT_WINDOW = timedelta(days=1)
+# Больше точек (интервалов на значение) за один запрос не отдаём
+MAX_POINTS = 50000
+
+
+class AuditStatsQuery(BaseModel):
+    dimension: Literal["status", "account_id", "source_ip"]
+    granularity: Literal["minute", "hour", "day"] = "hour"
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    # Только одно значение измерения, иначе - limit самых частых
+    value: Optional[str] = None
+    limit: int = Field(20, ge=1, le=100)
+
+
+def stats_window(query: AuditStatsQuery, now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    """(since, until) запроса. ValueError, если окно пустое или точек
+    получится больше MAX_POINTS. Время с зоной приводится к UTC без
+    зоны, как bucket в агрегатах."""
+    until = parse_timestamp(query.until or now) or datetime.utcnow()
+    since = parse_timestamp(query.since) or until - DEFAULT_WINDOW
+    since = truncate(since, query.granularity)
+    if since >= until:
+        raise ValueError("Empty stats window")
+    series = 1 if query.value is not None else query.limit
+    if (until - since) / GRANULARITY_STEPS[query.granularity] * series > MAX_POINTS:
+        raise ValueError(f"Stats window too long for {query.granularity} granularity")
+    return since, until
+
+
+def window_segments(since: datetime, until: datetime, granularity: str) -> List[Tuple[str, datetime, datetime]]:
+    """Окно, покрытое самыми крупными агрегатами: целые сутки - из
+    audit_rollup_day, края - из более мелких таблиц, до granularity."""
+    levels = LEVELS[:LEVELS.index(granularity) + 1][::-1]
+
+    def cover(start, end, level_index):
+        if start >= end:
+            return []
+        level = levels[level_index]
+        if level_index == 0:
+            return [(ROLLUP_TABLES[level], start, end)]
+        step = GRANULARITY_STEPS[level]
+        inner_start = truncate(start, level)
+        if inner_start < start:
+            inner_start += step
+        inner_end = truncate(end, level)
+        if inner_start >= inner_end:
+            return cover(start, end, level_index - 1)
+        return (
+            cover(start, inner_start, level_index - 1)
+            + [(ROLLUP_TABLES[level], inner_start, inner_end)]
+            + cover(inner_end, end, level_index - 1)
+        )
+
+    return cover(since, until, len(levels) - 1)
+
+
+def fetch_stats(cur, query: AuditStatsQuery, now: Optional[datetime] = None) -> List[dict]:
+    """Ряды по значениям измерения, самые частые первыми. Итоги окна
+    считаются по самым крупным агрегатам, точки - по granularity."""
+    since, until = stats_window(query, now)
+
+    parts, params = [], []
+    for table, start, end in window_segments(since, until, query.granularity):
+        condition = "dimension = %s AND bucket >= %s AND bucket < %s"
+        params += [query.dimension, start, end]
+        if query.value is not None:
+            condition += " AND value = %s"
+            params.append(query.value)
+        parts.append(f"SELECT value, events, amount FROM {table} WHERE {condition}")
+    cur.execute(
+        f"SELECT value, sum(events), sum(amount) FROM ({' UNION ALL '.join(parts)}) AS w "
+        "GROUP BY value ORDER BY sum(events) DESC, value LIMIT %s",
+        params + [query.limit]
+    )
+    series = {
+        value: {"value": value, "events": int(events), "amount": str(amount), "points": []}
+        for value, events, amount in cur.fetchall()
+    }
+    if not series:
+        return []
+
+    cur.execute(
+        f"SELECT value, bucket, events, amount FROM {ROLLUP_TABLES[query.granularity]} "
+        "WHERE dimension = %s AND value = ANY(%s) AND bucket >= %s AND bucket < %s "
+        "ORDER BY value, bucket",
+        (query.dimension, list(series), since, until)
+    )
+    for value, bucket, events, amount in cur.fetchall():
+        series[value]["points"].append({"bucket": bucket.isoformat(), "events": events, "amount": str(amount)})
+    return list(series.values())
@@ -0,0 +1,52 @@
+"""Латентность /home, пока один воркер обрабатывает сотни переводов одновременно.
+
+Запуск из каталога app/ (нужны Postgres и два существующих пользователя):
+
+    python -m benchmarks.bench_async_transfers --user alice --true-user-id 1 \
+        --receiver-id 2 --in-flight 50,200,400 --duration 10
+"""
+import argparse
+import json
+import threading
+
+from benchmarks.common import http_call, make_session_token, print_table, run_load, uvicorn_server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--user", required=True)
+    parser.add_argument("--true-user-id", required=True)
+    parser.add_argument("--receiver-id", required=True)
+    parser.add_argument("--in-flight", default="0,50,200,400", help="число одновременных переводов")
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    cookies = {"session_id": make_session_token(args.user, args.true_user_id)}
+    body = json.dumps({"amount": 1, "receiver_id": args.receiver_id}).encode()
+    rows = []
+    with uvicorn_server("main:app", workers=1) as base_url:
+        transfer = http_call(base_url + "/api/transaction", method="POST", body=body, cookies=cookies)
+        home = http_call(base_url + "/home", cookies=cookies)
+        for in_flight in (int(n) for n in args.in_flight.split(",")):
+            results = {}
+            load = threading.Thread(
+                target=lambda: results.update(transfers=run_load(transfer, in_flight, args.duration))
+            ) if in_flight else None
+            if load:
+                load.start()
+            home_stats = run_load(home, 4, args.duration)
+            if load:
+                load.join()
+            transfer_stats = results.get("transfers", {"rps": 0.0})
+            rows.append({
+                "in_flight": in_flight,
+                "transfer_rps": transfer_stats["rps"],
+                "home_rps": home_stats["rps"],
+                "home_p50_ms": home_stats["p50_ms"],
+                "home_p99_ms": home_stats["p99_ms"],
+            })
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Запросов/сек через стек middleware audit.py: прежний вариант
+(BaseHTTPMiddleware для CSRF и @app.middleware("http") для IP) против
+ASGI-middleware из audit_middleware.py.
+
+audit.py при импорте подключается к Kafka и БД, поэтому здесь собраны
+два минимальных приложения с тем же стеком и пустым эндпоинтом,
+каждое запускается в отдельном uvicorn. Запуск из каталога app/:
+
+    python -m benchmarks.bench_audit_middleware --threads 16 --duration 10
+"""
+import argparse
+import logging
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from audit_middleware import CSRFMiddleware, IPAllowListMiddleware
+from benchmarks.common import http_call, print_table, run_load, uvicorn_server
+from ip_allowlist import DENIED, INVALID, ReloadableAllowList
+
+logger = logging.getLogger("security")
+allow_list = ReloadableAllowList("127.0.0.1,192.168.1.0/24")
+
+
+class BenchCSRF:
+    cookie_name = "csrf_token"
+
+    def generate_token(self) -> str:
+        return "x" * 43
+
+
+class BaseCSRFMiddleware(BaseHTTPMiddleware):
+    """Прежняя реализация из audit.py."""
+
+    def __init__(self, app, csrf_protect):
+        super().__init__(app)
+        self.csrf_protect = csrf_protect
+
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        if not request.cookies.get(self.csrf_protect.cookie_name):
+            response.set_cookie(
+                key=self.csrf_protect.cookie_name, value=self.csrf_protect.generate_token(),
+                httponly=False, samesite="strict", secure=False, path="/", max_age=3600
+            )
+        return response
+
+
+base_app = FastAPI(middleware=[Middleware(BaseCSRFMiddleware, csrf_protect=BenchCSRF())])
+
+
+@base_app.middleware("http")
+async def check_local_network(request: Request, call_next):
+    decision = allow_list.decide(request.client.host)
+    if decision in (DENIED, INVALID):
+        raise HTTPException(status_code=403, detail="Access denied")
+    return await call_next(request)
+
+
+asgi_app = FastAPI(middleware=[
+    Middleware(IPAllowListMiddleware, allow_list=allow_list, logger=logger),
+    Middleware(CSRFMiddleware, csrf_protect=BenchCSRF())
+])
+
+
+@base_app.get("/ping")
+@asgi_app.get("/ping")
+async def ping():
+    return {"status": "ok"}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--with-cookie", action="store_true",
+                        help="клиент уже имеет CSRF-cookie (cookie не выдаётся)")
+    args = parser.parse_args()
+
+    cookies = {"csrf_token": "x" * 43} if args.with_cookie else None
+    rows = []
+    for name in ("base_app", "asgi_app"):
+        with uvicorn_server(f"benchmarks.bench_audit_middleware:{name}") as base_url:
+            call = http_call(f"{base_url}/ping", cookies=cookies)
+            call()
+            rows.append({"stack": name, **run_load(call, args.threads, args.duration)})
+    print_table(rows)
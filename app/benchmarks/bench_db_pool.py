@@ -0,0 +1,40 @@
+"""Масштабирование requests/sec по числу воркеров uvicorn и клиентских потоков.
+
+Требует запущенный Postgres из sql/docker-compose.yml и существующего
+пользователя. Запуск из каталога app/:
+
+    python -m benchmarks.bench_db_pool --user alice --true-user-id 1 \
+        --workers 1,2,4 --threads 1,8,32 --duration 10
+"""
+import argparse
+
+from benchmarks.common import http_call, make_session_token, print_table, run_load, uvicorn_server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--user", required=True, help="username для JWT")
+    parser.add_argument("--true-user-id", required=True, help="user_id для JWT")
+    parser.add_argument("--paths", default="/home,/send_money")
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--threads", default="1,8,32")
+    parser.add_argument("--pool-max-size", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    token = make_session_token(args.user, args.true_user_id)
+    rows = []
+    for workers in (int(w) for w in args.workers.split(",")):
+        env = {"DB_POOL_MAX_SIZE": str(args.pool_max_size)}
+        with uvicorn_server("main:app", workers=workers, env=env) as base_url:
+            for path in args.paths.split(","):
+                call = http_call(base_url + path, cookies={"session_id": token})
+                call()  # прогрев пула
+                for threads in (int(t) for t in args.threads.split(",")):
+                    stats = run_load(call, threads, args.duration)
+                    rows.append({"path": path, "workers": workers, "threads": threads, **stats})
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
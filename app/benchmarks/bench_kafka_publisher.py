@@ -0,0 +1,155 @@
+"""Сравнение отправки событий в Kafka: ожидание подтверждения vs фоновая очередь.
+
+По умолчанию вместо брокера используется локальная заглушка, которая
+отвечает на каждый запрос produce с задержкой --ack-ms (как брокер с
+acks=all). С --bootstrap тест идёт против настоящего брокера.
+
+    python -m benchmarks.bench_kafka_publisher --events 5000 --concurrency 64 --ack-ms 5
+"""
+import argparse
+import asyncio
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from kafka.future import Future
+
+from benchmarks.common import percentile, print_table
+from metrics import metrics
+from producer import KafkaPublisher
+
+RecordMetadata = namedtuple("RecordMetadata", "topic partition offset")
+
+
+class StandInProducer:
+    """Заглушка KafkaProducer: один запрос к "брокеру" стоит ack_latency секунд.
+
+    get() на отдельном сообщении - отдельный запрос, flush() подтверждает
+    все накопленные сообщения одним запросом, как пачка в настоящем продюсере.
+    """
+
+    def __init__(self, ack_latency: float):
+        self.ack_latency = ack_latency
+        self.offset = 0
+        self._pending = []
+
+    def send(self, topic, value=None):
+        future = _BlockingFuture(self, topic)
+        self._pending.append(future)
+        return future
+
+    def flush(self, timeout=None):
+        pending, self._pending = self._pending, []
+        if pending:
+            time.sleep(self.ack_latency)
+        for future in pending:
+            future.complete()
+
+    def close(self, timeout=None):
+        self.flush()
+
+
+class _BlockingFuture(Future):
+    def __init__(self, producer: StandInProducer, topic: str):
+        super().__init__()
+        self.producer = producer
+        self.topic = topic
+
+    def complete(self):
+        if not self.is_done:
+            self.producer.offset += 1
+            self.success(RecordMetadata(self.topic, 0, self.producer.offset))
+
+    def get(self, timeout=None):
+        time.sleep(self.producer.ack_latency)
+        self.producer._pending.remove(self)
+        self.complete()
+        return self.value
+
+
+async def measure(publish, events: int, concurrency: int):
+    latencies = []
+    remaining = iter(range(events))
+
+    async def worker():
+        for i in remaining:
+            started = time.perf_counter()
+            await publish({"transaction_id": str(i), "amount": 1})
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - started
+
+
+async def blocking_mode(make_producer, args):
+    # Прежняя схема: send() + get() на каждое событие в пуле потоков
+    producer = make_producer()
+    executor = ThreadPoolExecutor(max_workers=args.concurrency)
+    loop = asyncio.get_running_loop()
+
+    async def publish(value):
+        await loop.run_in_executor(executor, lambda: producer.send(args.topic, value=value).get(timeout=10))
+
+    latencies, elapsed = await measure(publish, args.events, args.concurrency)
+    executor.shutdown()
+    producer.close()
+    return latencies, elapsed
+
+
+async def queued_mode(make_producer, args):
+    metrics.reset()
+    publisher = KafkaPublisher(make_producer, queue_size=args.queue_size,
+                               batch_size=args.batch_size, linger=args.linger)
+    await publisher.start()
+
+    async def publish(value):
+        await publisher.publish(args.topic, value)
+
+    latencies, elapsed = await measure(publish, args.events, args.concurrency)
+    await publisher.stop()
+    if metrics.get("kafka.delivered") != args.events:
+        print(f"WARN: delivered {metrics.get('kafka.delivered')} of {args.events}")
+    return latencies, elapsed
+
+
+async def run(args):
+    if args.bootstrap:
+        from kafka import KafkaProducer
+        import json
+
+        def make_producer():
+            return KafkaProducer(bootstrap_servers=args.bootstrap, acks="all",
+                                 value_serializer=lambda v: json.dumps(v).encode("utf-8"))
+    else:
+        def make_producer():
+            return StandInProducer(args.ack_ms / 1000)
+
+    rows = []
+    for name, mode in (("blocking", blocking_mode), ("queued", queued_mode)):
+        started = time.perf_counter()
+        # delivered_rps учитывает и досылку очереди при остановке
+        latencies, elapsed = await mode(make_producer, args)
+        total = time.perf_counter() - started
+        rows.append({
+            "mode": name,
+            "events": len(latencies),
+            "publish_rps": len(latencies) / elapsed,
+            "delivered_rps": len(latencies) / total,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+        })
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bootstrap", default=None, help="адрес настоящего брокера вместо заглушки")
+    parser.add_argument("--topic", default="transaction")
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--ack-ms", type=float, default=5.0, help="задержка подтверждения у заглушки")
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--linger", type=float, default=0.005)
+    asyncio.run(run(parser.parse_args()))
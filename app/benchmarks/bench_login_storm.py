@@ -0,0 +1,87 @@
+"""Задержка посторонних эндпоинтов во время потока логинов.
+
+Создаёт тестового пользователя, измеряет p50/p99 --probe-path без
+нагрузки, затем при --storm-threads потоках, непрерывно вызывающих
+/api/login. Проверка bcrypt не должна занимать event loop, поэтому p99
+пробного эндпоинта под нагрузкой должен остаться близким к базовому.
+Запуск из каталога app/:
+
+    python -m benchmarks.bench_login_storm --storm-threads 32 --duration 10
+    python -m benchmarks.bench_login_storm --app audit:app --dsn "dbname=audit_db ..."
+"""
+import argparse
+import json
+import threading
+
+import psycopg2
+
+from benchmarks.common import http_call, print_table, run_load, uvicorn_server
+from database.session import db_pool
+from passwords import pwd_context
+
+USERNAME = "bench_login_storm"
+PASSWORD = "bench-password"
+
+
+def create_user(dsn: str):
+    conn = psycopg2.connect(dsn)
+    with conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM users WHERE user_id = %s", (USERNAME,))
+        cur.execute(
+            """INSERT INTO users (user_id, username, hashed_password, name_surname, balance, account_status)
+               VALUES (%s, %s, %s, 'Bench User', 0, 'normal')""",
+            (USERNAME, USERNAME, pwd_context.hash(PASSWORD))
+        )
+    conn.close()
+
+
+def cleanup(dsn: str):
+    conn = psycopg2.connect(dsn)
+    with conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM active_session WHERE userid = %s", (USERNAME,))
+        cur.execute("DELETE FROM bruteforce_protect WHERE user_id = %s", (USERNAME,))
+        cur.execute("DELETE FROM users WHERE user_id = %s", (USERNAME,))
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app", default="main:app")
+    parser.add_argument("--dsn", default=None, help="БД с таблицей users этого приложения")
+    parser.add_argument("--probe-path", default="/metrics")
+    parser.add_argument("--probe-threads", type=int, default=4)
+    parser.add_argument("--storm-threads", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    dsn = args.dsn or db_pool.dsn
+    create_user(dsn)
+    rows = []
+    try:
+        with uvicorn_server(args.app) as base_url:
+            probe = http_call(base_url + args.probe_path)
+            # CSRF-куки и Referer нужны audit:app, main:app их игнорирует
+            login = http_call(
+                base_url + "/api/login", method="POST",
+                body=json.dumps({"login": USERNAME, "password": PASSWORD, "csrf_token": "bench"}).encode(),
+                cookies={"csrf_token": "bench"},
+                extra_headers={"Referer": base_url + "/login"}
+            )
+            probe()
+            rows.append({"phase": "baseline", **run_load(probe, args.probe_threads, args.duration)})
+
+            storm_stats = {}
+            storm = threading.Thread(
+                target=lambda: storm_stats.update(run_load(login, args.storm_threads, args.duration))
+            )
+            storm.start()
+            rows.append({"phase": "login storm", **run_load(probe, args.probe_threads, args.duration)})
+            storm.join()
+            rows.append({"phase": "logins", **storm_stats})
+    finally:
+        cleanup(dsn)
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
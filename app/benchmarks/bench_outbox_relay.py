@@ -0,0 +1,53 @@
+"""Пропускная способность релея outbox в зависимости от числа воркеров.
+
+Заполняет outbox --events тестовыми событиями и разбирает их релеем с
+1, 2, 4... воркерами. Вместо брокера - заглушка из bench_kafka_publisher
+с задержкой подтверждения --ack-ms на пачку.
+
+    python -m benchmarks.bench_outbox_relay --events 20000 --workers 1 2 4 8
+"""
+import argparse
+import time
+
+import psycopg2
+
+from benchmarks.bench_kafka_publisher import StandInProducer
+from benchmarks.common import print_table
+from database.session import db_pool
+from outbox_relay import OutboxRelay
+
+TOPIC = "bench_outbox"
+
+
+def fill_outbox(dsn: str, events: int):
+    conn = psycopg2.connect(dsn)
+    with conn, conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO outbox (topic, payload) SELECT %s, jsonb_build_object('n', n) FROM generate_series(1, %s) AS n",
+            (TOPIC, events)
+        )
+    conn.close()
+
+
+def main(args):
+    dsn = args.dsn or db_pool.dsn
+    rows = []
+    for workers in args.workers:
+        fill_outbox(dsn, args.events)
+        relay = OutboxRelay(dsn, lambda: StandInProducer(args.ack_ms / 1000),
+                            workers=workers, batch_size=args.batch_size, poll_interval=0.01)
+        started = time.perf_counter()
+        relayed = relay.run(once=True)
+        elapsed = time.perf_counter() - started
+        rows.append({"workers": workers, "events": relayed, "seconds": elapsed, "events_per_s": relayed / elapsed})
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", default=None)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--ack-ms", type=float, default=5.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    main(parser.parse_args())
@@ -0,0 +1,110 @@
+"""Скорость рендеринга шаблонов main.py и audit.py.
+
+Для каждого шаблона - рендеров/сек окружения Jinja2Templates по
+умолчанию (auto_reload, без байткода) и окружения из rendering.py.
+Отдельно - время первой загрузки всех шаблонов с холодным и тёплым
+кэшем байткода (как после перезапуска воркера) и отдача
+пререндеренной страницы. Запуск из каталога app/:
+
+    python -m benchmarks.bench_templates --renders 20000
+"""
+import argparse
+import tempfile
+import time
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+from fastapi.templating import Jinja2Templates
+from starlette.datastructures import State
+
+from benchmarks.common import print_table
+from rendering import create_templates, precompile, prerender
+
+REQUEST = SimpleNamespace(state=State())
+INCIDENTS = [
+    SimpleNamespace(timestamp=datetime.utcnow(), user_id=f"user{i}", event_type="transfer", source_ip="127.0.0.1")
+    for i in range(20)
+]
+
+# Контексты как в обработчиках main.py и audit.py
+CONTEXTS = {
+    ("templates", "error.html"): {"request": REQUEST, "error": "Страница не найдена", "code": 404},
+    ("templates", "home.html"): {"request": REQUEST, "fullname": "Иван Иванов", "balance": Decimal("1000"),
+                                 "restrict_warning": None},
+    ("templates", "login.html"): {"request": REQUEST},
+    ("templates", "sending_page.html"): {"request": REQUEST, "fullname": "Иван Иванов", "balance": Decimal("1000")},
+    ("audit_templates", "home.html"): {"request": REQUEST, "fullname": "Иван Иванов", "role": "auditor",
+                                       "incidents": INCIDENTS, "csrf_token": "x" * 43},
+    ("audit_templates", "login.html"): {"request": REQUEST, "csrf_token": "x" * 43, "warning": "warning"},
+    ("audit_templates", "audit.html"): {"request": REQUEST, "csrf_token": "x" * 43},
+    ("audit_templates", "not_enough_privileges.html"): {"request": REQUEST},
+}
+
+
+def renders_per_sec(templates, name: str, context: dict, renders: int) -> float:
+    started = time.perf_counter()
+    for _ in range(renders):
+        # get_template на каждом вызове, как TemplateResponse
+        templates.get_template(name).render(context)
+    return renders / (time.perf_counter() - started)
+
+
+def bench_renders(renders: int):
+    rows = []
+    for directory in ("templates", "audit_templates"):
+        default = Jinja2Templates(directory=directory)
+        tuned = create_templates(directory, tempfile.mkdtemp())
+        for (template_dir, name), context in CONTEXTS.items():
+            if template_dir != directory:
+                continue
+            rows.append({
+                "template": f"{directory}/{name}",
+                "default_per_sec": renders_per_sec(default, name, context, renders),
+                "tuned_per_sec": renders_per_sec(tuned, name, context, renders),
+            })
+    return rows
+
+
+def bench_startup():
+    rows = []
+    for directory in ("templates", "audit_templates"):
+        cache_dir = tempfile.mkdtemp()
+        for state in ("cold", "warm"):
+            templates = create_templates(directory, cache_dir)
+            started = time.perf_counter()
+            count = precompile(templates)
+            rows.append({
+                "directory": directory,
+                "bytecode_cache": state,
+                "templates": count,
+                "load_ms": (time.perf_counter() - started) * 1000,
+            })
+    return rows
+
+
+def bench_prerendered(renders: int):
+    templates = create_templates("templates", tempfile.mkdtemp())
+    context = CONTEXTS[("templates", "error.html")]
+    page = prerender(templates, "error.html", error=context["error"], code=context["code"])
+    render_rate = renders_per_sec(templates, "error.html", context, renders)
+    started = time.perf_counter()
+    for _ in range(renders):
+        page.encode("utf-8")
+    return [{
+        "page": "error.html 404",
+        "render_per_sec": render_rate,
+        "prerendered_per_sec": renders / (time.perf_counter() - started),
+    }]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--renders", type=int, default=20_000)
+    args = parser.parse_args()
+
+    print_table(bench_renders(args.renders))
+    print()
+    print_table(bench_startup())
+    print()
+    print_table(bench_prerendered(args.renders))
@@ -0,0 +1,90 @@
+"""Скорость генераторов ID транзакций и вставки в большую таблицу.
+
+Без --dsn измеряется только генерация ID/сек. С --dsn создаётся временная
+копия структуры transactions, заполняется --rows строками и замеряется
+скорость вставки новых строк с ID каждого генератора.
+
+    python -m benchmarks.bench_transaction_ids
+    python -m benchmarks.bench_transaction_ids --dsn "dbname=... " --rows 5000000
+"""
+import argparse
+import time
+from datetime import datetime
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from benchmarks.common import print_table
+from database.ids import ID_GENERATORS, get_id_generator
+
+
+def bench_generation(count: int):
+    rows = []
+    for name in ID_GENERATORS:
+        generate = get_id_generator(name)
+        started = time.perf_counter()
+        for _ in range(count):
+            generate()
+        elapsed = time.perf_counter() - started
+        rows.append({"generator": name, "ids_per_sec": count / elapsed})
+    return rows
+
+
+def bench_inserts(dsn: str, prefill: int, inserts: int, batch: int):
+    rows = []
+    conn = psycopg2.connect(dsn)
+    try:
+        for name in ID_GENERATORS:
+            generate = get_id_generator(name)
+            with conn.cursor() as cur:
+                cur.execute("DROP TABLE IF EXISTS bench_transactions")
+                cur.execute("CREATE UNLOGGED TABLE bench_transactions (LIKE transactions INCLUDING ALL)")
+                cur.execute("ALTER TABLE bench_transactions ALTER COLUMN id TYPE TEXT")
+                # Предзаполнение ID того же генератора, чтобы индекс имел реальную форму
+                for offset in range(0, prefill, batch):
+                    execute_values(
+                        cur,
+                        "INSERT INTO bench_transactions (id, amount, timestamp, account_id, merchant_id, status) VALUES %s",
+                        [(generate(), 1, datetime.utcnow(), "a", "b", "completed")
+                         for _ in range(min(batch, prefill - offset))]
+                    )
+                conn.commit()
+
+                started = time.perf_counter()
+                for offset in range(0, inserts, batch):
+                    execute_values(
+                        cur,
+                        "INSERT INTO bench_transactions (id, amount, timestamp, account_id, merchant_id, status) VALUES %s",
+                        [(generate(), 1, datetime.utcnow(), "a", "b", "completed")
+                         for _ in range(min(batch, inserts - offset))]
+                    )
+                    conn.commit()
+                elapsed = time.perf_counter() - started
+                cur.execute("SELECT pg_indexes_size('bench_transactions')")
+                index_bytes = cur.fetchone()[0]
+                cur.execute("DROP TABLE bench_transactions")
+                conn.commit()
+            rows.append({
+                "generator": name,
+                "prefill_rows": prefill,
+                "inserts_per_sec": inserts / elapsed,
+                "index_mb": index_bytes / 1024 / 1024,
+            })
+    finally:
+        conn.close()
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=200_000, help="сколько ID сгенерировать")
+    parser.add_argument("--dsn", default=None)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="предзаполнение таблицы")
+    parser.add_argument("--inserts", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+
+    print_table(bench_generation(args.count))
+    if args.dsn:
+        print()
+        print_table(bench_inserts(args.dsn, args.rows, args.inserts, args.batch))
@@ -0,0 +1,65 @@
+"""Латентность перевода: отдельные запросы против серверной функции transfer_funds.
+
+Перед запуском примените миграции (python -m database.migrate sql/migrations).
+Переводы по 1 идут попеременно в обе стороны, поэтому балансы не меняются.
+
+    python -m benchmarks.bench_transfer_modes --sender-id 1 --receiver-id 2 \
+        --iterations 2000 --concurrency 1,16
+"""
+import argparse
+import asyncio
+import secrets
+import time
+from datetime import datetime
+
+import asyncpg
+
+from benchmarks.common import asyncpg_dsn, print_table, summarize
+from database import transfers
+
+
+async def run_mode(pool, transfer, sender_id, receiver_id, iterations, concurrency):
+    latencies, errors = [], 0
+    counter = iter(range(iterations))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            src, dst = (sender_id, receiver_id) if i % 2 == 0 else (receiver_id, sender_id)
+            started = time.perf_counter()
+            async with pool.acquire() as conn:
+                status_code, _ = await transfer(
+                    conn, secrets.token_urlsafe(16), src, dst, 1, datetime.utcnow()
+                )
+            if status_code == transfers.TRANSFER_OK:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def main(args):
+    pool = await asyncpg.create_pool(args.dsn or asyncpg_dsn(), min_size=1, max_size=max(args.concurrency))
+    rows = []
+    try:
+        for concurrency in args.concurrency:
+            for mode, transfer in transfers.TRANSFER_MODES.items():
+                stats = await run_mode(pool, transfer, args.sender_id, args.receiver_id,
+                                       args.iterations, concurrency)
+                rows.append({"mode": mode, "concurrency": concurrency, **stats})
+    finally:
+        await pool.close()
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sender-id", required=True)
+    parser.add_argument("--receiver-id", required=True)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--concurrency", type=lambda v: [int(c) for c in v.split(",")], default=[1, 16])
+    parser.add_argument("--dsn", default=None)
+    asyncio.run(main(parser.parse_args()))
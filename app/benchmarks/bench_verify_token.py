@@ -0,0 +1,67 @@
+"""Скорость зависимости verify_token из security.py с кэшем проверенных
+токенов и без него (JWT_CACHE_SIZE=0), для каждого доступного бэкенда.
+
+Вызовы идут в процессе, без HTTP и БД: одна сессия повторно приходит
+с тем же cookie, как при просмотре /home и /send_money.
+
+    python -m benchmarks.bench_verify_token --calls 50000
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from jose import jwt
+from starlette.requests import Request
+
+import security
+from benchmarks.common import print_table
+from token_cache import TokenCache, create_backend
+
+
+def make_token(userid: str, true_userid: str) -> str:
+    # Формат /api/login, ключ тот же, что проверяет security.verify_token
+    payload = {"userid": userid, "true_userid": true_userid, "exp": datetime.utcnow() + timedelta(minutes=20)}
+    return jwt.encode(payload, security.SECRET_KEY, algorithm=security.ALGORITHM)
+
+
+def make_request(token: str) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/home",
+        "headers": [(b"cookie", f"session_id={token}".encode("latin-1"))],
+    })
+
+
+def bench(backend, cache_size: int, calls: int, sessions: int):
+    security.token_cache = TokenCache(backend, max_size=cache_size)
+    requests = [make_request(make_token(f"user{i}", str(i))) for i in range(sessions)]
+    started = time.perf_counter()
+    for i in range(calls):
+        security.verify_token(requests[i % sessions])
+    elapsed = time.perf_counter() - started
+    return {
+        "backend": type(backend).__name__,
+        "cache": "off" if cache_size <= 0 else str(cache_size),
+        "calls_per_sec": calls / elapsed,
+        "us_per_call": elapsed / calls * 1_000_000,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=50_000)
+    parser.add_argument("--sessions", type=int, default=100, help="число разных токенов")
+    parser.add_argument("--cache-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    rows = []
+    for backend_name in ("jose", "pyjwt"):
+        try:
+            backend = create_backend(backend_name, security.SECRET_KEY, security.ALGORITHM)
+        except ImportError as e:
+            print(f"{backend_name}: skipped ({e})")
+            continue
+        for cache_size in (0, args.cache_size):
+            rows.append(bench(backend, cache_size, args.calls, args.sessions))
+    print_table(rows)
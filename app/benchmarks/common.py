@@ -0,0 +1,158 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from urllib.parse import quote_plus
+
+from dotenv import load_dotenv
+from jose import jwt
+
+load_dotenv()
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_session_token(userid: str, true_userid: str, minutes: int = 20) -> str:
+    # Токен в том же формате, что выдаёт /api/login
+    payload = {
+        "userid": userid,
+        "true_userid": true_userid,
+        "exp": datetime.utcnow() + timedelta(minutes=minutes)
+    }
+    return jwt.encode(payload, os.environ["SECRET_KEY"], algorithm=os.getenv("ALGORITHM", "HS256"))
+
+
+def asyncpg_dsn() -> str:
+    return (
+        f"postgresql://{os.environ['POSTGRES_USER']}:{quote_plus(os.environ['POSTGRES_PASSWORD'])}"
+        f"@{os.getenv('POSTGRES_HOST', 'localhost')}:{os.environ['POSTGRES_PORT']}/{os.environ['POSTGRES_DB']}"
+    )
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, float]:
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def run_load(call: Callable[[], None], threads: int, duration: float) -> Dict[str, float]:
+    """Вызывает `call` из `threads` потоков в течение `duration` секунд."""
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        nonlocal errors
+        local, local_errors = [], 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                call()
+                local.append(time.perf_counter() - started)
+            except Exception:
+                local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors += local_errors
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def http_call(url: str, method: str = "GET", body: Optional[bytes] = None,
+              cookies: Optional[Dict[str, str]] = None, timeout: float = 10.0,
+              extra_headers: Optional[Dict[str, str]] = None) -> Callable[[], None]:
+    headers = {"Content-Type": "application/json", **(extra_headers or {})}
+    if cookies:
+        headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in cookies.items())
+
+    class _NoRedirect(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args, **kwargs):
+            return None
+
+    opener = urllib.request.build_opener(_NoRedirect)
+
+    def call():
+        request = urllib.request.Request(url, data=body, method=method, headers=headers)
+        try:
+            with opener.open(request, timeout=timeout) as response:
+                response.read()
+        except urllib.error.HTTPError as e:
+            # Редиректы считаем успешным ответом, 5xx - ошибкой
+            if e.code >= 500:
+                raise
+
+    return call
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def uvicorn_server(app: str, workers: int = 1, port: Optional[int] = None, env: Optional[Dict[str, str]] = None):
+    """Запускает uvicorn в отдельном процессе из каталога app/ и ждёт готовности."""
+    port = port or free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=APP_DIR,
+        env={**os.environ, **(env or {})},
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                    break
+            except OSError:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with code {proc.returncode}")
+                time.sleep(0.1)
+        else:
+            raise RuntimeError("uvicorn did not start in time")
+        yield base_url
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def print_table(rows: List[Dict[str, object]]):
+    if not rows:
+        return
+    columns = list(rows[0].keys())
+    widths = {c: max(len(c), *(len(_fmt(r[c])) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(_fmt(row[c]).ljust(widths[c]) for c in columns))
+
+
+def _fmt(value) -> str:
+    return f"{value:.1f}" if isinstance(value, float) else str(value)
@@ -0,0 +1,128 @@
+"""Нагрузочная проверка встречных переводов на локальном Postgres.
+
+Создаёт --accounts тестовых счетов, запускает --transfers случайных
+переводов между ними (в том числе A->B и B->A одновременно) и проверяет:
+сумма балансов не изменилась, отрицательных балансов нет, пропускная
+способность по секундам не проседает. Тестовые данные удаляются в конце.
+
+    python -m benchmarks.stress_transfers --transfers 5000 --concurrency 64 --mode statements
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+import asyncpg
+
+from benchmarks.common import asyncpg_dsn
+from database import transfers
+from database.ids import get_id_generator
+from metrics import metrics
+
+PREFIX = "stress_"
+
+
+async def create_accounts(pool, count: int, balance: int):
+    async with pool.acquire() as conn:
+        await cleanup(conn)
+        await conn.executemany(
+            """INSERT INTO users (user_id, username, hashed_password, name_surname, balance, account_status)
+               VALUES ($1, $1, 'x', 'Stress Test', $2, 'normal')""",
+            [(f"{PREFIX}{i:05d}", balance) for i in range(count)]
+        )
+    return [f"{PREFIX}{i:05d}" for i in range(count)]
+
+
+async def cleanup(conn):
+    await conn.execute(
+        "DELETE FROM transactions WHERE account_id LIKE $1 OR merchant_id LIKE $1", PREFIX + "%"
+    )
+    await conn.execute("DELETE FROM users WHERE user_id LIKE $1", PREFIX + "%")
+
+
+async def balances(pool):
+    async with pool.acquire() as conn:
+        return await conn.fetch("SELECT user_id, balance FROM users WHERE user_id LIKE $1", PREFIX + "%")
+
+
+async def run(args) -> bool:
+    pool = await asyncpg.create_pool(args.dsn or asyncpg_dsn(), min_size=1, max_size=args.concurrency)
+    transfer = transfers.TRANSFER_MODES[args.mode]
+    generate_id = get_id_generator("ulid")
+    outcomes = Counter()
+    per_second = Counter()
+    try:
+        accounts = await create_accounts(pool, args.accounts, args.balance)
+        total_before = sum(row["balance"] for row in await balances(pool))
+        remaining = iter(range(args.transfers))
+        started = time.perf_counter()
+
+        async def worker():
+            for i in remaining:
+                # Половина переводов - точная пара встречных A->B / B->A
+                sender, receiver = random.sample(accounts[:2] if i % 2 else accounts, 2)
+                try:
+                    async with pool.acquire() as conn:
+                        _, status_code, _ = await transfers.run_transfer(
+                            conn, transfer, generate_id, sender, receiver,
+                            random.randint(1, args.max_amount), datetime.utcnow()
+                        )
+                    outcomes[status_code] += 1
+                    per_second[int(time.perf_counter() - started)] += 1
+                except asyncpg.PostgresError as e:
+                    outcomes[type(e).__name__] += 1
+
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        rows = await balances(pool)
+        total_after = sum(row["balance"] for row in rows)
+        negative = [row["user_id"] for row in rows if row["balance"] < 0]
+        throughput = [per_second[s] for s in sorted(per_second)][:-1] or [args.transfers / elapsed]
+        variation = statistics.pstdev(throughput) / statistics.mean(throughput)
+
+        print(f"mode={args.mode} transfers={args.transfers} concurrency={args.concurrency}")
+        print(f"elapsed={elapsed:.2f}s rate={args.transfers / elapsed:.1f}/s "
+              f"per-second min={min(throughput)} max={max(throughput)} cv={variation:.2f}")
+        print(f"outcomes={dict(outcomes)}")
+        print(f"retries={ {k: v for k, v in metrics.snapshot().items() if 'retries' in k} }")
+        print(f"total_before={total_before} total_after={total_after} negative={len(negative)}")
+
+        ok = True
+        if total_before != total_after:
+            print("FAIL: balances are not conserved")
+            ok = False
+        if negative:
+            print(f"FAIL: negative balances: {negative[:10]}")
+            ok = False
+        errors = sum(v for k, v in outcomes.items() if isinstance(k, str))
+        if errors:
+            print(f"FAIL: {errors} transfers failed with database errors")
+            ok = False
+        if variation > args.max_cv:
+            print(f"FAIL: throughput is unstable (cv {variation:.2f} > {args.max_cv})")
+            ok = False
+        return ok
+    finally:
+        if not args.keep:
+            async with pool.acquire() as conn:
+                await cleanup(conn)
+        await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", default=None)
+    parser.add_argument("--mode", choices=list(transfers.TRANSFER_MODES), default="statements")
+    parser.add_argument("--accounts", type=int, default=20)
+    parser.add_argument("--balance", type=int, default=100_000)
+    parser.add_argument("--max-amount", type=int, default=100)
+    parser.add_argument("--transfers", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--max-cv", type=float, default=0.5, help="допустимый разброс rps по секундам")
+    parser.add_argument("--keep", action="store_true", help="не удалять тестовые счета")
+    sys.exit(0 if asyncio.run(run(parser.parse_args())) else 1)
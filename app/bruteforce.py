@@ -0,0 +1,279 @@
+"""Ограничение попыток входа: не больше max_attempts неудачных попыток
+за скользящее окно window секунд (по умолчанию 5 за 20 минут).
+
+Счётчики живут в памяти. InMemoryAttemptLimiter годится для одного
+процесса; при нескольких воркерах uvicorn они обращаются к общему
+серверу счётчиков через unix-сокет (SocketAttemptLimiter), который
+запускается отдельно из каталога app/:
+
+    python bruteforce.py --socket /tmp/bank_app/bruteforce.sock
+
+Команды сервера не аутентифицируются (RESET снимает блокировку любого
+логина), поэтому сокет лежит в каталоге, доступном только владельцу
+(0700), и сам создаётся с правами 0600: подключиться могут только
+процессы того же пользователя.
+
+Таблица bruteforce_protect больше не читается при входе, в неё в
+фоне пишется журнал неудачных попыток (BruteforceAuditWriter).
+"""
+import argparse
+import logging
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Optional
+
+from metrics import metrics
+
+logger = logging.getLogger("bank_app")
+
+
+class AttemptLimiter:
+    """Интерфейс счётчика неудачных попыток входа."""
+
+    def is_blocked(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def record_failure(self, key: str) -> int:
+        """Учитывает неудачную попытку и возвращает число попыток в окне."""
+        raise NotImplementedError
+
+    def reset(self, key: str):
+        raise NotImplementedError
+
+
+class InMemoryAttemptLimiter(AttemptLimiter):
+    def __init__(self, max_attempts: int = 5, window: float = 20 * 60, clock=time.monotonic):
+        self.max_attempts = max_attempts
+        self.window = window
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._attempts: Dict[str, Deque[float]] = {}
+        self._next_eviction = clock() + window
+
+    def _recent(self, key: str, now: float) -> Optional[Deque[float]]:
+        attempts = self._attempts.get(key)
+        if attempts is None:
+            return None
+        while attempts and attempts[0] <= now - self.window:
+            attempts.popleft()
+        if not attempts:
+            del self._attempts[key]
+            return None
+        return attempts
+
+    def _evict_expired(self, now: float):
+        # Раз в окно удаляем ключи, у которых все попытки устарели
+        if now < self._next_eviction:
+            return
+        self._next_eviction = now + self.window
+        for key in list(self._attempts):
+            self._recent(key, now)
+        metrics.set_gauge("bruteforce.tracked_keys", len(self._attempts))
+
+    def is_blocked(self, key: str) -> bool:
+        with self._lock:
+            now = self.clock()
+            self._evict_expired(now)
+            attempts = self._recent(key, now)
+            return attempts is not None and len(attempts) >= self.max_attempts
+
+    def record_failure(self, key: str) -> int:
+        with self._lock:
+            now = self.clock()
+            attempts = self._recent(key, now)
+            if attempts is None:
+                attempts = self._attempts[key] = deque(maxlen=self.max_attempts)
+            attempts.append(now)
+            return len(attempts)
+
+    def reset(self, key: str):
+        with self._lock:
+            self._attempts.pop(key, None)
+
+
+class SocketAttemptLimiter(AttemptLimiter):
+    """Клиент общего сервера счётчиков. Протокол - строки
+    "CHECK key", "FAIL key", "RESET key", ответ - одно число.
+
+    Если сервер недоступен, используется локальный счётчик процесса,
+    чтобы вход не отказывал целиком.
+    """
+
+    def __init__(self, path: str, fallback: AttemptLimiter, timeout: float = 0.5):
+        self.path = path
+        self.fallback = fallback
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _call(self, command: str, key: str) -> Optional[int]:
+        if any(c.isspace() for c in key):
+            raise ValueError("Key must not contain whitespace")
+        for _ in range(2):
+            try:
+                conn = getattr(self._local, "conn", None)
+                if conn is None:
+                    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    sock.settimeout(self.timeout)
+                    sock.connect(self.path)
+                    conn = self._local.conn = sock.makefile("rw", encoding="utf-8")
+                conn.write(f"{command} {key}\n")
+                conn.flush()
+                reply = conn.readline()
+                if reply:
+                    return int(reply)
+                raise ConnectionError("Connection closed by limiter server")
+            except OSError as e:
+                self._local.conn = None
+                last_error = e
+        metrics.increment("bruteforce.socket_errors")
+        logger.error(f"Bruteforce limiter server unavailable, using local counters: {last_error}")
+        return None
+
+    def is_blocked(self, key: str) -> bool:
+        reply = self._call("CHECK", key)
+        return self.fallback.is_blocked(key) if reply is None else bool(reply)
+
+    def record_failure(self, key: str) -> int:
+        reply = self._call("FAIL", key)
+        return self.fallback.record_failure(key) if reply is None else reply
+
+    def reset(self, key: str):
+        if self._call("RESET", key) is None:
+            self.fallback.reset(key)
+
+
+class _LimiterHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        limiter: AttemptLimiter = self.server.limiter
+        for line in self.rfile:
+            command, _, key = line.decode("utf-8").strip().partition(" ")
+            if command == "CHECK":
+                reply = int(limiter.is_blocked(key))
+            elif command == "FAIL":
+                reply = limiter.record_failure(key)
+            elif command == "RESET":
+                limiter.reset(key)
+                reply = 0
+            else:
+                reply = -1
+            self.wfile.write(f"{reply}\n".encode("utf-8"))
+
+
+class LimiterServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, limiter: AttemptLimiter):
+        prepare_socket_dir(os.path.dirname(os.path.abspath(path)))
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, _LimiterHandler)
+        # Каталог закрыт для остальных, так что между bind и chmod к
+        # сокету никто не подключится
+        os.chmod(path, 0o600)
+        self.limiter = limiter
+
+
+def prepare_socket_dir(directory: str):
+    """Создаёт каталог сокета с правами 0700. PermissionError, если
+    каталог чужой или доступен группе или остальным."""
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    st = os.stat(directory)
+    if st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise PermissionError(
+            f"Socket directory {directory} must be owned by uid {os.getuid()} with mode 0700"
+        )
+
+
+class BruteforceAuditWriter:
+    """Фоновая запись неудачных попыток в bruteforce_protect для аудита."""
+
+    def __init__(self, pool, max_queue: int = 10000):
+        self.pool = pool
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="bruteforce-audit", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def record(self, user_id: str, attempted_at: datetime, attempts: int):
+        try:
+            self._queue.put_nowait((user_id, attempted_at, attempts))
+        except queue.Full:
+            metrics.increment("bruteforce.audit_dropped")
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            # Забираем всё накопившееся и пишем одной транзакцией
+            batch = {item[0]: item}
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._write(batch)
+                    return
+                batch[item[0]] = item
+            self._write(batch)
+
+    def _write(self, batch: dict):
+        try:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    for user_id, attempted_at, attempts in batch.values():
+                        cur.execute(
+                            "UPDATE bruteforce_protect SET last_attempt = %s, attempt_value = %s WHERE user_id = %s",
+                            (attempted_at, attempts, user_id)
+                        )
+                        if cur.rowcount == 0:
+                            cur.execute(
+                                "INSERT INTO bruteforce_protect (user_id, last_attempt, attempt_value) VALUES (%s, %s, %s)",
+                                (user_id, attempted_at, attempts)
+                            )
+        except Exception as e:
+            metrics.increment("bruteforce.audit_errors")
+            logger.error(f"Failed to write bruteforce audit: {str(e)}")
+
+
+def create_limiter(backend: str, max_attempts: int, window: float, socket_path: str) -> AttemptLimiter:
+    local = InMemoryAttemptLimiter(max_attempts, window)
+    if backend == "memory":
+        return local
+    if backend == "socket":
+        return SocketAttemptLimiter(socket_path, fallback=local)
+    raise ValueError(f"Unknown BRUTEFORCE_BACKEND: {backend}")
+
+
+if __name__ == "__main__":
+    from settings import settings
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--socket", default=settings.bruteforce_socket_path)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s")
+    server = LimiterServer(args.socket, InMemoryAttemptLimiter(
+        settings.bruteforce_max_attempts, settings.bruteforce_window_minutes * 60
+    ))
+    logger.info(f"Bruteforce limiter listening on {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+        os.unlink(args.socket)
@@ -0,0 +1,40 @@
+import logging
+from typing import Optional
+
+import asyncpg
+
+logger = logging.getLogger("bank_app")
+
+
+class AsyncConnectionPool:
+    """Пул asyncpg-соединений, открывается и закрывается в lifespan приложения."""
+
+    def __init__(self, dsn: str, min_size: int = 2, max_size: int = 20, command_timeout: float = 10.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min={min_size}, max={max_size}")
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.command_timeout = command_timeout
+        self._pool: Optional[asyncpg.Pool] = None
+
+    async def open(self):
+        if self._pool is None:
+            self._pool = await asyncpg.create_pool(
+                self.dsn,
+                min_size=self.min_size,
+                max_size=self.max_size,
+                command_timeout=self.command_timeout
+            )
+            logger.info(f"Async database pool opened: min={self.min_size}, max={self.max_size}")
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+            logger.info("Async database pool closed")
+
+    def acquire(self):
+        if self._pool is None:
+            raise RuntimeError("Async database pool is not open")
+        return self._pool.acquire()
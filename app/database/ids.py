@@ -0,0 +1,99 @@
+import secrets
+import threading
+import time
+import uuid
+from typing import Callable, Dict
+
+# Генераторы ID транзакций. Уникальность гарантирует первичный ключ
+# transactions.id, при конфликте перевод повторяется с новым ID
+# (см. transfers.run_transfer), поэтому проверочные SELECT не нужны.
+
+CROCKFORD_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+
+class TokenIdGenerator:
+    """Случайный 128-битный токен, прежний формат ID."""
+
+    def __call__(self) -> str:
+        return secrets.token_urlsafe(16)
+
+
+class ULIDGenerator:
+    """ULID: 48 бит времени в мс + 80 бит случайности, 26 символов base32.
+
+    Внутри одной миллисекунды случайная часть увеличивается на единицу,
+    так что ID, выданные одним процессом, строго возрастают.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._last_random = 0
+
+    def __call__(self) -> str:
+        with self._lock:
+            ms = time.time_ns() // 1_000_000
+            if ms <= self._last_ms:
+                ms = self._last_ms
+                self._last_random += 1
+                if self._last_random >> 80:
+                    # Переполнение случайной части - занимаем следующую миллисекунду
+                    ms += 1
+                    self._last_random = secrets.randbits(79)
+            else:
+                self._last_random = secrets.randbits(79)
+            self._last_ms = ms
+            value = (ms << 80) | self._last_random
+        return encode_crockford(value, 26)
+
+
+class UUID7Generator:
+    """UUIDv7 (RFC 9562) с 12-битным счётчиком внутри миллисекунды."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._counter = 0
+
+    def __call__(self) -> str:
+        with self._lock:
+            ms = time.time_ns() // 1_000_000
+            if ms <= self._last_ms:
+                ms = self._last_ms
+                self._counter += 1
+                if self._counter > 0xFFF:
+                    ms += 1
+                    self._counter = secrets.randbits(11)
+            else:
+                self._counter = secrets.randbits(11)
+            self._last_ms = ms
+            value = (
+                (ms & 0xFFFF_FFFF_FFFF) << 80
+                | 0x7 << 76
+                | self._counter << 64
+                | 0b10 << 62
+                | secrets.randbits(62)
+            )
+        return str(uuid.UUID(int=value))
+
+
+def encode_crockford(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        chars.append(CROCKFORD_ALPHABET[value & 0x1F])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+ID_GENERATORS: Dict[str, Callable[[], Callable[[], str]]] = {
+    "token": TokenIdGenerator,
+    "ulid": ULIDGenerator,
+    "uuid7": UUID7Generator,
+}
+
+
+def get_id_generator(name: str) -> Callable[[], str]:
+    try:
+        return ID_GENERATORS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown transaction ID generator: {name}")
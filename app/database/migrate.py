@@ -0,0 +1,63 @@
+"""Применяет SQL-миграции из каталога по порядку имён файлов.
+
+Применённые миграции запоминаются в таблице schema_migrations, поэтому
+повторный запуск безопасен. Запуск из каталога app/:
+
+    python -m database.migrate sql/migrations
+    python -m database.migrate audit_db/migrations --dsn "dbname=audit_db ..."
+"""
+import argparse
+import logging
+import os
+from pathlib import Path
+
+import psycopg2
+from dotenv import load_dotenv
+
+logger = logging.getLogger("bank_app")
+
+
+def default_dsn() -> str:
+    load_dotenv()
+    return (
+        f"dbname={os.environ['POSTGRES_DB']} port={os.environ['POSTGRES_PORT']} "
+        f"host={os.getenv('POSTGRES_HOST', 'localhost')} user={os.environ['POSTGRES_USER']} "
+        f"password={os.environ['POSTGRES_PASSWORD']}"
+    )
+
+
+def apply_migrations(dsn: str, directory: str) -> list:
+    applied = []
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS schema_migrations (
+                        name TEXT PRIMARY KEY,
+                        applied_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+                    )
+                """)
+        for path in sorted(Path(directory).glob("*.sql")):
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1 FROM schema_migrations WHERE name = %s", (path.name,))
+                    if cur.fetchone():
+                        continue
+                    cur.execute(path.read_text(encoding="utf-8"))
+                    cur.execute("INSERT INTO schema_migrations (name) VALUES (%s)", (path.name,))
+            logger.info(f"Applied migration {path.name}")
+            applied.append(path.name)
+    finally:
+        conn.close()
+    return applied
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory")
+    parser.add_argument("--dsn", default=None)
+    args = parser.parse_args()
+    for name in apply_migrations(args.dsn or default_dsn(), args.directory):
+        print(name)
@@ -0,0 +1,82 @@
+import logging
+import select
+import threading
+import time
+from typing import Callable, Optional
+
+import psycopg2
+from psycopg2 import extensions
+
+from metrics import metrics
+
+logger = logging.getLogger("bank_app")
+
+
+class NotifyListener:
+    """Фоновый поток LISTEN на одном канале Postgres.
+
+    on_connect(conn) вызывается после каждого (пере)подключения, чтобы
+    догрузить состояние, пропущенное без соединения; on_notify(payload) -
+    на каждое уведомление; on_tick(conn) - не реже раза в poll_interval.
+    При ошибке соединение пересоздаётся.
+    """
+
+    def __init__(
+            self,
+            dsn: Optional[str],
+            channel: str,
+            on_notify: Callable[[str], None],
+            on_connect: Optional[Callable] = None,
+            on_tick: Optional[Callable] = None,
+            poll_interval: float = 1.0,
+            name: str = "notify"
+    ):
+        self.dsn = dsn
+        self.channel = channel
+        self.on_notify = on_notify
+        self.on_connect = on_connect
+        self.on_tick = on_tick
+        self.poll_interval = poll_interval
+        self.name = name
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self.dsn and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-listener", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        conn = None
+        while not self._stop.is_set():
+            try:
+                if conn is None:
+                    conn = psycopg2.connect(self.dsn)
+                    conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                    with conn.cursor() as cur:
+                        cur.execute(f"LISTEN {self.channel}")
+                    # После LISTEN догружаем всё, что могли пропустить без соединения
+                    if self.on_connect is not None:
+                        self.on_connect(conn)
+                if select.select([conn], [], [], self.poll_interval) != ([], [], []):
+                    conn.poll()
+                    while conn.notifies:
+                        self.on_notify(conn.notifies.pop(0).payload)
+                if self.on_tick is not None:
+                    self.on_tick(conn)
+            except (psycopg2.Error, OSError, ValueError) as e:
+                metrics.increment(f"{self.name}.listener_errors")
+                logger.error(f"{self.name} listener error: {str(e)}")
+                if conn is not None:
+                    conn.close()
+                    conn = None
+                self._stop.wait(self.poll_interval)
+        if conn is not None:
+            conn.close()
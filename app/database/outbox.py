@@ -0,0 +1,46 @@
+from typing import List, Tuple
+
+import asyncpg
+
+import json_codec
+
+# Событие для outbox: (топик Kafka, тело сообщения)
+Event = Tuple[str, dict]
+
+# Запись выполняется внутри транзакции перевода (asyncpg), чтение -
+# релеем outbox_relay.py (psycopg2) в своей транзакции.
+
+
+async def insert_event(conn: asyncpg.Connection, topic: str, payload: dict):
+    await conn.execute(
+        "INSERT INTO outbox (topic, payload) VALUES ($1, $2::jsonb)",
+        topic, json_codec.dumps_str(payload)
+    )
+
+
+async def insert_events(conn: asyncpg.Connection, events: List[Event]):
+    await conn.execute(
+        """INSERT INTO outbox (topic, payload)
+           SELECT e.topic, e.payload
+           FROM unnest($1::text[], $2::jsonb[]) WITH ORDINALITY AS e(topic, payload, n)
+           ORDER BY e.n""",
+        [topic for topic, _ in events], [json_codec.dumps_str(payload) for _, payload in events]
+    )
+
+
+def claim_events(cur, limit: int) -> List[Tuple[int, str, dict]]:
+    # Строки, заблокированные другим релеем, пропускаются, поэтому
+    # несколько релеев разбирают outbox параллельно без пересечений.
+    # Удалённые строки вернутся, если транзакция релея откатится.
+    cur.execute(
+        """DELETE FROM outbox
+           WHERE id IN (
+               SELECT id FROM outbox
+               ORDER BY id
+               LIMIT %s
+               FOR UPDATE SKIP LOCKED
+           )
+           RETURNING id, topic, payload""",
+        (limit,)
+    )
+    return sorted(cur.fetchall())
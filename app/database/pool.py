@@ -0,0 +1,134 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2 import pool as pg_pool
+
+logger = logging.getLogger("bank_app")
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Потокобезопасный пул соединений psycopg2.
+
+    Если все соединения заняты, вызывающий ждёт освобождения не дольше
+    `timeout` секунд. Соединение, простоявшее дольше `health_check_interval`,
+    перед выдачей проверяется запросом SELECT 1 и пересоздаётся при ошибке.
+    """
+
+    def __init__(
+            self,
+            dsn: str,
+            min_size: int = 1,
+            max_size: int = 10,
+            timeout: float = 5.0,
+            health_check_interval: float = 30.0
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min={min_size}, max={max_size}")
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._pool: Optional[pg_pool.ThreadedConnectionPool] = None
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._last_used: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def open(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = pg_pool.ThreadedConnectionPool(self.min_size, self.max_size, self.dsn)
+                logger.info(f"Database pool opened: min={self.min_size}, max={self.max_size}")
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+                self._last_used.clear()
+                logger.info("Database pool closed")
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is not None and time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error as e:
+            logger.warning(f"Discarding broken pooled connection: {e}")
+            return False
+
+    def getconn(self):
+        if self._pool is None:
+            self.open()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"No free database connection within {self.timeout}s")
+        try:
+            conn = self._pool.getconn()
+            if not self._is_healthy(conn):
+                self._last_used.pop(id(conn), None)
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+            return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, close: bool = False):
+        try:
+            if not conn.closed and not close:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            close = close or bool(conn.closed)
+            if close:
+                self._last_used.pop(id(conn), None)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+            if self._pool is not None:
+                self._pool.putconn(conn, close=close)
+        except psycopg2.Error as e:
+            logger.error(f"Failed to return connection to pool: {e}")
+            if self._pool is not None:
+                self._pool.putconn(conn, close=True)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        # Коммит при успешном выходе, откат при исключении
+        conn = self.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.putconn(conn)
+
+    def check(self) -> bool:
+        # Проверка доступности БД для healthcheck-эндпоинтов
+        try:
+            with self.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                    return cur.fetchone() == (1,)
+        except Exception as e:
+            logger.error(f"Database health check failed: {e}")
+            return False
@@ -0,0 +1,30 @@
+from urllib.parse import quote_plus
+
+from database.async_pool import AsyncConnectionPool
+from database.pool import ConnectionPool
+from settings import settings
+
+#При установке в докер - поставить надежные данные для аутентификации
+db_pool = ConnectionPool(
+    f"dbname={settings.postgres_db} port={settings.postgres_port} host={settings.postgres_host} "
+    f"user={settings.postgres_user} password={settings.postgres_password}",
+    min_size=settings.db_pool_min_size,
+    max_size=settings.db_pool_max_size,
+    timeout=settings.db_pool_timeout,
+    health_check_interval=settings.db_pool_health_check_interval
+)
+
+
+# Асинхронный пул для эндпоинтов, которые не должны блокировать event loop
+async_db_pool = AsyncConnectionPool(
+    f"postgresql://{settings.postgres_user}:{quote_plus(settings.postgres_password)}"
+    f"@{settings.postgres_host}:{settings.postgres_port}/{settings.postgres_db}",
+    min_size=settings.async_db_pool_min_size,
+    max_size=settings.async_db_pool_max_size
+)
+
+
+# Соединение из пула на время одного запроса
+def get_db():
+    with db_pool.connection() as conn:
+        yield conn
@@ -0,0 +1,316 @@
+import asyncio
+import logging
+import random
+from datetime import datetime
+from decimal import Decimal
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import asyncpg
+
+import json_codec
+
+from database.outbox import Event, insert_event, insert_events
+from metrics import metrics
+
+logger = logging.getLogger("bank_app")
+
+# Коды результата перевода, общие для SQL-функции transfer_funds
+# (sql/migrations/001_transfer_funds.sql) и пошагового пути
+TRANSFER_OK = 0
+SENDER_NOT_FOUND = 1
+RECEIVER_NOT_FOUND = 2
+INSUFFICIENT_FUNDS = 3
+RECEIVER_RESTRICTED = 4
+SENDER_RESTRICTED = 5
+DUPLICATE_ID = 6
+INVALID_AMOUNT = 7
+SELF_TRANSFER = 8
+
+ID_ATTEMPTS = 4
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.01
+
+# Ошибки, после которых транзакцию можно безопасно повторить целиком
+RETRYABLE_ERRORS = {
+    asyncpg.DeadlockDetectedError: "deadlock",
+    asyncpg.SerializationError: "serialization",
+}
+
+# Асинхронные запросы перевода. Функции ниже выполняются внутри
+# conn.transaction(), открытой вызывающим кодом.
+
+
+async def lock_accounts(conn: asyncpg.Connection, *user_ids: str) -> Dict[str, asyncpg.Record]:
+    # Все счета блокируются одним запросом в порядке user_id: встречные
+    # переводы A->B и B->A берут блокировки в одинаковом порядке и не
+    # попадают во взаимоблокировку
+    rows = await conn.fetch(
+        """
+        SELECT user_id, balance, account_status
+        FROM users
+        WHERE user_id = ANY($1::text[])
+        ORDER BY user_id
+        FOR UPDATE
+        """,
+        list(dict.fromkeys(user_ids))
+    )
+    return {row["user_id"]: row for row in rows}
+
+
+async def debit(conn: asyncpg.Connection, user_id: str, amount: int):
+    await conn.execute("UPDATE users SET balance = balance - $1 WHERE user_id = $2", amount, user_id)
+
+
+async def credit(conn: asyncpg.Connection, user_id: str, amount: int):
+    await conn.execute("UPDATE users SET balance = balance + $1 WHERE user_id = $2", amount, user_id)
+
+
+async def insert_transaction(
+        conn: asyncpg.Connection,
+        transaction_id: str,
+        amount: int,
+        timestamp: datetime,
+        account_id: str,
+        merchant_id: str,
+        status: str
+):
+    await conn.execute(
+        """INSERT INTO transactions
+           (id, amount, timestamp, account_id, merchant_id, status)
+           VALUES ($1, $2, $3, $4, $5, $6)""",
+        transaction_id, amount, timestamp, account_id, merchant_id, status
+    )
+
+
+
+async def transfer_with_statements(
+        conn: asyncpg.Connection,
+        transaction_id: str,
+        sender_id: str,
+        receiver_id: str,
+        amount: int,
+        timestamp: datetime,
+        event: Optional[Event] = None
+) -> Tuple[int, Optional[Decimal]]:
+    # Перевод отдельными запросами: блокировка, два UPDATE и INSERT,
+    # событие для Kafka пишется в outbox в той же транзакции
+    async with conn.transaction():
+        accounts = await lock_accounts(conn, sender_id, receiver_id)
+        sender = accounts.get(sender_id)
+        if sender is None:
+            return SENDER_NOT_FOUND, None
+
+        balance = sender["balance"]
+        receiver = accounts.get(receiver_id)
+        if receiver is None:
+            return RECEIVER_NOT_FOUND, balance
+        if balance < amount:
+            return INSUFFICIENT_FUNDS, balance
+        if receiver["account_status"] != "normal":
+            return RECEIVER_RESTRICTED, balance
+        if sender["account_status"] != "normal":
+            return SENDER_RESTRICTED, balance
+
+        await debit(conn, sender_id, amount)
+        await credit(conn, receiver_id, amount)
+        await insert_transaction(conn, transaction_id, amount, timestamp, sender_id, receiver_id, "completed")
+        if event is not None:
+            await insert_event(conn, *event)
+        return TRANSFER_OK, balance - amount
+
+
+async def transfer_via_procedure(
+        conn: asyncpg.Connection,
+        transaction_id: str,
+        sender_id: str,
+        receiver_id: str,
+        amount: int,
+        timestamp: datetime,
+        event: Optional[Event] = None
+) -> Tuple[int, Optional[Decimal]]:
+    # Весь перевод за один round-trip к серверной функции transfer_funds
+    if event is not None:
+        topic, payload = event
+        row = await conn.fetchrow(
+            "SELECT status_code, new_balance FROM transfer_funds_with_event($1, $2, $3, $4, $5, $6, $7::jsonb)",
+            transaction_id, sender_id, receiver_id, amount, timestamp, topic, json_codec.dumps_str(payload)
+        )
+        return row["status_code"], row["new_balance"]
+    row = await conn.fetchrow(
+        "SELECT status_code, new_balance FROM transfer_funds($1, $2, $3, $4, $5)",
+        transaction_id, sender_id, receiver_id, amount, timestamp
+    )
+    return row["status_code"], row["new_balance"]
+
+
+async def transfer_batch(
+        conn: asyncpg.Connection,
+        transaction_ids: List[str],
+        sender_id: str,
+        items: List[Tuple[str, int]],
+        timestamp: datetime,
+        events: Optional[List[Event]] = None
+) -> Tuple[List[int], Optional[Decimal]]:
+    # Пакет переводов одного отправителя в одной транзакции БД.
+    # Получатели проверяются одним запросом, каждый элемент получает свой
+    # код результата, успешные применяются тремя set-based запросами.
+    # events[i] - событие для outbox, если i-й перевод выполнится.
+    async with conn.transaction():
+        accounts = await lock_accounts(conn, sender_id, *(receiver_id for receiver_id, _ in items))
+        sender = accounts.get(sender_id)
+        if sender is None:
+            return [SENDER_NOT_FOUND] * len(items), None
+
+        balance = sender["balance"]
+        statuses = []
+        credits = defaultdict(int)
+        completed = []
+        completed_events = []
+        for index, (transaction_id, (receiver_id, amount)) in enumerate(zip(transaction_ids, items)):
+            receiver = accounts.get(receiver_id)
+            if amount <= 0:
+                status_code = INVALID_AMOUNT
+            elif receiver_id == sender_id:
+                status_code = SELF_TRANSFER
+            elif receiver is None:
+                status_code = RECEIVER_NOT_FOUND
+            elif balance < amount:
+                status_code = INSUFFICIENT_FUNDS
+            elif receiver["account_status"] != "normal":
+                status_code = RECEIVER_RESTRICTED
+            elif sender["account_status"] != "normal":
+                status_code = SENDER_RESTRICTED
+            else:
+                status_code = TRANSFER_OK
+                balance -= amount
+                credits[receiver_id] += amount
+                completed.append((transaction_id, amount, receiver_id))
+                if events is not None:
+                    completed_events.append(events[index])
+            statuses.append(status_code)
+
+        if completed:
+            await debit(conn, sender_id, sender["balance"] - balance)
+            await conn.execute(
+                """UPDATE users AS u
+                   SET balance = u.balance + c.amount
+                   FROM unnest($1::text[], $2::bigint[]) AS c(user_id, amount)
+                   WHERE u.user_id = c.user_id""",
+                list(credits), list(credits.values())
+            )
+            await conn.execute(
+                """INSERT INTO transactions
+                   (id, amount, timestamp, account_id, merchant_id, status)
+                   SELECT t.id, t.amount, $4, $5, t.merchant_id, 'completed'
+                   FROM unnest($1::text[], $2::bigint[], $3::text[]) AS t(id, amount, merchant_id)""",
+                [c[0] for c in completed], [c[1] for c in completed], [c[2] for c in completed],
+                timestamp, sender_id
+            )
+        if completed_events:
+            await insert_events(conn, completed_events)
+        return statuses, balance
+
+
+TRANSFER_MODES = {
+    "statements": transfer_with_statements,
+    "procedure": transfer_via_procedure,
+}
+
+
+class TransactionIdConflict(Exception):
+    pass
+
+
+TransferFunc = Callable[..., Awaitable[Tuple[int, Optional[Decimal]]]]
+
+
+async def call_with_retry(
+        transfer: TransferFunc,
+        conn: asyncpg.Connection,
+        *args,
+        max_retries: int = MAX_RETRIES,
+        backoff: float = RETRY_BACKOFF
+) -> Tuple[int, Optional[Decimal]]:
+    # Повтор при deadlock/serialization failure с экспоненциальной
+    # задержкой и джиттером, число повторов ограничено
+    attempt = 0
+    while True:
+        try:
+            return await transfer(conn, *args)
+        except tuple(RETRYABLE_ERRORS) as e:
+            reason = RETRYABLE_ERRORS[type(e)]
+            if attempt >= max_retries:
+                metrics.increment("transfers.retries_exhausted")
+                logger.error(f"Transfer failed after {attempt} retries: {reason}")
+                raise
+            attempt += 1
+            metrics.increment(f"transfers.retries.{reason}")
+            logger.warning(f"Transfer retry {attempt}/{max_retries} after {reason}")
+            await asyncio.sleep(backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+
+async def run_transfer(
+        conn: asyncpg.Connection,
+        transfer: TransferFunc,
+        generate_id: Callable[[], str],
+        sender_id: str,
+        receiver_id: str,
+        amount: int,
+        timestamp: datetime,
+        attempts: int = ID_ATTEMPTS,
+        max_retries: int = MAX_RETRIES,
+        backoff: float = RETRY_BACKOFF,
+        make_event: Optional[Callable[[str], Event]] = None
+) -> Tuple[str, int, Optional[Decimal]]:
+    # ID не проверяется заранее: при конфликте первичного ключа
+    # перевод повторяется целиком с новым ID.
+    # make_event(transaction_id) строит событие для outbox
+    for _ in range(attempts):
+        transaction_id = generate_id()
+        event = make_event(transaction_id) if make_event else None
+        try:
+            status_code, balance = await call_with_retry(
+                transfer, conn, transaction_id, sender_id, receiver_id, amount, timestamp, event,
+                max_retries=max_retries, backoff=backoff
+            )
+        except asyncpg.UniqueViolationError as e:
+            if e.table_name != "transactions":
+                raise
+            continue
+        if status_code != DUPLICATE_ID:
+            metrics.increment("transfers.completed" if status_code == TRANSFER_OK else "transfers.rejected")
+            return transaction_id, status_code, balance
+    raise TransactionIdConflict(f"Failed to generate unique transaction ID in {attempts} attempts")
+
+
+async def run_batch_transfer(
+        conn: asyncpg.Connection,
+        generate_id: Callable[[], str],
+        sender_id: str,
+        items: List[Tuple[str, int]],
+        timestamp: datetime,
+        attempts: int = ID_ATTEMPTS,
+        max_retries: int = MAX_RETRIES,
+        backoff: float = RETRY_BACKOFF,
+        make_event: Optional[Callable[[int, str], Event]] = None
+) -> Tuple[List[str], List[int], Optional[Decimal]]:
+    # make_event(index, transaction_id) строит событие для i-го перевода
+    for _ in range(attempts):
+        transaction_ids = [generate_id() for _ in items]
+        events = [make_event(i, tid) for i, tid in enumerate(transaction_ids)] if make_event else None
+        try:
+            statuses, balance = await call_with_retry(
+                transfer_batch, conn, transaction_ids, sender_id, items, timestamp, events,
+                max_retries=max_retries, backoff=backoff
+            )
+        except asyncpg.UniqueViolationError as e:
+            if e.table_name != "transactions":
+                raise
+            continue
+        completed = statuses.count(TRANSFER_OK)
+        metrics.increment("transfers.completed", completed)
+        metrics.increment("transfers.rejected", len(statuses) - completed)
+        metrics.increment("transfers.batches")
+        return transaction_ids, statuses, balance
+    raise TransactionIdConflict(f"Failed to generate unique transaction IDs in {attempts} attempts")
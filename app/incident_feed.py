@@ -0,0 +1,295 @@
+"""Лента инцидентов для audit.py.
+
+Один фоновый поток (IncidentIngestor) читает топик инцидентов и
+складывает сообщения в IncidentBuffer - кольцевой массив на capacity
+последних инцидентов. Каждому инциденту присваивается сквозной номер
+offset, общий для всех партиций, поэтому все аудиторы видят один и тот
+же поток и читают его курсором "с offset N" прямо из памяти.
+IncidentBroadcaster отдаёт тот же буфер подключённым клиентам как SSE.
+
+Consumer работает без consumer group и ничего не коммитит: при старте
+каждая партиция перематывается на последние capacity сообщений, так что
+буфер заполняется свежей историей, а номера offset начинаются с нуля.
+Поэтому offset имеет смысл только вместе с epoch - случайным
+идентификатором буфера, новым при каждом старте процесса: курсор
+другой эпохи (после рестарта или с другого экземпляра) указывает на
+другие инциденты, и читать по нему нельзя.
+"""
+import asyncio
+import logging
+import secrets
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from kafka import KafkaConsumer
+from kafka.structs import TopicPartition
+
+import json_codec
+from metrics import metrics
+
+logger = logging.getLogger("security")
+
+
+class IncidentBuffer:
+    def __init__(self, capacity: int = 10000, epoch: Optional[str] = None):
+        if capacity < 1:
+            raise ValueError(f"Invalid incident buffer capacity: {capacity}")
+        self.capacity = capacity
+        self.epoch = epoch or secrets.token_hex(8)
+        self._items: List[Any] = [None] * capacity
+        self._next = 0
+        self._lock = threading.Lock()
+
+    @property
+    def next_offset(self) -> int:
+        return self._next
+
+    @property
+    def first_offset(self) -> int:
+        return max(0, self._next - self.capacity)
+
+    def append(self, incident: dict) -> int:
+        with self._lock:
+            offset = self._next
+            self._items[offset % self.capacity] = {"offset": offset, **incident}
+            self._next = offset + 1
+        metrics.set_gauge("incidents.buffer_size", min(self._next, self.capacity))
+        return offset
+
+    def since(self, offset: int, limit: int) -> Tuple[List[dict], int]:
+        """Инциденты начиная с offset (не больше limit) и курсор следующего
+        чтения. Если offset уже вытеснен, чтение начинается с самого старого."""
+        with self._lock:
+            start = min(max(offset, self.first_offset), self._next)
+            end = min(start + max(limit, 0), self._next)
+            items = [self._items[i % self.capacity] for i in range(start, end)]
+        return items, end
+
+    def latest(self, limit: int) -> Tuple[List[dict], int]:
+        with self._lock:
+            start = max(self.first_offset, self._next - max(limit, 0))
+        return self.since(start, limit)
+
+
+def create_incident_consumer(bootstrap_servers: str) -> KafkaConsumer:
+    return KafkaConsumer(
+        bootstrap_servers=bootstrap_servers.split(","),
+        enable_auto_commit=False,
+        group_id=None
+    )
+
+
+def decode_incident(value: bytes) -> Optional[dict]:
+    try:
+        incident = json_codec.loads(value)
+    except ValueError as e:
+        logger.error(f"Failed to decode incident: {e}")
+        return None
+    return incident if isinstance(incident, dict) else {"value": incident}
+
+
+class IncidentIngestor:
+    def __init__(
+            self,
+            buffer: IncidentBuffer,
+            topic: str,
+            consumer_factory: Callable[[], KafkaConsumer],
+            poll_timeout_ms: int = 1000,
+            reconnect_interval: float = 5.0,
+            on_ingest: Optional[Callable[[], None]] = None
+    ):
+        self.buffer = buffer
+        self.topic = topic
+        self.consumer_factory = consumer_factory
+        self.poll_timeout_ms = poll_timeout_ms
+        self.reconnect_interval = reconnect_interval
+        self.on_ingest = on_ingest
+        # Следующий offset Kafka по партициям: после переподключения
+        # продолжаем с него, а не перечитываем хвост заново
+        self._positions: Dict[int, int] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="incident-ingestor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=self.poll_timeout_ms / 1000 + 5)
+            self._thread = None
+
+    def _assign_tail(self, consumer: KafkaConsumer):
+        partitions = consumer.partitions_for_topic(self.topic)
+        if not partitions:
+            raise RuntimeError(f"Topic {self.topic} not found")
+        assigned = [TopicPartition(self.topic, p) for p in sorted(partitions)]
+        consumer.assign(assigned)
+        beginning = consumer.beginning_offsets(assigned)
+        end = consumer.end_offsets(assigned)
+        tail = max(1, self.buffer.capacity // len(assigned))
+        for tp in assigned:
+            position = self._positions.get(tp.partition, end[tp] - tail)
+            consumer.seek(tp, max(beginning[tp], position))
+
+    def ingest(self, records):
+        for record in records:
+            self._positions[record.partition] = record.offset + 1
+            incident = decode_incident(record.value)
+            if incident is None:
+                metrics.increment("incidents.decode_errors")
+                continue
+            self.buffer.append(incident)
+            metrics.increment("incidents.ingested")
+
+    def _run(self):
+        consumer = None
+        while not self._stop.is_set():
+            try:
+                if consumer is None:
+                    consumer = self.consumer_factory()
+                    self._assign_tail(consumer)
+                    logger.warning(f"Incident ingestion started on {self.topic}")
+                polled = consumer.poll(timeout_ms=self.poll_timeout_ms)
+                for tp in sorted(polled, key=lambda tp: tp.partition):
+                    self.ingest(polled[tp])
+                if polled and self.on_ingest is not None:
+                    self.on_ingest()
+            except Exception as e:
+                metrics.increment("incidents.ingest_errors")
+                logger.error(f"Incident ingestion error: {e}")
+                if consumer is not None:
+                    try:
+                        consumer.close()
+                    except Exception:
+                        pass
+                    consumer = None
+                self._stop.wait(self.reconnect_interval)
+        if consumer is not None:
+            consumer.close()
+
+
+def format_event_id(epoch: str, offset: int) -> str:
+    return f"{epoch}:{offset}"
+
+
+def parse_event_id(value: str) -> Tuple[Optional[str], int]:
+    """(epoch, offset) из Last-Event-ID. ValueError, если offset не число;
+    id без эпохи (старый формат) даёт epoch None."""
+    epoch, _, offset = value.rpartition(":")
+    return epoch or None, int(offset)
+
+
+class StreamClient:
+    def __init__(self, cursor: int):
+        self.cursor = cursor
+
+
+class IncidentBroadcaster:
+    """Рассылка новых инцидентов подключённым к потоку клиентам.
+
+    Клиенты не получают копий: у каждого только курсор в общем буфере,
+    а поток ingestion после каждой пачки будит всех ожидающих одним
+    asyncio.Event. Очередь клиента ограничена max_lag - если он отстал
+    от головы буфера сильнее, соединение закрывается, и клиент
+    переподключается с Last-Event-ID.
+
+    id события - "epoch:offset". Если Last-Event-ID из другой эпохи
+    буфера, клиент получает event: reset и дальше - новые инциденты.
+    id самого reset указывает на голову буфера, чтобы переподключение
+    после него не упиралось в тот же сброс.
+    """
+
+    def __init__(self, buffer: IncidentBuffer, max_lag: int = 1000, batch_size: int = 100,
+                 keepalive: float = 15.0):
+        self.buffer = buffer
+        self.max_lag = max_lag
+        self.batch_size = batch_size
+        self.keepalive = keepalive
+        self.clients: Set[StreamClient] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._event: Optional[asyncio.Event] = None
+        self._notified_at: Optional[float] = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._event = asyncio.Event()
+
+    def notify(self):
+        """Вызывается из потока ingestion после добавления пачки."""
+        if self._loop is None or self._notified_at is not None:
+            return
+        self._notified_at = time.monotonic()
+        try:
+            self._loop.call_soon_threadsafe(self._fan_out)
+        except RuntimeError:
+            # Цикл событий уже закрыт при остановке приложения
+            self._notified_at = None
+
+    def _fan_out(self):
+        notified_at, self._notified_at = self._notified_at, None
+        if notified_at is not None:
+            metrics.set_gauge("incidents.stream_fanout_lag_ms", (time.monotonic() - notified_at) * 1000)
+        head = self.buffer.next_offset
+        metrics.set_gauge(
+            "incidents.stream_max_client_lag",
+            max((head - client.cursor for client in self.clients), default=0)
+        )
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    def _reset(self, head: int) -> str:
+        return f"id: {format_event_id(self.buffer.epoch, head - 1)}\nevent: reset\ndata: {{}}\n\n"
+
+    async def stream(
+            self,
+            last_event_id: Optional[Tuple[Optional[str], int]] = None,
+            is_active: Optional[Callable[[], Awaitable[bool]]] = None
+    ) -> AsyncIterator[str]:
+        """События SSE: сначала пропущенные после last_event_id (epoch,
+        offset), затем новые. is_active проверяется при каждом пробуждении
+        и keepalive - когда сессия отозвана или истекла, поток закрывается."""
+        head = self.buffer.next_offset
+        if last_event_id is None:
+            client, reset = StreamClient(head), False
+        elif last_event_id[0] != self.buffer.epoch:
+            client, reset = StreamClient(head), True
+        else:
+            client, reset = StreamClient(last_event_id[1] + 1), False
+        self.clients.add(client)
+        metrics.set_gauge("incidents.stream_clients", len(self.clients))
+        try:
+            if reset:
+                metrics.increment("incidents.stream_epoch_resets")
+                yield self._reset(head)
+            while True:
+                if is_active is not None and not await is_active():
+                    metrics.increment("incidents.stream_closed_sessions")
+                    return
+                head = self.buffer.next_offset
+                if client.cursor < self.buffer.first_offset or head - client.cursor > self.max_lag:
+                    metrics.increment("incidents.stream_dropped_clients")
+                    logger.warning(f"Dropping slow incident stream client, lag {head - client.cursor}")
+                    yield self._reset(head)
+                    return
+                items, client.cursor = self.buffer.since(client.cursor, self.batch_size)
+                if items:
+                    metrics.increment("incidents.stream_sent", len(items))
+                    epoch = self.buffer.epoch
+                    yield "".join(
+                        f"id: {format_event_id(epoch, item['offset'])}\nevent: incident\n"
+                        f"data: {json_codec.dumps_str(item)}\n\n"
+                        for item in items
+                    )
+                    continue
+                try:
+                    await asyncio.wait_for(self._event.wait(), self.keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            self.clients.discard(client)
+            metrics.set_gauge("incidents.stream_clients", len(self.clients))
@@ -0,0 +1,134 @@
+"""Список разрешённых сетей для audit.py.
+
+Сети из ALLOWED_IPS (и файла ALLOWED_IPS_FILE, по одной на строку)
+компилируются один раз в отсортированную таблицу непересекающихся
+диапазонов целых чисел для IPv4 и IPv6. Проверка адреса - двоичный
+поиск, O(log n) от числа сетей, без создания объектов ip_network.
+
+Файл перечитывается без перезапуска: не чаще раза в reload_interval
+секунд сравнивается его mtime, при изменении таблица собирается заново
+и подменяется целиком. Ошибка в файле не сбрасывает действующий список.
+"""
+import ipaddress
+import logging
+import os
+import threading
+import time
+from bisect import bisect_right
+from typing import Iterable, List, Optional, Tuple
+
+from metrics import metrics
+
+logger = logging.getLogger("security")
+
+ALLOWED = "allowed"
+DENIED = "denied"
+INVALID = "invalid"
+
+
+class RangeTable:
+    """Отсортированные непересекающиеся диапазоны [start, end]."""
+
+    def __init__(self, ranges: Iterable[Tuple[int, int]]):
+        merged: List[List[int]] = []
+        for start, end in sorted(ranges):
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self.starts = [start for start, _ in merged]
+        self.ends = [end for _, end in merged]
+
+    def __contains__(self, value: int) -> bool:
+        index = bisect_right(self.starts, value) - 1
+        return index >= 0 and value <= self.ends[index]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+
+class IPAllowList:
+    def __init__(self, networks: Iterable[str]):
+        v4, v6 = [], []
+        for item in networks:
+            item = item.strip()
+            if not item or item.startswith("#"):
+                continue
+            network = ipaddress.ip_network(item, strict=False)
+            target = v4 if network.version == 4 else v6
+            target.append((int(network.network_address), int(network.broadcast_address)))
+        self.v4 = RangeTable(v4)
+        self.v6 = RangeTable(v6)
+
+    @classmethod
+    def from_string(cls, spec: str) -> "IPAllowList":
+        return cls(spec.split(","))
+
+    def __contains__(self, ip: str) -> bool:
+        """ValueError, если ip - не адрес."""
+        address = ipaddress.ip_address(ip)
+        if address.version == 6 and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+        table = self.v4 if address.version == 4 else self.v6
+        return int(address) in table
+
+
+class ReloadableAllowList:
+    def __init__(self, spec: str, path: Optional[str] = None, reload_interval: float = 5.0,
+                 clock=time.monotonic):
+        self.spec = spec
+        self.path = path or None
+        self.reload_interval = reload_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self.allow_list = self._build()
+        # Счётчики решений видны в /metrics с нулями до первого запроса
+        for decision in (ALLOWED, DENIED, INVALID):
+            metrics.increment(f"ip_allowlist.{decision}", 0)
+
+    def _build(self) -> IPAllowList:
+        networks = self.spec.split(",")
+        if self.path:
+            with open(self.path, encoding="utf-8") as f:
+                networks += f.read().splitlines()
+            self._mtime = os.stat(self.path).st_mtime
+        allow_list = IPAllowList(networks)
+        metrics.set_gauge("ip_allowlist.ranges", len(allow_list.v4) + len(allow_list.v6))
+        return allow_list
+
+    def reload(self):
+        try:
+            allow_list = self._build()
+        except (OSError, ValueError) as e:
+            metrics.increment("ip_allowlist.reload_errors")
+            logger.error(f"Failed to reload IP allow-list, keeping previous one: {e}")
+            return
+        self.allow_list = allow_list
+        logger.warning(f"IP allow-list reloaded: {len(allow_list.v4) + len(allow_list.v6)} ranges")
+
+    def _maybe_reload(self):
+        now = self.clock()
+        if not self.path or now < self._next_check:
+            return
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.reload_interval
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                return
+            if mtime != self._mtime:
+                self.reload()
+
+    def decide(self, ip: str) -> str:
+        """Решение по адресу клиента: allowed, denied или invalid."""
+        self._maybe_reload()
+        try:
+            decision = ALLOWED if ip in self.allow_list else DENIED
+        except ValueError:
+            decision = INVALID
+        metrics.increment(f"ip_allowlist.{decision}")
+        return decision
@@ -0,0 +1,42 @@
+"""JSON для тел запросов, событий Kafka и outbox.
+
+JSON_BACKEND: orjson - orjson (pip install orjson), json - стандартный
+модуль, auto - orjson, если установлен. Ошибки разбора в обоих случаях
+наследуют json.JSONDecodeError.
+"""
+import json
+from typing import Any, Union
+
+from settings import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if settings.json_backend not in ("auto", "orjson", "json"):
+    raise ValueError(f"Unknown JSON_BACKEND: {settings.json_backend}")
+if settings.json_backend == "orjson" and orjson is None:
+    raise ValueError("JSON_BACKEND=orjson requires the orjson package")
+
+BACKEND = "orjson" if orjson is not None and settings.json_backend != "json" else "json"
+
+
+if BACKEND == "orjson":
+    def loads(data: Union[bytes, str]) -> Any:
+        return orjson.loads(data)
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    def dumps_str(obj: Any) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+else:
+    def loads(data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+    def dumps_str(obj: Any) -> str:
+        return json.dumps(obj)
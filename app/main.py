@@ -2,55 +2,27 @@ from pydantic import BaseModel
 from fastapi import FastAPI, Request, Response, status, Depends, HTTPException
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-import secrets
-import psycopg2
 from fastapi.responses import FileResponse, JSONResponse
 from fastapi.exceptions import RequestValidationError
-#from models.transaction import Transaction
-#from api.v1.transactions import TransactionCreate
-from datetime import datetime
 from starlette.responses import HTMLResponse, FileResponse, RedirectResponse
 from datetime import datetime, timezone, timedelta
-from jose import JWTError, jwt
-from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
+from jose import jwt
 import logging
+import secrets
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
-from kafka import KafkaProducer
-from kafka.errors import KafkaError
-import json
-from pydantic_settings import BaseSettings
-from pydantic import Field
-
-class Settings(BaseSettings):
-    secret_key: str = Field(..., env="SECRET_KEY")
-    algorithm: str = Field("HS256", env="ALGORITHM")
-    access_token_expire_minutes: int = Field(20, env="ACCESS_TOKEN_EXPIRE_MINUTES")
-
-    postgres_host: str = Field("db", env="POSTGRES_HOST")
-    postgres_port: int = Field(..., env="POSTGRES_PORT")
-    postgres_db: str = Field(..., env="POSTGRES_DB")
-    postgres_user: str = Field(..., env="POSTGRES_USER")
-    postgres_password: str = Field(..., env="POSTGRES_PASSWORD")
-
-    kafka_bootstrap_servers: str = Field("kafka:9092", env="KAFKA_BOOTSTRAP_SERVERS")
-    kafka_topic: str = Field("incidents", env="KAFKA_TOPIC")
-
-    allowed_hosts: str = Field("127.0.0.1,localhost", env="ALLOWED_HOSTS")
-    allowed_ips: str = Field("127.0.0.1,192.168.1.0/24", env="ALLOWED_IPS")
-
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
-        extra = "allow"
-
-settings = Settings()
-
-#Настройка кафки
-Kafka_bootstrap_servers="localhost:9092"
-Kafka_audit_topic="audit_logs"
-Kafka_transaction_topic="transaction"
+from contextlib import asynccontextmanager
+from security import SECRET_KEY, ALGORITHM, revocation_cache, token_cache, verify_token
+from passwords import PasswordQueueFull, password_verifier
+from bruteforce import BruteforceAuditWriter, create_limiter
+from user_cache import UserCache
+from rendering import create_templates, precompile, prerender
+from settings import settings
+from database.session import db_pool, async_db_pool, get_db
+from metrics import metrics
+from producer import publisher
+from api.v1.transactions import router as transactions_router
+from api.body import JSONBodyRoute
 
 #Настройка логгера
 def setup_logger():
@@ -84,104 +56,89 @@ def setup_logger():
 
 logger = setup_logger()
 
-SECRET_KEY = "_caE+)3J3^8Lb&u$xaPVemEJj8RpV3"
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 20
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-#!!!ОБЯЗАТЕЛЬНО СЕКРЕТНЫЙ КЛЮЧ УБРАТЬ ИЗ КОДА В ENVIRONMENT!!!
-
-def create_access_token(data: dict) -> str:
-    to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
-
-
-def verify_token(request: Request)  -> tuple[str, str]:
-    token = request.cookies.get("session_id")
-    if not token:
-        raise HTTPException(status_code=303, headers={"Location": "/login"})
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("userid")
-        true_user_id: str = payload.get("true_userid")
-        if not user_id:
-            raise JWTError()
-        return user_id, true_user_id
-    except JWTError:
-        logger.warning('Invalid or expired token')
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired token",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
-
-#Создаем Kafka_Producer
-def create_kafka_producer():
-    try:
-        producer = KafkaProducer(
-            bootstrap_servers=Kafka_bootstrap_servers,
-            value_serializer=lambda v: json.dumps(v).encode('utf-8'),
-            acks='all',
-            retries=3,
-            max_in_flight_requests_per_connection=1,
-            request_timeout_ms=30000,
-            linger_ms=5
-        )
-        return producer
-    except Exception as e:
-        logger.error(f"Failed to create Kafka producer: {str(e)}")
-producer = create_kafka_producer()
-async def send_kafka(topic, massage):
-    try:
-        future = producer.send(topic, value=massage)
-        metadata = future.get(timeout=10)
-        logger.info(f"Message sent to Kafka: topic = {metadata.topic}, "
-                    f"partition = {metadata.partition}, "
-                    f"offest = {metadata.offset}")
-        return True
-    except  KafkaError as e:
-        logger.error(f"Failed to send massage to kafka: {str(e)}")
-        return False
-
-conn = psycopg2.connect(f"dbname={settings.postgres_db} port=5430 host=localhost user={settings.postgres_user} password={settings.postgres_password}")
-#При установке в докер - поставить надежные данные для аутентификации
-cur = conn.cursor()
-class TransactionNew(BaseModel):
-    amount: int
-    receiver_id: str
-
 class LoginPass(BaseModel):
     login: str
     password: str
 
+login_limiter = create_limiter(
+    settings.bruteforce_backend,
+    settings.bruteforce_max_attempts,
+    settings.bruteforce_window_minutes * 60,
+    settings.bruteforce_socket_path
+)
+bruteforce_audit = BruteforceAuditWriter(db_pool)
+
+
+def load_profile(username: str, cur, fresh: dict):
+    # Промах читает и баланс тем же запросом: он отдаётся в fresh и не кэшируется
+    cur.execute("SELECT name_surname, account_status, balance FROM users WHERE username = %s", (username,))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    fresh["balance"] = row[2]
+    return row[0], row[1]
+
+
+# Имя и статус счёта по username. Баланс сюда не входит и читается из БД
+# на каждой странице: после перевода он должен быть виден сразу в любом воркере
+profile_cache = UserCache(load_profile, ttl=settings.profile_cache_ttl, dsn=db_pool.dsn, name="profile_cache")
+
+
+def read_balance(cur, username: str):
+    cur.execute("SELECT balance FROM users WHERE username = %s", (username,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def read_profile(cur, username: str):
+    """(name_surname, account_status, balance) или None. Один запрос на
+    страницу: при промахе - вся строка, при попадании - только баланс."""
+    fresh = {}
+    profile = profile_cache.get(username, cur, fresh)
+    if profile is None:
+        return None
+    balance = fresh["balance"] if "balance" in fresh else read_balance(cur, username)
+    if balance is None:
+        return None
+    return profile[0], profile[1], balance
+
 #def write_invalid_transaction():
 #доделать функцию записи невалидных транзакций в таблицу.
 #в таблице добавить новые столбцы
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db_pool.open()
+    await async_db_pool.open()
+    await publisher.start()
+    bruteforce_audit.start()
+    revocation_cache.start()
+    profile_cache.start()
+    precompile(templates)
+    yield
+    # Сначала досылаем события из очереди, потом закрываем пулы
+    await publisher.stop()
+    bruteforce_audit.stop()
+    revocation_cache.stop()
+    profile_cache.stop()
+    await async_db_pool.close()
+    db_pool.close()
+
+
+app = FastAPI(lifespan=lifespan)
+# Тела запросов разбираются один раз через json_codec
+app.router.route_class = JSONBodyRoute
 
 @app.exception_handler(404)
 async def not_found_handler(request: Request, exc: HTTPException):
     logger.warning(f"404 Not Found: {request.url}")
-    return templates.TemplateResponse(
-        "error.html",
-        {"request": request, "error": "Страница не найдена", "code" : 404},
-        status_code=404
-    )
+    return HTMLResponse(ERROR_PAGES[404], status_code=404)
 
 @app.exception_handler(500)
 async def server_error_handler(request: Request, exc: HTTPException):
     logger.warning(f"500 Server Error: {str(exc)}")
-    return templates.TemplateResponse(
-        "error.html",
-        {"request": request, "error": "Внутренняя ошибка сервера", "code" : 500},
-        status_code=500
-    )
+    return HTMLResponse(ERROR_PAGES[500], status_code=500)
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -201,9 +158,17 @@ async def auth_exception_handler(request: Request, exc: HTTPException):
     # остальные HTTPException передаём дальше
     return JSONResponse({"detail": exc.detail}, status_code=exc.status_code)
 
+app.include_router(transactions_router)
+
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-templates = Jinja2Templates(directory="templates")
+templates = create_templates("templates", settings.templates_bytecode_cache_dir, settings.templates_auto_reload)
+
+# Страницы ошибок не зависят от запроса, рендерим их один раз
+ERROR_PAGES = {
+    404: prerender(templates, "error.html", error="Страница не найдена", code=404),
+    500: prerender(templates, "error.html", error="Внутренняя ошибка сервера", code=500),
+}
 
 
 @app.get("/favicon.ico")
@@ -211,6 +176,18 @@ def read_favicon():
     return FileResponse(path="favicon.ico", media_type="image/x-icon")
 
 
+@app.get("/health")
+def health_check():
+    if not db_pool.check():
+        return JSONResponse(status_code=503, content={"status": "unavailable"})
+    return {"status": "ok"}
+
+
+@app.get("/metrics")
+def read_metrics():
+    return metrics.snapshot()
+
+
 @app.get("/", response_class=HTMLResponse)
 def read_root(request: Request):
     return RedirectResponse("/home")
@@ -227,314 +204,145 @@ def login_page(request: Request):
     return templates.TemplateResponse("login.html", {"request": request})
 
 @app.post("/api/logout")
-async def logout(response: Response, request: Request, token_data: tuple[str, str] = Depends(verify_token),):
-    try:
-        user_id, true_user_id = token_data
-        token = request.cookies.get("session_id")
-        logger.info(f"User {user_id} logging out")
-        cur.execute("DELETE FROM active_session WHERE token = %s", (token,))
-        conn.commit()
+def logout(response: Response, request: Request, token_data: tuple[str, str] = Depends(verify_token), conn=Depends(get_db)):
+    with conn.cursor() as cur:
+        try:
+            user_id, true_user_id = token_data
+            token = request.cookies.get("session_id")
+            logger.info(f"User {user_id} logging out")
+            cur.execute("DELETE FROM active_session WHERE token = %s", (token,))
+            token_cache.evict(token)
+            claims = jwt.get_unverified_claims(token)
+            if claims.get("jti"):
+                revocation_cache.revoke(conn, claims["jti"], datetime.utcfromtimestamp(claims["exp"]))
+            conn.commit()
 
-        response = RedirectResponse("/login", status_code=status.HTTP_303_SEE_OTHER)
-        response.delete_cookie("session_id")
-        return response
-    except Exception as e:
-        logger.error(f"Logout error: {str(e)}")
-        raise
+            response = RedirectResponse("/login", status_code=status.HTTP_303_SEE_OTHER)
+            response.delete_cookie("session_id")
+            return response
+        except Exception as e:
+            logger.error(f"Logout error: {str(e)}")
+            raise
 
 @app.get("/send_money", response_class=HTMLResponse)
-def panel_page(request: Request, token_data: tuple[str, str] = Depends(verify_token),
+def panel_page(request: Request, token_data: tuple[str, str] = Depends(verify_token), conn=Depends(get_db),
 ):
-    user_id, true_user_id = token_data
-    cur.execute("SELECT username, name_surname, balance FROM users WHERE username = %s", (user_id,))
-    row = cur.fetchone()
-    user_id = row[0]
-    name_surname = row[1]
-    balance = row[2]
-    if user_id is not None and name_surname:
-        return templates.TemplateResponse("sending_page.html", {
-            "request": request,
-            "fullname": name_surname,
-            "balance": balance
-        })
-    logger.warning("user_id or name_surname is empty")
-    return RedirectResponse("/login")
+    with conn.cursor() as cur:
+        user_id, true_user_id = token_data
+        profile = read_profile(cur, user_id)
+        if profile is not None and profile[0]:
+            name_surname, _, balance = profile
+            return templates.TemplateResponse("sending_page.html", {
+                "request": request,
+                "fullname": name_surname,
+                "balance": balance
+            })
+        logger.warning("user_id or name_surname is empty")
+        return RedirectResponse("/login")
 
 
 
 @app.get("/home", response_class=HTMLResponse)
-def home_page(request: Request, token_data: tuple[str, str] = Depends(verify_token),
+def home_page(request: Request, token_data: tuple[str, str] = Depends(verify_token), conn=Depends(get_db),
 ):
-    user_id, true_user_id = token_data
-    try:
-        cur.execute("SELECT username, name_surname, balance, account_status FROM users WHERE username = %s", (user_id,))
-        row = cur.fetchone()
-        if not row:
-            logger.error(f"User {user_id} not found in database")
-            return RedirectResponse("/login")
-
-        user_id, name_surname, balance, account_status = row
-        if account_status != "normal":
-            restrict_warning = "Ваш аккаунт имеет ограничения на осуществление операций. Обратитесь в службу поддержки."
-        else:
-            restrict_warning = None
-
-        logger.debug(f"User {user_id} accessing home page")
-
-        return templates.TemplateResponse("home.html", {
-            "request": request,
-            "fullname": name_surname,
-            "balance": balance,
-            "restrict_warning": restrict_warning
-        })
-    except Exception as e:
-        logger.error(f"Home page error: {str(e)}")
-        raise
+    with conn.cursor() as cur:
+        user_id, true_user_id = token_data
+        try:
+            profile = read_profile(cur, user_id)
+            if profile is None:
+                logger.error(f"User {user_id} not found in database")
+                return RedirectResponse("/login")
+
+            name_surname, account_status, balance = profile
+            if account_status != "normal":
+                restrict_warning = "Ваш аккаунт имеет ограничения на осуществление операций. Обратитесь в службу поддержки."
+            else:
+                restrict_warning = None
+
+            logger.debug(f"User {user_id} accessing home page")
+
+            return templates.TemplateResponse("home.html", {
+                "request": request,
+                "fullname": name_surname,
+                "balance": balance,
+                "restrict_warning": restrict_warning
+            })
+        except Exception as e:
+            logger.error(f"Home page error: {str(e)}")
+            raise
 
 @app.post("/api/login")
-def try_login(auth: LoginPass, request: Request):
-    try:
-        if auth.login and auth.password:
-            now = datetime.now(timezone.utc)
-            cur.execute("SELECT hashed_password, user_id FROM users WHERE username = %s", (auth.login,))
-            row = cur.fetchone()
-            if not row:
-                logger.warning(f"Failed login attempt - user not found: {auth.login}")
-                return RedirectResponse(url="/login", status_code=status.HTTP_403_FORBIDDEN)
-            stored_hash = row[0]
-            true_user_id = row[1]
-            cur.execute("SELECT user_id, last_attempt, attempt_value FROM bruteforce_protect WHERE user_id = %s", (true_user_id,))
-            check_brute = cur.fetchone()
-            if check_brute:
-                attempt_time = check_brute[1]
-                attempt_number = check_brute[2]
-                if now - attempt_time >= timedelta(minutes=20):
-                    cur.execute("DELETE FROM bruteforce_protect WHERE user_id = %s", (true_user_id,))
-                    conn.commit()
-
-                # 2) иначе, если попыток уже >= 5 — блокировка
-                elif attempt_number >= 5:
+def try_login(auth: LoginPass, request: Request, conn=Depends(get_db)):
+    with conn.cursor() as cur:
+        try:
+            if auth.login and auth.password:
+                now = datetime.now(timezone.utc)
+                cur.execute("SELECT hashed_password, user_id FROM users WHERE username = %s", (auth.login,))
+                row = cur.fetchone()
+                if not row:
+                    logger.warning(f"Failed login attempt - user not found: {auth.login}")
+                    return RedirectResponse(url="/login", status_code=status.HTTP_403_FORBIDDEN)
+                stored_hash = row[0]
+                true_user_id = row[1]
+                # Не больше 5 неудачных попыток за 20 минут, счётчики в памяти
+                if login_limiter.is_blocked(true_user_id):
                     logger.warning(f"User overreached attempts of login")
                     return RedirectResponse(url="/login", status_code=status.HTTP_403_FORBIDDEN)
 
-            if not pwd_context.verify(auth.password, stored_hash):
-                logger.warning(f"Failed login attempt - invalid password for user: {auth.login}")
-                cur.execute("SELECT user_id, last_attempt, attempt_value FROM bruteforce_protect WHERE user_id = %s", (true_user_id,))
-                brute_row = cur.fetchone()
-                if brute_row:
-                    kk, last_attempt, attempt_value = brute_row
-                    cur.execute("UPDATE bruteforce_protect SET last_attempt = %s, attempt_value = %s WHERE user_id = %s",(now, attempt_value+1, true_user_id))
-                    conn.commit()
-                else:
-                    cur.execute("INSERT INTO bruteforce_protect (user_id, last_attempt, attempt_value) VALUES (%s, %s, %s)", (true_user_id, now, 1))
-                    conn.commit()
-                #cur.execute("INSERT INTO bruteforce_protect user_id, last_attempt, attempt_value WHERE user_id = %s", (true_user_id,))
-                #brute = cur.fetchone()
-
-
-                return RedirectResponse(url="/login", status_code=status.HTTP_403_FORBIDDEN)
-            #cur.execute("INSERT INTO transactions (id, amount, timestamp, account_id, merchant_id, status) VALUES (%s, %s, %s, %s, %s, %s)", (tx.id, tx.amount, tx.timestamp, tx.account_id, tx.receiver_id, tx.status) )
-            #conn.commit()
-            expires_at = datetime.utcnow() + timedelta(minutes=20)
-            payload = {
-                "userid": auth.login,
-                "true_userid": true_user_id,
-                "exp": expires_at
-        }
-            token = jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
-            logger.info(f"Successful login: {auth.login}")
-            response = RedirectResponse("/home", status_code=status.HTTP_303_SEE_OTHER)
-            response.set_cookie(
-                key="session_id",
-                value=token,
-                httponly=True,
-                max_age=1200,
-                expires=1200,
-                samesite="lax",
-                secure=False
-            )
-
-            cur.execute(
-                "INSERT INTO active_session (userid, token, expires_at) VALUES (%s, %s, %s)",
-                (auth.login, token, expires_at)
-            )
-            conn.commit()
-
-            return response
-
-        logger.warning("Login attempt with empty credentials")
-        return RedirectResponse(url="/login?error=invalid_credentials", status_code=303)
-
-    except Exception as e:
-        logger.error(f"Login error: {str(e)}")
-        raise
-
-
-@app.post("/api/transaction")
-async def send_transaction(tx: TransactionNew, request: Request, token_data: tuple[str, str] = Depends(verify_token),):
-    user_id, true_user_id = token_data
-    transaction_id = None
-    payload = await request.json()
-    if tx.amount <= 0:
-        logger.warning(f"Invalid amount from {user_id}: {tx.amount}")
-        return JSONResponse(
-            status_code=400,
-            content={"error": "Сумма должна быть положительной"}
-        )
-    
-    if tx.receiver_id == true_user_id:
-        logger.warning(f"Attempt to send money yourself")
-        return JSONResponse(
-            status_code=400,
-            content={"error": "Вы не можете перевести деньги самому себе"}
-        )
-
-    for _ in range(4):  # 3 попытки генерации уникального ID
-        temp_id = secrets.token_urlsafe(16)
-        cur.execute("SELECT id FROM transactions WHERE id = %s", (temp_id,))
-        if not cur.fetchone():
-            transaction_id = temp_id
-            break
-
-
-    if not transaction_id:
-        raise Exception("Failed to generate unique transaction ID")
-
-    try:
-
-        # 3. Проверка получателя и баланса в одной транзакции
-        cur.execute("""
-            SELECT
-                u.balance, (r.user_id IS NOT NULL), r.account_status, u.account_status AS receiver_exists
-            FROM users AS u
-            LEFT JOIN users AS r
-                ON r.user_id = %s      -- проверяем получателя
-            WHERE u.user_id = %s      -- блокируем отправителя
-            FOR UPDATE OF u
-            """,
-                    (tx.receiver_id, true_user_id)
+                try:
+                    password_ok, new_hash = password_verifier.verify_and_update_sync(auth.password, stored_hash)
+                except PasswordQueueFull:
+                    logger.warning(f"Login rejected, password verification queue is full: {auth.login}")
+                    return JSONResponse(
+                        status_code=503,
+                        content={"error": "Сервер перегружен, повторите попытку позже"},
+                        headers={"Retry-After": "1"}
                     )
+                if not password_ok:
+                    logger.warning(f"Failed login attempt - invalid password for user: {auth.login}")
+                    attempts = login_limiter.record_failure(true_user_id)
+                    bruteforce_audit.record(true_user_id, now, attempts)
+                    #cur.execute("INSERT INTO bruteforce_protect user_id, last_attempt, attempt_value WHERE user_id = %s", (true_user_id,))
+                    #brute = cur.fetchone()
+
 
-        result = cur.fetchone()
-        if not result:
-            logger.warning(f"User not found: {user_id}")
-            return JSONResponse(
-                status_code=404,
-                content={"error": "Пользователь не найден"}
-            )
-
-        balance, merchant_exists, receiver_account_status, user_account_status = result
-        if not merchant_exists:
-            logger.warning(f"Invalid merchant: {tx.receiver_id}")
-            return JSONResponse(
-                status_code=400,
-                content={"error": "Получатель не найден"}
-            )
-
-        if balance < tx.amount:
-            logger.warning(f"Insufficient funds: {user_id}")
-            return JSONResponse(
-                status_code=400,
-                content={"error": "Недостаточно средств", "balance": float(balance)}
-            )
-
-        if receiver_account_status != "normal":
-            logger.warning(f"Попытка отправить деньги аккаунту ID {tx.receiver_id} с ограниченными привилегиями")
-            return JSONResponse(
-                status_code=400,
-                content={"error": "Аккаунт получателя ограничен. Невозможно отправить деньги."}
-            )
-        if user_account_status != "normal":
-            logger.warning(f"Пользователь с ограниченным аккаунтом ID {true_user_id} попытался отправить деньги")
-            return JSONResponse(
-                status_code=400,
-                content={"error": "Ваш аккаунт ограничен. Свяжитесь со службой поддержки."}
-            )
-
-        # 5. Выполнение транзакции
-        now = datetime.now(timezone.utc)
-
-        cur.execute(
-            "UPDATE users SET balance = balance - %s WHERE username = %s",
-            (tx.amount, user_id)
-        )
-
-        cur.execute(
-            "UPDATE users SET balance = balance + %s WHERE user_id = %s",
-            (tx.amount, tx.receiver_id)
-        )
-
-        cur.execute(
-            """INSERT INTO transactions 
-               (id, amount, timestamp, account_id, merchant_id, status) 
-               VALUES (%s, %s, %s, %s, %s, %s)""",
-            (transaction_id, tx.amount, now.isoformat(), true_user_id, tx.receiver_id, "completed")
-        )
-
-        conn.commit()
-        logger.info(f"Transaction {transaction_id} completed for {user_id}")
-
-        tx_data = {
-            "id": transaction_id,
-            "timestamp": datetime.utcnow().isoformat(),
-            "account_id": user_id,
-            "amount": tx.amount,
-            "status": "SUCCESS",
-            "source_ip": request.client.host,
-            "raw_payload": json.dumps(payload)
-        }
-
-        # 3. Отправляем в Kafka
-        await send_kafka(Kafka_transaction_topic, tx_data)
-
-        return JSONResponse(
-            status_code=200,
-            content={
-                "status": "success",
-                "transaction_id": transaction_id,
-                "new_balance": str(balance - tx.amount)
+                    return RedirectResponse(url="/login", status_code=status.HTTP_403_FORBIDDEN)
+                #cur.execute("INSERT INTO transactions (id, amount, timestamp, account_id, merchant_id, status) VALUES (%s, %s, %s, %s, %s, %s)", (tx.id, tx.amount, tx.timestamp, tx.account_id, tx.receiver_id, tx.status) )
+                #conn.commit()
+                expires_at = datetime.utcnow() + timedelta(minutes=20)
+                payload = {
+                    "userid": auth.login,
+                    "true_userid": true_user_id,
+                    "exp": expires_at,
+                    "jti": secrets.token_urlsafe(16)
             }
-        )
-
-    except psycopg2.DatabaseError as db_error:
-        tx_data = {
-            "id": transaction_id,
-            "timestamp": datetime.utcnow().isoformat(),
-            "account_id": user_id,
-            "amount": tx.amount,
-            "status": "SUCCESS",
-            "source_ip": request.client.host,
-            "raw_payload": json.dumps(payload)
-        }
-        await send_kafka(Kafka_audit_topic, tx_data)
-        conn.rollback()
-        logger.error(f"Database error: {str(db_error)}")
-        return JSONResponse(
-            status_code=500,
-            content={"error": "Ошибка базы данных"}
-        )
-
-    except Exception as e:
-        tx_data = {
-            "id": transaction_id,
-            "timestamp": datetime.utcnow().isoformat(),
-            "account_id": user_id,
-            "amount": tx.amount,
-            "status": "SUCCESS",
-            "source_ip": request.client.host,
-            "raw_payload": json.dumps(payload)
-        }
-        await send_kafka(Kafka_audit_topic, tx_data)
-        logger.error(f"Unexpected error: {str(e)}", exc_info=True)
-        return JSONResponse(
-            status_code=500,
-            content={"error": "Внутренняя ошибка сервера"}
-        )
-
-    finally:
-        try:
-            conn.autocommit = True
-            if 'cur' in locals():
-                cur.close()
+                token = jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+                logger.info(f"Successful login: {auth.login}")
+                response = RedirectResponse("/home", status_code=status.HTTP_303_SEE_OTHER)
+                response.set_cookie(
+                    key="session_id",
+                    value=token,
+                    httponly=True,
+                    max_age=1200,
+                    expires=1200,
+                    samesite="lax",
+                    secure=False
+                )
+
+                if new_hash:
+                    # Сменилась стоимость bcrypt - перехешируем пароль при входе
+                    cur.execute("UPDATE users SET hashed_password = %s WHERE user_id = %s", (new_hash, true_user_id))
+                cur.execute(
+                    "INSERT INTO active_session (userid, token, expires_at) VALUES (%s, %s, %s)",
+                    (auth.login, token, expires_at)
+                )
+                conn.commit()
+
+                return response
+
+            logger.warning("Login attempt with empty credentials")
+            return RedirectResponse(url="/login?error=invalid_credentials", status_code=303)
+
         except Exception as e:
-            logger.error(f"Cleanup error: {str(e)}")
\ No newline at end of file
+            logger.error(f"Login error: {str(e)}")
+            raise
@@ -0,0 +1,6 @@
+from pydantic import BaseModel
+
+
+class TransactionNew(BaseModel):
+    amount: int
+    receiver_id: str
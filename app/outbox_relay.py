@@ -0,0 +1,154 @@
+"""Релей transactional outbox: переносит события из таблицы outbox в Kafka.
+
+Каждый воркер в своей транзакции забирает до --batch-size строк через
+FOR UPDATE SKIP LOCKED, отправляет их пачкой, ждёт подтверждения брокера
+и только после этого фиксирует удаление строк. При ошибке транзакция
+откатывается и строки достанутся следующему заходу (at-least-once,
+получатели дедуплицируют события по id транзакции). Воркеры и отдельные
+процессы релея не пересекаются по строкам, поэтому пропускная
+способность растёт с их числом. Порядок событий между воркерами не
+гарантируется. Запуск из каталога app/:
+
+    python outbox_relay.py --workers 4 --batch-size 500
+"""
+import argparse
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+import psycopg2
+from kafka import KafkaProducer
+from kafka.errors import KafkaError, KafkaTimeoutError
+
+from database.outbox import claim_events
+from database.session import db_pool
+from metrics import metrics
+from producer import create_kafka_producer
+from settings import settings
+
+logger = logging.getLogger("bank_app")
+
+
+class OutboxRelay:
+    def __init__(
+            self,
+            dsn: str,
+            producer_factory: Callable[[], Optional[KafkaProducer]],
+            workers: int = 4,
+            batch_size: int = 500,
+            poll_interval: float = 0.5,
+            send_timeout: float = 30.0
+    ):
+        self.dsn = dsn
+        self.producer_factory = producer_factory
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.send_timeout = send_timeout
+        self._stop = threading.Event()
+
+    def relay_batch(self, conn, producer) -> int:
+        # Удаление строк фиксируется только после подтверждения всех сообщений
+        with conn:
+            with conn.cursor() as cur:
+                events = claim_events(cur, self.batch_size)
+                if not events:
+                    return 0
+                futures = [producer.send(topic, value=payload) for _, topic, payload in events]
+                producer.flush(timeout=self.send_timeout)
+                for future in futures:
+                    if not future.is_done:
+                        raise KafkaTimeoutError(f"No ack from Kafka in {self.send_timeout}s")
+                    if future.failed():
+                        raise future.exception
+        metrics.increment("outbox.relayed", len(events))
+        return len(events)
+
+    def run(self, once: bool = False) -> int:
+        # once=True: выйти, когда outbox опустеет
+        totals = [0] * self.workers
+        threads = [
+            threading.Thread(target=self._worker, args=(i, totals, once), name=f"outbox-relay-{i}")
+            for i in range(self.workers)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        logger.info(f"Outbox relay: {sum(totals)} events in {elapsed:.2f}s "
+                    f"({sum(totals) / elapsed if elapsed else 0:.0f}/s)")
+        return sum(totals)
+
+    def stop(self):
+        self._stop.set()
+
+    @staticmethod
+    def _rollback(conn):
+        # Возвращает соединение, пригодное для следующей попытки, или None
+        if conn is None or conn.closed:
+            return None
+        try:
+            conn.rollback()
+            return conn
+        except psycopg2.Error:
+            conn.close()
+            return None
+
+    def _worker(self, number: int, totals: list, once: bool):
+        conn = None
+        producer = None
+        while not self._stop.is_set():
+            try:
+                if conn is None or conn.closed:
+                    conn = psycopg2.connect(self.dsn)
+                if producer is None:
+                    producer = self.producer_factory()
+                    if producer is None:
+                        self._stop.wait(self.poll_interval)
+                        continue
+                sent = self.relay_batch(conn, producer)
+            except (psycopg2.Error, KafkaError) as e:
+                metrics.increment("outbox.errors")
+                logger.error(f"Outbox relay {number} error: {str(e)}")
+                self._stop.wait(self.poll_interval)
+                continue
+            except Exception as e:
+                # Непредвиденная ошибка (сериализация, баг) не должна
+                # останавливать поток: outbox иначе растёт без разгрузки
+                metrics.increment("outbox.unexpected_errors")
+                logger.error(f"Outbox relay {number} unexpected error: {str(e)}", exc_info=True)
+                conn = self._rollback(conn)
+                self._stop.wait(self.poll_interval)
+                continue
+            totals[number] += sent
+            if sent == 0:
+                if once:
+                    break
+                self._stop.wait(self.poll_interval)
+        if producer is not None:
+            producer.close(timeout=self.send_timeout)
+        if conn is not None:
+            conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", default=None)
+    parser.add_argument("--workers", type=int, default=settings.outbox_relay_workers)
+    parser.add_argument("--batch-size", type=int, default=settings.outbox_batch_size)
+    parser.add_argument("--poll-interval", type=float, default=settings.outbox_poll_interval)
+    parser.add_argument("--once", action="store_true", help="выйти, когда outbox опустеет")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s")
+    relay = OutboxRelay(
+        args.dsn or db_pool.dsn, create_kafka_producer,
+        workers=args.workers, batch_size=args.batch_size, poll_interval=args.poll_interval
+    )
+    try:
+        relay.run(once=args.once)
+    except KeyboardInterrupt:
+        relay.stop()
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+from metrics import metrics
+from settings import settings
+
+logger = logging.getLogger("bank_app")
+
+# min/max = default: хеш с другим числом раундов считается устаревшим,
+# и verify_and_update возвращает новый хеш для записи в users
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.bcrypt_rounds,
+    bcrypt__min_rounds=settings.bcrypt_rounds,
+    bcrypt__max_rounds=settings.bcrypt_rounds
+)
+
+
+class PasswordQueueFull(Exception):
+    pass
+
+
+class PasswordVerifier:
+    """Проверка паролей bcrypt на отдельном ограниченном пуле потоков.
+
+    bcrypt отпускает GIL, поэтому проверки идут параллельно и не держат
+    event loop. Одновременно выполняется не больше max_workers проверок,
+    в очереди ждёт не больше max_queue, остальные сразу отклоняются
+    с PasswordQueueFull.
+    """
+
+    def __init__(self, context: CryptContext, max_workers: int = 4, max_queue: int = 64):
+        self.context = context
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-verify")
+        self._lock = threading.Lock()
+        self._pending = 0
+        # Очередь видна в /metrics main.py и audit.py с момента старта
+        metrics.increment("passwords.rejected", 0)
+        self._update_gauges()
+
+    def _submit(self, password: str, hashed: str) -> Future:
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                metrics.increment("passwords.rejected")
+                raise PasswordQueueFull("Password verification queue is full")
+            self._pending += 1
+            self._update_gauges()
+        future = self._executor.submit(self.context.verify_and_update, password, hashed)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future: Future):
+        with self._lock:
+            self._pending -= 1
+            self._update_gauges()
+
+    def _update_gauges(self):
+        metrics.set_gauge("passwords.in_flight", min(self._pending, self.max_workers))
+        metrics.set_gauge("passwords.queue_depth", max(self._pending - self.max_workers, 0))
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        # Для async-эндпоинтов: event loop не блокируется
+        return await asyncio.wrap_future(self._submit(password, hashed))
+
+    def verify_and_update_sync(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        # Для синхронных эндпоинтов, которые уже выполняются в пуле потоков FastAPI
+        return self._submit(password, hashed).result()
+
+
+password_verifier = PasswordVerifier(
+    pwd_context,
+    max_workers=settings.password_verify_workers,
+    max_queue=settings.password_verify_queue_size
+)
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+from kafka import KafkaProducer
+from kafka.errors import KafkaError
+
+import json_codec
+from metrics import metrics
+from settings import settings
+
+logger = logging.getLogger("bank_app")
+
+#Настройка кафки
+Kafka_bootstrap_servers=settings.kafka_bootstrap_servers
+Kafka_audit_topic="audit_logs"
+Kafka_transaction_topic="transaction"
+
+
+#Создаем Kafka_Producer
+def create_kafka_producer():
+    try:
+        producer = KafkaProducer(
+            bootstrap_servers=Kafka_bootstrap_servers,
+            value_serializer=json_codec.dumps,
+            acks='all',
+            retries=3,
+            max_in_flight_requests_per_connection=1,
+            request_timeout_ms=30000,
+            linger_ms=settings.kafka_linger_ms,
+            batch_size=settings.kafka_batch_bytes
+        )
+        return producer
+    except Exception as e:
+        logger.error(f"Failed to create Kafka producer: {str(e)}")
+
+
+class KafkaPublisher:
+    """Неблокирующая отправка событий в Kafka.
+
+    publish() только кладёт сообщение в ограниченную очередь в памяти,
+    фоновая задача забирает его пачками и отправляет из отдельного потока,
+    поэтому HTTP-ответ не ждёт подтверждения брокера. Если очередь полна,
+    publish() ждёт не дольше enqueue_timeout и затем отбрасывает сообщение.
+    """
+
+    def __init__(
+            self,
+            producer_factory: Callable[[], Optional[KafkaProducer]],
+            queue_size: int = 10000,
+            batch_size: int = 500,
+            linger: float = 0.05,
+            enqueue_timeout: float = 0.1,
+            flush_timeout: float = 10.0,
+            reconnect_interval: float = 5.0
+    ):
+        self.producer_factory = producer_factory
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.linger = linger
+        self.enqueue_timeout = enqueue_timeout
+        self.flush_timeout = flush_timeout
+        self.reconnect_interval = reconnect_interval
+
+        self._producer: Optional[KafkaProducer] = None
+        self._last_connect_attempt = 0.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kafka-publisher")
+
+    async def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Дожидаемся отправки того, что уже в очереди, затем закрываем продюсер
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=self.flush_timeout)
+        except asyncio.TimeoutError:
+            metrics.increment("kafka.dropped", self._queue.qsize())
+            logger.error(f"Kafka publisher did not flush in {self.flush_timeout}s, "
+                         f"{self._queue.qsize()} queued messages dropped")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        try:
+            await asyncio.wait_for(
+                asyncio.get_running_loop().run_in_executor(self._executor, self._close_producer),
+                timeout=self.flush_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.error("Kafka producer did not close in time")
+
+    async def publish(self, topic: str, value: dict) -> bool:
+        if self._queue is None:
+            metrics.increment("kafka.dropped")
+            logger.error(f"Kafka publisher is not started, message to {topic} dropped")
+            return False
+        try:
+            self._queue.put_nowait((topic, value))
+        except asyncio.QueueFull:
+            metrics.increment("kafka.backpressure_waits")
+            try:
+                await asyncio.wait_for(self._queue.put((topic, value)), timeout=self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                metrics.increment("kafka.dropped")
+                logger.error(f"Kafka queue is full, message to {topic} dropped")
+                return False
+        metrics.increment("kafka.enqueued")
+        metrics.set_gauge("kafka.queue_depth", self._queue.qsize())
+        return True
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.linger
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await loop.run_in_executor(self._executor, self._send_batch, batch)
+            except Exception as e:
+                metrics.increment("kafka.failed", len(batch))
+                logger.error(f"Failed to send batch to kafka: {str(e)}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+                metrics.set_gauge("kafka.queue_depth", self._queue.qsize())
+
+    def _get_producer(self) -> Optional[KafkaProducer]:
+        if self._producer is None and time.monotonic() - self._last_connect_attempt >= self.reconnect_interval:
+            self._last_connect_attempt = time.monotonic()
+            self._producer = self.producer_factory()
+        return self._producer
+
+    def _send_batch(self, batch: List[Tuple[str, dict]]):
+        # Выполняется в потоке self._executor
+        producer = self._get_producer()
+        if producer is None:
+            metrics.increment("kafka.failed", len(batch))
+            logger.error(f"Kafka is unavailable, {len(batch)} messages dropped")
+            return
+        for topic, value in batch:
+            try:
+                future = producer.send(topic, value=value)
+                future.add_callback(self._on_delivered)
+                future.add_errback(self._on_failed)
+            except KafkaError as e:
+                self._on_failed(e)
+        producer.flush(timeout=self.flush_timeout)
+        metrics.increment("kafka.batches")
+
+    def _close_producer(self):
+        if self._producer is not None:
+            self._producer.flush(timeout=self.flush_timeout)
+            self._producer.close(timeout=self.flush_timeout)
+            self._producer = None
+
+    @staticmethod
+    def _on_delivered(metadata):
+        metrics.increment("kafka.delivered")
+        logger.info(f"Message sent to Kafka: topic = {metadata.topic}, "
+                    f"partition = {metadata.partition}, "
+                    f"offest = {metadata.offset}")
+
+    @staticmethod
+    def _on_failed(error):
+        metrics.increment("kafka.failed")
+        logger.error(f"Failed to send massage to kafka: {str(error)}")
+
+
+publisher = KafkaPublisher(
+    create_kafka_producer,
+    queue_size=settings.kafka_queue_size,
+    batch_size=settings.kafka_publish_batch_size,
+    linger=settings.kafka_publish_linger,
+    enqueue_timeout=settings.kafka_enqueue_timeout
+)
+
+
+async def send_kafka(topic, massage):
+    return await publisher.publish(topic, massage)
+
+
+async def send_kafka_batch(topic, messages):
+    # Сообщения пакета попадают в очередь подряд и уходят одной пачкой
+    results = [await publisher.publish(topic, message) for message in messages]
+    return all(results)
@@ -0,0 +1,38 @@
+"""Настройка Jinja2 для main.py и audit.py.
+
+- байткод шаблонов пишется в FileSystemBytecodeCache, поэтому после
+  перезапуска воркера шаблоны не компилируются заново;
+- auto_reload выключен: без него Jinja проверяет mtime файла шаблона
+  на каждом рендере (для разработки включается TEMPLATES_AUTO_RELOAD);
+- precompile() загружает все шаблоны при старте, а не на первом запросе;
+- prerender() рендерит неизменные страницы (ошибки, нет прав) один раз.
+"""
+from types import SimpleNamespace
+from typing import Optional
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
+from starlette.datastructures import State
+
+
+def create_templates(directory: str, bytecode_cache_dir: Optional[str] = None,
+                     auto_reload: bool = False) -> Jinja2Templates:
+    templates = Jinja2Templates(directory=directory)
+    # Окружение настраиваем после создания: так работает при любой версии starlette.
+    # Пустой каталог - каталог Jinja по умолчанию во временной директории
+    templates.env.bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir or None)
+    templates.env.auto_reload = auto_reload
+    return templates
+
+
+def precompile(templates: Jinja2Templates) -> int:
+    names = templates.env.list_templates(extensions=["html"])
+    for name in names:
+        templates.env.get_template(name)
+    return len(names)
+
+
+def prerender(templates: Jinja2Templates, name: str, **context) -> str:
+    # Вместо запроса - объект с пустым state, как у запроса без middleware
+    context.setdefault("request", SimpleNamespace(state=State()))
+    return templates.env.get_template(name).render(context)
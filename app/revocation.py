@@ -0,0 +1,98 @@
+"""Отзыв JWT при выходе.
+
+При логауте jti токена записывается в revoked_tokens, триггер рассылает
+NOTIFY revoked_tokens. RevocationCache держит в памяти словарь
+jti -> время истечения токена: при старте загружает неистёкшие записи,
+затем получает новые через LISTEN, поэтому verify_token проверяет отзыв
+без запроса к БД. Записи удаляются из памяти, когда токен истекает сам.
+"""
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from database.notify import NotifyListener
+from metrics import metrics
+
+logger = logging.getLogger("bank_app")
+
+CHANNEL = "revoked_tokens"
+
+
+def to_timestamp(value: datetime) -> float:
+    # expires_at в БД хранится в UTC без часового пояса
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class RevocationCache:
+    def __init__(self, dsn: Optional[str], poll_interval: float = 1.0, cleanup_interval: float = 300.0):
+        self.dsn = dsn
+        self.poll_interval = poll_interval
+        self.cleanup_interval = cleanup_interval
+        self._lock = threading.Lock()
+        self._revoked: Dict[str, float] = {}
+        self._expiry: List[Tuple[float, str]] = []
+        self._next_cleanup = 0.0
+        self._listener = NotifyListener(
+            dsn, CHANNEL, self._on_notify, on_connect=self._load, on_tick=self._tick,
+            poll_interval=poll_interval, name="revocation"
+        )
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        if jti is None:
+            return False
+        expires_at = self._revoked.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def add(self, jti: str, expires_at: float):
+        with self._lock:
+            if expires_at <= time.time() or jti in self._revoked:
+                return
+            self._revoked[jti] = expires_at
+            heapq.heappush(self._expiry, (expires_at, jti))
+            metrics.set_gauge("revocation.entries", len(self._revoked))
+
+    def evict_expired(self):
+        now = time.time()
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                _, jti = heapq.heappop(self._expiry)
+                self._revoked.pop(jti, None)
+            metrics.set_gauge("revocation.entries", len(self._revoked))
+
+    def revoke(self, conn, jti: str, expires_at: datetime):
+        """Записывает отзыв в БД (фиксирует вызывающий) и сразу в локальный кэш."""
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO revoked_tokens (jti, expires_at) VALUES (%s, %s) ON CONFLICT (jti) DO NOTHING",
+                (jti, expires_at)
+            )
+        self.add(jti, to_timestamp(expires_at))
+
+    def start(self):
+        self._listener.start()
+
+    def stop(self):
+        self._listener.stop()
+
+    def _load(self, conn):
+        with conn.cursor() as cur:
+            cur.execute("SELECT jti, expires_at FROM revoked_tokens WHERE expires_at > now() AT TIME ZONE 'utc'")
+            for jti, expires_at in cur.fetchall():
+                self.add(jti, to_timestamp(expires_at))
+        logger.info(f"Revocation cache loaded: {len(self._revoked)} tokens")
+
+    def _on_notify(self, payload: str):
+        jti, _, expires_at = payload.partition(" ")
+        self.add(jti, float(expires_at))
+
+    def _tick(self, conn):
+        self.evict_expired()
+        if time.monotonic() >= self._next_cleanup:
+            self._next_cleanup = time.monotonic() + self.cleanup_interval
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM revoked_tokens WHERE expires_at < now() AT TIME ZONE 'utc'")
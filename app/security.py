@@ -0,0 +1,57 @@
+import logging
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException, Request, status
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError, jwt
+
+from database.session import db_pool
+from passwords import pwd_context
+from revocation import RevocationCache
+from settings import settings
+from token_cache import TokenCache, create_backend
+
+logger = logging.getLogger("bank_app")
+
+SECRET_KEY = "_caE+)3J3^8Lb&u$xaPVemEJj8RpV3"
+ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = 20
+#!!!ОБЯЗАТЕЛЬНО СЕКРЕТНЫЙ КЛЮЧ УБРАТЬ ИЗ КОДА В ENVIRONMENT!!!
+
+def create_access_token(data: dict) -> str:
+    to_encode = data.copy()
+    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": expire})
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+
+# Отозванные при выходе токены, обновляется через LISTEN/NOTIFY
+revocation_cache = RevocationCache(db_pool.dsn)
+
+token_cache = TokenCache(
+    create_backend(settings.jwt_backend, SECRET_KEY, ALGORITHM),
+    max_size=settings.jwt_cache_size
+)
+
+
+def verify_token(request: Request)  -> tuple[str, str]:
+    token = request.cookies.get("session_id")
+    if not token:
+        raise HTTPException(status_code=303, headers={"Location": "/login"})
+    try:
+        payload = token_cache.decode(token)
+        user_id: str = payload.get("userid")
+        true_user_id: str = payload.get("true_userid")
+        if not user_id:
+            raise JWTError()
+        if revocation_cache.is_revoked(payload.get("jti")):
+            raise JWTError("Token revoked")
+        return user_id, true_user_id
+    except JWTError:
+        logger.warning('Invalid or expired token')
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
@@ -0,0 +1,100 @@
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+
+class Settings(BaseSettings):
+    secret_key: str = Field(..., env="SECRET_KEY")
+    algorithm: str = Field("HS256", env="ALGORITHM")
+    access_token_expire_minutes: int = Field(20, env="ACCESS_TOKEN_EXPIRE_MINUTES")
+
+    postgres_host: str = Field("db", env="POSTGRES_HOST")
+    postgres_port: int = Field(..., env="POSTGRES_PORT")
+    postgres_db: str = Field(..., env="POSTGRES_DB")
+    postgres_user: str = Field(..., env="POSTGRES_USER")
+    postgres_password: str = Field(..., env="POSTGRES_PASSWORD")
+
+    # БД аудита, в неё пишет audit_consumer
+    postgres_audit_host: str = Field("db", env="POSTGRES_AUDIT_HOST")
+    postgres_audit_port: int = Field(5431, env="POSTGRES_AUDIT_PORT")
+    postgres_audit_db: str = Field("audit_db", env="POSTGRES_AUDIT_DB")
+    postgres_audit_user: str = Field("audit_user", env="POSTGRES_AUDIT_USER")
+    postgres_audit_password: str = Field("", env="POSTGRES_AUDIT_PASSWORD")
+
+    db_pool_min_size: int = Field(2, env="DB_POOL_MIN_SIZE")
+    db_pool_max_size: int = Field(20, env="DB_POOL_MAX_SIZE")
+    db_pool_timeout: float = Field(5.0, env="DB_POOL_TIMEOUT")
+    db_pool_health_check_interval: float = Field(30.0, env="DB_POOL_HEALTH_CHECK_INTERVAL")
+    async_db_pool_min_size: int = Field(5, env="ASYNC_DB_POOL_MIN_SIZE")
+    async_db_pool_max_size: int = Field(50, env="ASYNC_DB_POOL_MAX_SIZE")
+    # statements - отдельные запросы, procedure - серверная функция transfer_funds
+    transfer_mode: str = Field("statements", env="TRANSFER_MODE")
+    # token - случайный токен, ulid/uuid7 - упорядоченные по времени ID
+    transaction_id_generator: str = Field("ulid", env="TRANSACTION_ID_GENERATOR")
+    # Повторы перевода при deadlock/serialization failure
+    transfer_max_retries: int = Field(3, env="TRANSFER_MAX_RETRIES")
+    transfer_retry_backoff: float = Field(0.01, env="TRANSFER_RETRY_BACKOFF")
+    batch_max_items: int = Field(1000, env="BATCH_MAX_ITEMS")
+
+    kafka_bootstrap_servers: str = Field("kafka:9092", env="KAFKA_BOOTSTRAP_SERVERS")
+    kafka_topic: str = Field("incidents", env="KAFKA_TOPIC")
+    kafka_transaction_topic: str = Field("transaction", env="KAFKA_TRANSACTION_TOPIC")
+    # Фоновая отправка событий: очередь в памяти и размер пачки
+    kafka_queue_size: int = Field(10000, env="KAFKA_QUEUE_SIZE")
+    kafka_publish_batch_size: int = Field(500, env="KAFKA_PUBLISH_BATCH_SIZE")
+    kafka_publish_linger: float = Field(0.05, env="KAFKA_PUBLISH_LINGER")
+    kafka_enqueue_timeout: float = Field(0.1, env="KAFKA_ENQUEUE_TIMEOUT")
+    kafka_linger_ms: int = Field(5, env="KAFKA_LINGER_MS")
+    kafka_batch_bytes: int = Field(65536, env="KAFKA_BATCH_BYTES")
+    # Релей transactional outbox (outbox_relay.py)
+    outbox_relay_workers: int = Field(4, env="OUTBOX_RELAY_WORKERS")
+    outbox_batch_size: int = Field(500, env="OUTBOX_BATCH_SIZE")
+    outbox_poll_interval: float = Field(0.5, env="OUTBOX_POLL_INTERVAL")
+    # audit_consumer: размер пачки, ожидание добора пачки и число потоков
+    audit_consumer_group: str = Field("audit-group", env="AUDIT_CONSUMER_GROUP")
+    audit_consumer_batch_size: int = Field(500, env="AUDIT_CONSUMER_BATCH_SIZE")
+    audit_consumer_linger_ms: int = Field(200, env="AUDIT_CONSUMER_LINGER_MS")
+    audit_consumer_workers: int = Field(1, env="AUDIT_CONSUMER_WORKERS")
+    # insert - многострочный INSERT, copy - COPY FROM STDIN (audit_consumer/copy_loader.py)
+    audit_consumer_write_mode: str = Field("insert", env="AUDIT_CONSUMER_WRITE_MODE")
+    # Суточные секции audit_logs (audit_consumer/partitions.py): сколько суток
+    # создавать вперёд и через сколько суток отсоединять (0 - хранить всё)
+    audit_partition_days_ahead: int = Field(7, env="AUDIT_PARTITION_DAYS_AHEAD")
+    audit_retention_days: int = Field(0, env="AUDIT_RETENTION_DAYS")
+    audit_retention_drop: bool = Field(False, env="AUDIT_RETENTION_DROP")
+    audit_partition_maintenance_interval: float = Field(3600.0, env="AUDIT_PARTITION_MAINTENANCE_INTERVAL")
+    # Минутные агрегаты (audit_consumer/rollups.py) старше стольких суток удаляются, 0 - хранить
+    audit_rollup_minute_retention_days: int = Field(7, env="AUDIT_ROLLUP_MINUTE_RETENTION_DAYS")
+
+    # bcrypt: стоимость хеша и пул потоков для проверки паролей (passwords.py)
+    bcrypt_rounds: int = Field(12, env="BCRYPT_ROUNDS")
+    password_verify_workers: int = Field(4, env="PASSWORD_VERIFY_WORKERS")
+    password_verify_queue_size: int = Field(64, env="PASSWORD_VERIFY_QUEUE_SIZE")
+
+    # Защита от перебора паролей (bruteforce.py): memory - счётчики процесса,
+    # socket - общий сервер счётчиков для нескольких воркеров
+    bruteforce_backend: str = Field("memory", env="BRUTEFORCE_BACKEND")
+    # Каталог сокета создаётся с правами 0700 и должен принадлежать процессу
+    bruteforce_socket_path: str = Field("/tmp/bank_app/bruteforce.sock", env="BRUTEFORCE_SOCKET_PATH")
+    bruteforce_max_attempts: int = Field(5, env="BRUTEFORCE_MAX_ATTEMPTS")
+    bruteforce_window_minutes: int = Field(20, env="BRUTEFORCE_WINDOW_MINUTES")
+
+    # Проверка JWT (token_cache.py): jose или pyjwt, размер LRU проверенных токенов (0 - без кэша)
+    jwt_backend: str = Field("jose", env="JWT_BACKEND")
+    jwt_cache_size: int = Field(10000, env="JWT_CACHE_SIZE")
+    # Сколько секунд имя и статус счёта для /home и /send_money берутся из кэша
+    profile_cache_ttl: float = Field(60.0, env="PROFILE_CACHE_TTL")
+    # Каталог байткода Jinja (пусто - временный каталог Jinja), перечитывание изменённых шаблонов
+    templates_bytecode_cache_dir: str = Field("", env="TEMPLATES_BYTECODE_CACHE_DIR")
+    templates_auto_reload: bool = Field(False, env="TEMPLATES_AUTO_RELOAD")
+    # JSON тел запросов и событий (json_codec.py): auto, orjson или json
+    json_backend: str = Field("auto", env="JSON_BACKEND")
+
+    allowed_hosts: str = Field("127.0.0.1,localhost", env="ALLOWED_HOSTS")
+    allowed_ips: str = Field("127.0.0.1,192.168.1.0/24", env="ALLOWED_IPS")
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
+        extra = "allow"
+
+settings = Settings()
@@ -0,0 +1,66 @@
+-- Перевод за один вызов: проверка, списание, зачисление и запись в transactions.
+-- Коды статуса совпадают с константами в database/transfers.py:
+--   0 - успех, 1 - отправитель не найден, 2 - получатель не найден,
+--   3 - недостаточно средств, 4 - получатель ограничен,
+--   5 - отправитель ограничен, 6 - ID транзакции уже занят
+CREATE OR REPLACE FUNCTION transfer_funds(
+    p_tx_id TEXT,
+    p_sender_id TEXT,
+    p_receiver_id TEXT,
+    p_amount BIGINT,
+    p_timestamp TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc')
+)
+RETURNS TABLE (status_code INTEGER, new_balance NUMERIC)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_balance NUMERIC;
+    v_sender_status TEXT;
+    v_receiver_status TEXT;
+BEGIN
+    SELECT u.balance, u.account_status
+      INTO v_balance, v_sender_status
+      FROM users AS u
+     WHERE u.user_id = p_sender_id
+       FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT 1, NULL::NUMERIC;
+        RETURN;
+    END IF;
+
+    SELECT r.account_status
+      INTO v_receiver_status
+      FROM users AS r
+     WHERE r.user_id = p_receiver_id;
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT 2, v_balance;
+        RETURN;
+    END IF;
+
+    IF v_balance < p_amount THEN
+        RETURN QUERY SELECT 3, v_balance;
+        RETURN;
+    END IF;
+    IF v_receiver_status IS DISTINCT FROM 'normal' THEN
+        RETURN QUERY SELECT 4, v_balance;
+        RETURN;
+    END IF;
+    IF v_sender_status IS DISTINCT FROM 'normal' THEN
+        RETURN QUERY SELECT 5, v_balance;
+        RETURN;
+    END IF;
+
+    BEGIN
+        UPDATE users SET balance = balance - p_amount WHERE user_id = p_sender_id;
+        UPDATE users SET balance = balance + p_amount WHERE user_id = p_receiver_id;
+        INSERT INTO transactions (id, amount, timestamp, account_id, merchant_id, status)
+        VALUES (p_tx_id, p_amount, p_timestamp, p_sender_id, p_receiver_id, 'completed');
+    EXCEPTION WHEN unique_violation THEN
+        -- Откатываются только изменения внутри блока, ID сгенерирует вызывающий
+        RETURN QUERY SELECT 6, v_balance;
+        RETURN;
+    END;
+
+    RETURN QUERY SELECT 0, v_balance - p_amount;
+END;
+$$;
@@ -0,0 +1,69 @@
+-- transfer_funds блокирует обе строки users в порядке user_id, как и
+-- database/transfers.lock_accounts, чтобы встречные переводы не
+-- приводили к взаимоблокировкам. Коды статуса не изменились.
+CREATE OR REPLACE FUNCTION transfer_funds(
+    p_tx_id TEXT,
+    p_sender_id TEXT,
+    p_receiver_id TEXT,
+    p_amount BIGINT,
+    p_timestamp TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc')
+)
+RETURNS TABLE (status_code INTEGER, new_balance NUMERIC)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_balance NUMERIC;
+    v_sender_status TEXT;
+    v_receiver_status TEXT;
+BEGIN
+    PERFORM 1
+       FROM users
+      WHERE user_id IN (p_sender_id, p_receiver_id)
+      ORDER BY user_id
+        FOR UPDATE;
+
+    SELECT u.balance, u.account_status
+      INTO v_balance, v_sender_status
+      FROM users AS u
+     WHERE u.user_id = p_sender_id;
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT 1, NULL::NUMERIC;
+        RETURN;
+    END IF;
+
+    SELECT r.account_status
+      INTO v_receiver_status
+      FROM users AS r
+     WHERE r.user_id = p_receiver_id;
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT 2, v_balance;
+        RETURN;
+    END IF;
+
+    IF v_balance < p_amount THEN
+        RETURN QUERY SELECT 3, v_balance;
+        RETURN;
+    END IF;
+    IF v_receiver_status IS DISTINCT FROM 'normal' THEN
+        RETURN QUERY SELECT 4, v_balance;
+        RETURN;
+    END IF;
+    IF v_sender_status IS DISTINCT FROM 'normal' THEN
+        RETURN QUERY SELECT 5, v_balance;
+        RETURN;
+    END IF;
+
+    BEGIN
+        UPDATE users SET balance = balance - p_amount WHERE user_id = p_sender_id;
+        UPDATE users SET balance = balance + p_amount WHERE user_id = p_receiver_id;
+        INSERT INTO transactions (id, amount, timestamp, account_id, merchant_id, status)
+        VALUES (p_tx_id, p_amount, p_timestamp, p_sender_id, p_receiver_id, 'completed');
+    EXCEPTION WHEN unique_violation THEN
+        -- Откатываются только изменения внутри блока, ID сгенерирует вызывающий
+        RETURN QUERY SELECT 6, v_balance;
+        RETURN;
+    END;
+
+    RETURN QUERY SELECT 0, v_balance - p_amount;
+END;
+$$;
@@ -0,0 +1,40 @@
+-- Transactional outbox: событие о переводе пишется в той же транзакции,
+-- что и строка transactions, и отправляется в Kafka отдельным процессом
+-- (outbox_relay.py). Релей забирает строки пачками через
+-- FOR UPDATE SKIP LOCKED и удаляет их после подтверждения брокера.
+CREATE TABLE IF NOT EXISTS outbox (
+    id BIGSERIAL PRIMARY KEY,
+    topic TEXT NOT NULL,
+    payload JSONB NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+);
+
+-- transfer_funds + запись события в outbox за тот же round-trip.
+-- Событие пишется только при успешном переводе (status_code = 0).
+CREATE OR REPLACE FUNCTION transfer_funds_with_event(
+    p_tx_id TEXT,
+    p_sender_id TEXT,
+    p_receiver_id TEXT,
+    p_amount BIGINT,
+    p_timestamp TIMESTAMP,
+    p_topic TEXT,
+    p_payload JSONB
+)
+RETURNS TABLE (status_code INTEGER, new_balance NUMERIC)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_status INTEGER;
+    v_balance NUMERIC;
+BEGIN
+    SELECT t.status_code, t.new_balance
+      INTO v_status, v_balance
+      FROM transfer_funds(p_tx_id, p_sender_id, p_receiver_id, p_amount, p_timestamp) AS t;
+
+    IF v_status = 0 AND p_topic IS NOT NULL THEN
+        INSERT INTO outbox (topic, payload) VALUES (p_topic, p_payload);
+    END IF;
+
+    RETURN QUERY SELECT v_status, v_balance;
+END;
+$$;
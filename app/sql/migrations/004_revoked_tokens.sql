@@ -0,0 +1,27 @@
+-- Отозванные при выходе JWT (по claim jti). Процессы приложения держат
+-- копию неистёкших записей в памяти (revocation.py) и получают новые
+-- через LISTEN revoked_tokens, поэтому verify_token не ходит в БД.
+-- Строки с истёкшим expires_at удаляет тот же слушатель.
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    jti TEXT PRIMARY KEY,
+    expires_at TIMESTAMP NOT NULL,
+    revoked_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+);
+
+CREATE INDEX IF NOT EXISTS revoked_tokens_expires_at_idx ON revoked_tokens (expires_at);
+
+-- Полезная нагрузка: "<jti> <expires_at в секундах unix>"
+CREATE OR REPLACE FUNCTION notify_revoked_token() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify(
+        'revoked_tokens',
+        NEW.jti || ' ' || extract(epoch FROM NEW.expires_at AT TIME ZONE 'utc')
+    );
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS revoked_tokens_notify ON revoked_tokens;
+CREATE TRIGGER revoked_tokens_notify
+    AFTER INSERT ON revoked_tokens
+    FOR EACH ROW EXECUTE FUNCTION notify_revoked_token();
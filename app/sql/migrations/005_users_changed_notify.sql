@@ -0,0 +1,29 @@
+-- Уведомление об изменении профиля для кэша main.py (user_cache.py):
+-- имя и статус счёта кэшируются по username с TTL, по NOTIFY запись
+-- удаляется сразу. Баланс не кэшируется, поэтому переводы (UPDATE
+-- balance) уведомлений не рассылают.
+CREATE OR REPLACE FUNCTION notify_users_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('users_changed', OLD.username);
+    IF TG_OP = 'UPDATE' AND NEW.username IS DISTINCT FROM OLD.username THEN
+        PERFORM pg_notify('users_changed', NEW.username);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_changed_notify ON users;
+CREATE TRIGGER users_changed_notify
+    AFTER UPDATE ON users
+    FOR EACH ROW
+    WHEN (
+        NEW.username IS DISTINCT FROM OLD.username
+        OR NEW.name_surname IS DISTINCT FROM OLD.name_surname
+        OR NEW.account_status IS DISTINCT FROM OLD.account_status
+    )
+    EXECUTE FUNCTION notify_users_changed();
+
+DROP TRIGGER IF EXISTS users_deleted_notify ON users;
+CREATE TRIGGER users_deleted_notify
+    AFTER DELETE ON users
+    FOR EACH ROW EXECUTE FUNCTION notify_users_changed();
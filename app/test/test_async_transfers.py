@@ -0,0 +1,139 @@
+import asyncio
+from datetime import datetime
+from unittest.mock import AsyncMock
+
+import pytest
+
+from database import transfers
+from database.async_pool import AsyncConnectionPool
+
+
+@pytest.fixture
+def conn():
+    return AsyncMock()
+
+
+def test_pool_must_be_opened():
+    pool = AsyncConnectionPool("postgresql://localhost/db")
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+
+
+def test_invalid_pool_sizes():
+    with pytest.raises(ValueError):
+        AsyncConnectionPool("postgresql://localhost/db", min_size=10, max_size=1)
+
+
+def test_lock_accounts_locks_both_rows_in_order(conn):
+    conn.fetch.return_value = [{"user_id": "receiver"}, {"user_id": "sender"}]
+    accounts = asyncio.run(transfers.lock_accounts(conn, "sender", "receiver"))
+    query, ids = conn.fetch.call_args.args
+    assert "ORDER BY user_id" in query and "FOR UPDATE" in query
+    assert ids == ["sender", "receiver"]
+    assert set(accounts) == {"sender", "receiver"}
+
+
+def test_debit_credit_and_insert(conn):
+    now = datetime.utcnow()
+    asyncio.run(transfers.debit(conn, "sender", 10))
+    asyncio.run(transfers.credit(conn, "receiver", 10))
+    asyncio.run(transfers.insert_transaction(conn, "tx1", 10, now, "sender", "receiver", "completed"))
+
+    debit_call, credit_call, insert_call = conn.execute.call_args_list
+    assert "balance - $1" in debit_call.args[0] and debit_call.args[1:] == (10, "sender")
+    assert "balance + $1" in credit_call.args[0] and credit_call.args[1:] == (10, "receiver")
+    assert insert_call.args[1:] == ("tx1", 10, now, "sender", "receiver", "completed")
+
+
+class _Transaction:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def tx_conn():
+    conn = AsyncMock()
+    conn.transaction = lambda: _Transaction()
+    return conn
+
+
+def run_statements(conn, amount=10):
+    return asyncio.run(transfers.transfer_with_statements(
+        conn, "tx1", "sender", "receiver", amount, datetime.utcnow()
+    ))
+
+
+def account(user_id, balance=100, status="normal"):
+    return {"user_id": user_id, "balance": balance, "account_status": status}
+
+
+def test_statements_sender_not_found(tx_conn):
+    tx_conn.fetch.return_value = [account("receiver")]
+    assert run_statements(tx_conn) == (transfers.SENDER_NOT_FOUND, None)
+    tx_conn.execute.assert_not_called()
+
+
+@pytest.mark.parametrize("rows, expected", [
+    ([account("sender")], transfers.RECEIVER_NOT_FOUND),
+    ([account("receiver"), account("sender", balance=5)], transfers.INSUFFICIENT_FUNDS),
+    ([account("receiver", status="blocked"), account("sender")], transfers.RECEIVER_RESTRICTED),
+    ([account("receiver"), account("sender", status="blocked")], transfers.SENDER_RESTRICTED),
+])
+def test_statements_rejections(tx_conn, rows, expected):
+    tx_conn.fetch.return_value = rows
+    status_code, balance = run_statements(tx_conn)
+    assert status_code == expected
+    assert balance == rows[-1]["balance"]
+    tx_conn.execute.assert_not_called()
+
+
+def test_statements_success(tx_conn):
+    tx_conn.fetch.return_value = [account("receiver"), account("sender")]
+    assert run_statements(tx_conn) == (transfers.TRANSFER_OK, 90)
+    assert tx_conn.execute.call_count == 3
+
+
+def test_procedure_returns_status_and_balance(conn):
+    conn.fetchrow.return_value = {"status_code": transfers.TRANSFER_OK, "new_balance": 90}
+    result = asyncio.run(transfers.transfer_via_procedure(
+        conn, "tx1", "sender", "receiver", 10, datetime.utcnow()
+    ))
+    assert result == (transfers.TRANSFER_OK, 90)
+    assert "transfer_funds($1, $2, $3, $4, $5)" in conn.fetchrow.call_args.args[0]
+
+
+def test_batch_per_item_results(tx_conn):
+    tx_conn.fetch.return_value = [
+        account("a"), account("blocked", status="blocked"), account("sender", balance=100)
+    ]
+    items = [("a", 60), ("missing", 10), ("a", 0), ("sender", 5), ("blocked", 10), ("a", 50), ("a", 30)]
+    statuses, balance = asyncio.run(transfers.transfer_batch(
+        tx_conn, [f"tx{i}" for i in range(len(items))], "sender", items, datetime.utcnow()
+    ))
+    assert statuses == [
+        transfers.TRANSFER_OK,
+        transfers.RECEIVER_NOT_FOUND,
+        transfers.INVALID_AMOUNT,
+        transfers.SELF_TRANSFER,
+        transfers.RECEIVER_RESTRICTED,
+        transfers.INSUFFICIENT_FUNDS,
+        transfers.TRANSFER_OK,
+    ]
+    assert balance == 10
+
+    debit_call, credit_call, insert_call = tx_conn.execute.call_args_list
+    assert debit_call.args[1:] == (90, "sender")
+    assert credit_call.args[1:] == (["a"], [90])
+    assert insert_call.args[1:4] == (["tx0", "tx6"], [60, 30], ["a", "a"])
+
+
+def test_batch_without_completed_items_writes_nothing(tx_conn):
+    tx_conn.fetch.return_value = [account("sender", balance=1)]
+    statuses, _ = asyncio.run(transfers.transfer_batch(
+        tx_conn, ["tx0"], "sender", [("a", 10)], datetime.utcnow()
+    ))
+    assert statuses == [transfers.RECEIVER_NOT_FOUND]
+    tx_conn.execute.assert_not_called()
@@ -0,0 +1,147 @@
+import json
+from collections import namedtuple
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+
+from audit_consumer.start_consumer import AuditWorker, event_row, poll_batch
+
+Record = namedtuple("Record", "topic partition offset value")
+
+
+def record(offset, event, partition=0):
+    value = event if isinstance(event, bytes) else json.dumps(event).encode("utf-8")
+    return Record("transaction", partition, offset, value)
+
+
+class FakeConsumer:
+    def __init__(self, batches=()):
+        self.batches = list(batches)
+        self.commits = 0
+        self.seeks = {}
+
+    def poll(self, timeout_ms=0, max_records=None):
+        if not self.batches:
+            return {}
+        batch = self.batches.pop(0)
+        return {("transaction", 0): batch}
+
+    def commit(self):
+        self.commits += 1
+
+    def seek(self, partition, offset):
+        self.seeks[(partition.topic, partition.partition)] = offset
+
+
+def test_event_row_uses_transaction_id_or_id():
+    assert event_row({"id": "tx1", "amount": 5})[0] == "tx1"
+    assert event_row({"transaction_id": "tx2"})[0] == "tx2"
+    assert json.loads(event_row({"id": "tx1"})[-1]) == {"id": "tx1"}
+
+
+def test_poll_batch_collects_until_batch_size():
+    consumer = FakeConsumer([[record(0, {})], [record(1, {}), record(2, {})], [record(3, {})]])
+    records = poll_batch(consumer, batch_size=3, linger_ms=1000)
+    assert [r.offset for r in records] == [0, 1, 2]
+
+
+def test_poll_batch_returns_partial_batch_after_linger():
+    consumer = FakeConsumer([[record(0, {})]])
+    assert len(poll_batch(consumer, batch_size=100, linger_ms=10)) == 1
+
+
+def test_batch_is_written_with_one_insert_then_committed():
+    consumer = FakeConsumer()
+    conn = MagicMock(closed=False)
+    worker = AuditWorker(consumer, connect=lambda: conn)
+    with patch("audit_consumer.start_consumer.execute_values") as execute_values:
+        saved = worker.process_batch([record(i, {"id": f"tx{i}"}) for i in range(3)])
+    assert saved == 3
+    execute_values.assert_called_once()
+    assert [row[0] for row in execute_values.call_args.args[2]] == ["tx0", "tx1", "tx2"]
+    assert consumer.commits == 1
+
+
+def test_undecodable_messages_are_skipped():
+    consumer = FakeConsumer()
+    worker = AuditWorker(consumer, connect=lambda: MagicMock(closed=False))
+    with patch("audit_consumer.start_consumer.execute_values") as execute_values:
+        saved = worker.process_batch([record(0, b"not json"), record(1, {"id": "tx1"})])
+    assert saved == 1
+    assert len(execute_values.call_args.args[2]) == 1
+
+
+def test_failed_write_rewinds_without_commit():
+    consumer = FakeConsumer()
+    worker = AuditWorker(consumer, connect=lambda: MagicMock(closed=False), retry_backoff=0)
+    records = [record(5, {}, partition=0), record(6, {}, partition=0), record(2, {}, partition=1)]
+    with patch("audit_consumer.start_consumer.execute_values", side_effect=psycopg2.OperationalError("down")):
+        assert worker.process_batch(records) == 0
+    assert consumer.commits == 0
+    assert consumer.seeks == {("transaction", 0): 5, ("transaction", 1): 2}
+    assert worker.conn is None
+
+
+def test_bad_event_goes_to_dead_letters_and_batch_is_committed():
+    consumer = FakeConsumer()
+    written = []
+
+    def write(conn, events):
+        if any(event.get("amount") == "abc" for event in events):
+            raise psycopg2.DataError("invalid input syntax for type numeric")
+        written.extend(event["id"] for event in events)
+
+    worker = AuditWorker(consumer, connect=lambda: MagicMock(closed=False), write=write)
+    events = [{"id": f"tx{i}", "amount": "abc" if i == 2 else i} for i in range(5)]
+    with patch("audit_consumer.start_consumer.save_dead_letter") as save_dead_letter:
+        saved = worker.process_batch([record(i, event) for i, event in enumerate(events)])
+    assert saved == 4 and sorted(written) == ["tx0", "tx1", "tx3", "tx4"]
+    assert save_dead_letter.call_args.args[1] == events[2]
+    assert consumer.commits == 1
+
+
+def test_non_object_payloads_are_skipped_and_batch_is_committed():
+    consumer = FakeConsumer()
+    written = []
+    worker = AuditWorker(consumer, connect=lambda: MagicMock(closed=False),
+                         write=lambda conn, events: written.extend(event["id"] for event in events))
+    saved = worker.process_batch([record(0, 123), record(1, []), record(2, {"id": "tx2"})])
+    assert saved == 1 and written == ["tx2"]
+    assert consumer.commits == 1
+
+
+def test_unadaptable_event_goes_to_dead_letters():
+    consumer = FakeConsumer()
+    written = []
+
+    def write(conn, events):
+        # Так psycopg2 отвечает на вложенный объект в параметре запроса
+        if any(isinstance(event.get("amount"), dict) for event in events):
+            raise psycopg2.ProgrammingError("can't adapt type 'dict'")
+        written.extend(event["id"] for event in events)
+
+    worker = AuditWorker(consumer, connect=lambda: MagicMock(closed=False), write=write)
+    events = [{"id": "tx0", "amount": 1}, {"id": "tx1", "amount": {}}, {"id": "tx2", "amount": 2}]
+    with patch("audit_consumer.start_consumer.save_dead_letter") as save_dead_letter:
+        saved = worker.process_batch([record(i, event) for i, event in enumerate(events)])
+    assert saved == 2 and sorted(written) == ["tx0", "tx2"]
+    assert save_dead_letter.call_args.args[1] == events[1]
+    assert consumer.commits == 1
+
+
+def test_unexpected_error_does_not_stop_worker():
+    consumer = FakeConsumer([[record(0, {"id": "tx0"})], [record(1, {"id": "tx1"})]])
+    consumer.close = lambda: None
+    calls = []
+
+    def write(conn, events):
+        calls.append(events[0]["id"])
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        worker.stopped.set()
+
+    worker = AuditWorker(consumer, connect=lambda: MagicMock(closed=False), write=write,
+                         linger_ms=0, retry_backoff=0)
+    worker.run()
+    assert calls == ["tx0", "tx1"]
+    assert consumer.seeks == {("transaction", 0): 0}
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+
+from audit_logs import AuditLogQuery, build_query, decode_cursor, encode_cursor, fetch_page
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = None
+        self.queries = []
+
+    def execute(self, sql, params):
+        self.executed = (sql, params)
+        self.queries.append((sql, params))
+
+    def fetchall(self):
+        sql, params = self.executed
+        rows = self.rows
+        # Окно времени из fetch_page: since или until - последний datetime перед limit
+        if "timestamp >= %s" in sql:
+            rows = [row for row in rows if row[6] >= params[-2]]
+        elif "timestamp < %s" in sql:
+            rows = [row for row in rows if row[6] < params[-2]]
+        return rows[:params[-1]]
+
+
+def row(i):
+    return (i, f"tx{i}", "acc", "rcv", Decimal("10.50"), "completed", datetime(2026, 1, 1, 0, 0, i), "10.0.0.1")
+
+
+def test_cursor_roundtrip():
+    assert decode_cursor(encode_cursor(datetime(2026, 1, 1, 12, 30), 42)) == (datetime(2026, 1, 1, 12, 30), 42)
+    for cursor in ("garbage", encode_cursor(datetime(2026, 1, 1), 1)[:-4], "WyJ4IiwxXQ=="):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+
+def test_build_query_filters_and_keyset():
+    cursor = encode_cursor(datetime(2026, 1, 2), 7)
+    sql, params = build_query(AuditLogQuery(
+        account_id="acc", status="failed", min_amount=Decimal(1), since=datetime(2026, 1, 1),
+        limit=10, cursor=cursor
+    ))
+    assert "account_id = %s AND status = %s AND amount >= %s AND timestamp >= %s" in sql
+    assert "timestamp <= %s AND (timestamp, id) < (%s, %s)" in sql
+    assert sql.endswith("ORDER BY timestamp DESC, id DESC LIMIT %s")
+    assert params == [
+        "acc", "failed", Decimal(1), datetime(2026, 1, 1), datetime(2026, 1, 2), datetime(2026, 1, 2), 7, 11
+    ]
+
+
+def test_fetch_page_returns_next_cursor_only_when_more_rows():
+    cur = FakeCursor([row(i) for i in (5, 4, 3)])
+    entries, next_cursor = fetch_page(cur, AuditLogQuery(limit=2))
+    assert [entry.id for entry in entries] == [5, 4]
+    assert decode_cursor(next_cursor) == (datetime(2026, 1, 1, 0, 0, 4), 4)
+
+    entries, next_cursor = fetch_page(cur, AuditLogQuery(limit=3))
+    assert len(entries) == 3 and next_cursor is None
+
+
+def test_fetch_page_reads_recent_window_first():
+    rows = [row(i) for i in (50, 40, 3, 2)]
+    cur = FakeCursor(rows)
+    now = datetime(2026, 1, 1, 0, 0, 55)
+    entries, next_cursor = fetch_page(cur, AuditLogQuery(limit=1), window=timedelta(seconds=30), now=now)
+    # Страница набралась в окне - старые строки не читались
+    assert [entry.id for entry in entries] == [50] and len(cur.queries) == 1
+
+    cur.queries.clear()
+    entries, next_cursor = fetch_page(cur, AuditLogQuery(limit=3), window=timedelta(seconds=30), now=now)
+    assert [entry.id for entry in entries] == [50, 40, 3] and next_cursor is not None
+    assert len(cur.queries) == 2 and cur.queries[1][1][-2:] == [datetime(2026, 1, 1, 0, 0, 25), 2]
+
+
+def test_aware_window_is_normalized_to_naive_utc():
+    query = AuditLogQuery.model_validate({"until": "2026-01-01T03:00:00+03:00"})
+    assert query.until == datetime(2026, 1, 1)
+    # Граница окна сравнивается с naive now без TypeError
+    cur = FakeCursor([row(i) for i in (5, 4)])
+    query = AuditLogQuery.model_validate({"until": "2026-01-01T00:00:05Z"})
+    fetch_page(cur, query, window=timedelta(seconds=30), now=datetime(2026, 1, 1, 1))
+    assert cur.queries[0][1][:2] == [datetime(2025, 12, 31, 23, 59, 35), datetime(2026, 1, 1, 0, 0, 5)]
+    sql, params = build_query(AuditLogQuery(since=datetime(2026, 1, 1, tzinfo=timezone.utc)))
+    assert params[0] == datetime(2026, 1, 1)
@@ -0,0 +1,57 @@
+import asyncio
+
+from starlette.responses import PlainTextResponse
+
+from audit_middleware import CSRFMiddleware, IPAllowListMiddleware
+from ip_allowlist import ReloadableAllowList
+
+
+class FakeCSRF:
+    cookie_name = "csrf_token"
+
+    def generate_token(self):
+        return "generated"
+
+
+class FakeLogger:
+    def warning(self, message):
+        pass
+
+    error = warning
+
+
+async def endpoint(scope, receive, send):
+    await PlainTextResponse("ok")(scope, receive, send)
+
+
+def call(app, client=("127.0.0.1", 5000), cookie=None):
+    headers = [(b"cookie", cookie.encode())] if cookie else []
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": headers, "client": client}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start = messages[0]
+    return start["status"], dict((k.decode(), v.decode()) for k, v in start["headers"]), messages[-1]["body"]
+
+
+def test_ip_middleware():
+    app = IPAllowListMiddleware(endpoint, ReloadableAllowList("127.0.0.1"), FakeLogger())
+    assert call(app)[0] == 200
+    status, _, body = call(app, client=("10.0.0.1", 5000))
+    assert status == 403 and b"Access denied" in body
+    status, _, body = call(app, client=None)
+    assert status == 403 and b"Invalid client IP" in body
+
+
+def test_csrf_cookie_set_once():
+    app = CSRFMiddleware(endpoint, FakeCSRF())
+    status, headers, body = call(app)
+    assert status == 200 and body == b"ok"
+    assert headers["set-cookie"].startswith("csrf_token=generated;")
+    assert "set-cookie" not in call(app, cookie="csrf_token=abc; session_id=x")[1]
@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from audit_stats import AuditStatsQuery, stats_window, window_segments
+
+
+def test_window_segments_use_coarsest_rollups():
+    assert window_segments(datetime(2026, 1, 1, 22, 0), datetime(2026, 1, 4, 1, 30), "minute") == [
+        ("audit_rollup_hour", datetime(2026, 1, 1, 22, 0), datetime(2026, 1, 2)),
+        ("audit_rollup_day", datetime(2026, 1, 2), datetime(2026, 1, 4)),
+        ("audit_rollup_hour", datetime(2026, 1, 4), datetime(2026, 1, 4, 1, 0)),
+        ("audit_rollup_minute", datetime(2026, 1, 4, 1, 0), datetime(2026, 1, 4, 1, 30)),
+    ]
+    assert window_segments(datetime(2026, 1, 1, 3), datetime(2026, 1, 1, 9), "hour") == [
+        ("audit_rollup_hour", datetime(2026, 1, 1, 3), datetime(2026, 1, 1, 9)),
+    ]
+
+
+def test_stats_window_rounds_since_and_limits_points():
+    query = AuditStatsQuery(dimension="status", granularity="hour", since=datetime(2026, 1, 1, 3, 40))
+    assert stats_window(query, now=datetime(2026, 1, 2)) == (datetime(2026, 1, 1, 3), datetime(2026, 1, 2))
+    assert stats_window(AuditStatsQuery(dimension="status"), now=datetime(2026, 1, 2, 5, 30))[0] == datetime(2026, 1, 1, 5)
+
+    with pytest.raises(ValueError):
+        stats_window(AuditStatsQuery(dimension="status", since=datetime(2026, 1, 2)), now=datetime(2026, 1, 1))
+    with pytest.raises(ValueError):
+        stats_window(AuditStatsQuery(dimension="account_id", granularity="minute", since=datetime(2026, 1, 1)),
+                     now=datetime(2026, 1, 31))
+
+
+def test_stats_window_normalizes_aware_times_to_naive_utc():
+    query = AuditStatsQuery(
+        dimension="status", since=datetime(2026, 1, 1, 5, 30, tzinfo=timezone(timedelta(hours=3)))
+    )
+    assert stats_window(query, now=datetime(2026, 1, 2)) == (datetime(2026, 1, 1, 2), datetime(2026, 1, 2))
+    # Строка из JSON с зоной и naive now
+    query = AuditStatsQuery.model_validate({"dimension": "status", "since": "2026-01-01T00:00:00Z"})
+    assert stats_window(query, now=datetime(2026, 1, 1, 12))[0] == datetime(2026, 1, 1)
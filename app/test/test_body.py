@@ -0,0 +1,49 @@
+import pytest
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+import json_codec
+from api.body import JSONBodyRoute, raw_body_text, split_json_array
+
+
+class Item(BaseModel):
+    amount: int
+
+
+def test_body_parsed_once(monkeypatch):
+    calls = []
+    loads = json_codec.loads
+
+    def counting_loads(data):
+        calls.append(data)
+        return loads(data)
+
+    monkeypatch.setattr(json_codec, "loads", counting_loads)
+    router = APIRouter(route_class=JSONBodyRoute)
+
+    @router.post("/item")
+    async def create(item: Item, request: Request):
+        payload = await request.json()
+        return {"amount": item.amount, "csrf": payload.get("csrf_token"), "raw": await raw_body_text(request)}
+
+    app = FastAPI()
+    app.include_router(router)
+    body = b'{"amount": 5,  "csrf_token": "t"}'
+    response = TestClient(app).post("/item", content=body, headers={"Content-Type": "application/json"})
+    assert response.json() == {"amount": 5, "csrf": "t", "raw": body.decode()}
+    assert calls == [body]
+
+
+def test_codec_roundtrip():
+    data = {"id": "tx1", "amount": 10, "nested": [1, None]}
+    assert json_codec.loads(json_codec.dumps(data)) == data
+    assert json_codec.loads(json_codec.dumps_str(data)) == data
+
+
+def test_split_json_array_keeps_original_text():
+    body = ' [ {"receiver_id": "b", "amount": 5.0, "note": "x,]"} ,{"amount":1e2}\n] '
+    assert split_json_array(body) == ['{"receiver_id": "b", "amount": 5.0, "note": "x,]"}', '{"amount":1e2}']
+    assert split_json_array("[]") == []
+    with pytest.raises(ValueError):
+        split_json_array('{"amount": 1}')
@@ -0,0 +1,126 @@
+import os
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from bruteforce import (
+    BruteforceAuditWriter,
+    InMemoryAttemptLimiter,
+    LimiterServer,
+    SocketAttemptLimiter,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_blocks_after_five_failures_in_window():
+    clock = FakeClock()
+    limiter = InMemoryAttemptLimiter(max_attempts=5, window=1200, clock=clock)
+    for expected in range(1, 5):
+        assert limiter.record_failure("u1") == expected
+        assert not limiter.is_blocked("u1")
+        clock.now += 60
+    limiter.record_failure("u1")
+    assert limiter.is_blocked("u1")
+    assert not limiter.is_blocked("u2")
+
+
+def test_window_slides():
+    clock = FakeClock()
+    limiter = InMemoryAttemptLimiter(max_attempts=5, window=1200, clock=clock)
+    for _ in range(5):
+        limiter.record_failure("u1")
+        clock.now += 100
+    assert limiter.is_blocked("u1")
+    # Первая попытка выпала из окна 20 минут
+    clock.now = 1000.0 + 1200
+    assert not limiter.is_blocked("u1")
+
+
+def test_reset_and_eviction():
+    clock = FakeClock()
+    limiter = InMemoryAttemptLimiter(max_attempts=2, window=10, clock=clock)
+    limiter.record_failure("u1")
+    limiter.record_failure("u1")
+    limiter.reset("u1")
+    assert not limiter.is_blocked("u1")
+
+    limiter.record_failure("u2")
+    clock.now += 11
+    limiter.is_blocked("other")
+    assert "u2" not in limiter._attempts
+
+
+@contextmanager
+def limiter_server(limiter):
+    path = os.path.join(tempfile.mkdtemp(), "limiter.sock")
+    server = LimiterServer(path, limiter)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield path
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_socket_backend_shares_counters():
+    shared = InMemoryAttemptLimiter(max_attempts=2, window=60)
+    with limiter_server(shared) as path:
+        worker1 = SocketAttemptLimiter(path, fallback=InMemoryAttemptLimiter())
+        worker2 = SocketAttemptLimiter(path, fallback=InMemoryAttemptLimiter())
+        assert worker1.record_failure("u1") == 1
+        assert worker2.record_failure("u1") == 2
+        assert worker1.is_blocked("u1")
+        worker2.reset("u1")
+        assert not worker1.is_blocked("u1")
+
+
+def test_socket_is_private():
+    with limiter_server(InMemoryAttemptLimiter()) as path:
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+        assert stat.S_IMODE(os.stat(os.path.dirname(path)).st_mode) == 0o700
+
+
+def test_server_refuses_shared_socket_directory():
+    directory = tempfile.mkdtemp()
+    os.chmod(directory, 0o777)
+    with pytest.raises(PermissionError):
+        LimiterServer(os.path.join(directory, "limiter.sock"), InMemoryAttemptLimiter())
+
+
+def test_socket_backend_falls_back_to_local():
+    fallback = InMemoryAttemptLimiter(max_attempts=1, window=60)
+    limiter = SocketAttemptLimiter("/nonexistent/limiter.sock", fallback=fallback)
+    assert limiter.record_failure("u1") == 1
+    assert limiter.is_blocked("u1")
+
+
+def test_audit_writer_upserts_latest_attempt():
+    cur = MagicMock(rowcount=0)
+    conn = MagicMock()
+    conn.cursor.return_value.__enter__.return_value = cur
+    pool = MagicMock()
+    pool.connection.return_value.__enter__.return_value = conn
+
+    writer = BruteforceAuditWriter(pool)
+    now = datetime.utcnow()
+    writer.record("u1", now, 1)
+    writer.record("u1", now, 2)
+    writer.start()
+    writer.stop()
+
+    update, insert = cur.execute.call_args_list
+    assert update.args[1] == (now, 2, "u1")
+    assert "INSERT INTO bruteforce_protect" in insert.args[0]
@@ -0,0 +1,66 @@
+import csv
+import io
+import time
+from unittest.mock import MagicMock
+
+from audit_consumer.copy_loader import AuditCopyLoader, copy_to_audit_db, csv_field
+
+
+def copy_conn():
+    conn = MagicMock()
+    conn.copied = []
+    cur = conn.cursor.return_value.__enter__.return_value
+    cur.copy_expert.side_effect = lambda sql, buffer: conn.copied.append(buffer.read())
+    return conn
+
+
+def event(i):
+    return {"id": f"tx{i}", "account_id": "1", "amount": 5, "status": "SUCCESS", "source_ip": ""}
+
+
+def test_csv_field_distinguishes_null_and_empty_string():
+    assert csv_field(None) == ""
+    assert csv_field("") == '""'
+    assert csv_field('a,"b"\n') == '"a,""b""\n"'
+    assert csv_field(5) == '"5"'
+
+
+def test_rows_round_trip_through_csv():
+    conn = copy_conn()
+    copy_to_audit_db(conn, [event(0), event(1)])
+    rows = list(csv.reader(io.StringIO(conn.copied[0])))
+    assert [row[0] for row in rows] == ["tx0", "tx1"]
+    assert rows[0][2] == ""
+
+
+def test_flush_on_row_threshold():
+    conn = copy_conn()
+    loader = AuditCopyLoader(conn, max_rows=3, max_interval=60)
+    flushed = [loader.add(event(i)) for i in range(7)]
+    assert flushed == [False, False, True, False, False, True, False]
+    assert loader.rows_loaded == 6 and loader.pending == 1
+    assert loader.flush() == 1
+    assert len(conn.copied) == 3
+
+
+def test_flush_on_byte_threshold():
+    conn = copy_conn()
+    copy_to_audit_db(conn, [event(0)])
+    row_size = len(conn.copied[0])
+    loader = AuditCopyLoader(conn, max_rows=1000, max_bytes=row_size + 1, max_interval=60)
+    assert not loader.add(event(0))
+    assert loader.add(event(1))
+
+
+def test_flush_on_interval():
+    conn = copy_conn()
+    loader = AuditCopyLoader(conn, max_rows=1000, max_interval=0.01)
+    loader.add(event(0))
+    time.sleep(0.02)
+    assert loader.should_flush()
+
+
+def test_empty_flush_does_not_touch_db():
+    conn = copy_conn()
+    assert AuditCopyLoader(conn).flush() == 0
+    conn.cursor.assert_not_called()
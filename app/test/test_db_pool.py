@@ -0,0 +1,74 @@
+import pytest
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+from psycopg2 import extensions
+
+from database.pool import ConnectionPool, PoolTimeout
+
+
+def make_conn():
+    conn = MagicMock()
+    conn.closed = 0
+    conn.get_transaction_status.return_value = extensions.TRANSACTION_STATUS_IDLE
+    return conn
+
+
+@pytest.fixture
+def pg_pool():
+    with patch("database.pool.pg_pool.ThreadedConnectionPool") as pool_cls:
+        inner = pool_cls.return_value
+        inner.getconn.side_effect = lambda: make_conn()
+        yield inner
+
+
+def test_invalid_sizes():
+    with pytest.raises(ValueError):
+        ConnectionPool("dbname=x", min_size=5, max_size=2)
+
+
+def test_connection_commits_and_returns(pg_pool):
+    pool = ConnectionPool("dbname=x", max_size=2)
+    with pool.connection() as conn:
+        pass
+    conn.commit.assert_called_once()
+    pg_pool.putconn.assert_called_once_with(conn, close=False)
+
+
+def test_connection_rolls_back_on_error(pg_pool):
+    pool = ConnectionPool("dbname=x", max_size=2)
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            raise RuntimeError("boom")
+    conn.rollback.assert_called()
+    conn.commit.assert_not_called()
+
+
+def test_pool_timeout_when_exhausted(pg_pool):
+    pool = ConnectionPool("dbname=x", max_size=1, timeout=0.05)
+    conn = pool.getconn()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    pool.putconn(conn)
+    pool.putconn(pool.getconn())
+
+
+def test_broken_connection_is_replaced(pg_pool):
+    broken = make_conn()
+    broken.cursor.return_value.__enter__.return_value.execute.side_effect = psycopg2.OperationalError()
+    healthy = make_conn()
+    pg_pool.getconn.side_effect = [broken, healthy]
+
+    pool = ConnectionPool("dbname=x", max_size=2)
+    assert pool.getconn() is healthy
+    pg_pool.putconn.assert_called_once_with(broken, close=True)
+
+
+def test_recently_used_connection_skips_health_check(pg_pool):
+    conn = make_conn()
+    pg_pool.getconn.side_effect = [conn, conn]
+    pool = ConnectionPool("dbname=x", max_size=2, health_check_interval=60)
+    pool.putconn(pool.getconn())
+    conn.cursor.reset_mock()
+    assert pool.getconn() is conn
+    conn.cursor.assert_not_called()
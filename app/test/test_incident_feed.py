@@ -0,0 +1,168 @@
+import asyncio
+import threading
+from collections import namedtuple
+
+from incident_feed import IncidentBroadcaster, IncidentBuffer, IncidentIngestor, parse_event_id
+from kafka.structs import TopicPartition
+
+Record = namedtuple("Record", "partition offset value")
+
+
+def test_since_and_wraparound():
+    buffer = IncidentBuffer(capacity=3)
+    for i in range(5):
+        assert buffer.append({"id": i}) == i
+    assert buffer.first_offset == 2 and buffer.next_offset == 5
+
+    items, next_offset = buffer.since(3, limit=10)
+    assert [item["id"] for item in items] == [3, 4] and next_offset == 5
+    # Вытесненный offset - читаем с самого старого
+    items, _ = buffer.since(0, limit=10)
+    assert [item["offset"] for item in items] == [2, 3, 4]
+    assert buffer.since(5, limit=10) == ([], 5)
+
+
+def test_latest():
+    buffer = IncidentBuffer(capacity=10)
+    for i in range(4):
+        buffer.append({"id": i})
+    items, next_offset = buffer.latest(2)
+    assert [item["id"] for item in items] == [2, 3] and next_offset == 4
+
+
+class FakeConsumer:
+    def __init__(self, ends):
+        self.ends = ends
+        self.seeks = {}
+
+    def partitions_for_topic(self, topic):
+        return set(self.ends)
+
+    def assign(self, partitions):
+        self.assigned = partitions
+
+    def beginning_offsets(self, partitions):
+        return {tp: 0 for tp in partitions}
+
+    def end_offsets(self, partitions):
+        return {tp: self.ends[tp.partition] for tp in partitions}
+
+    def seek(self, tp, offset):
+        self.seeks[tp.partition] = offset
+
+
+def test_ingestor_seeks_to_tail_and_resumes():
+    buffer = IncidentBuffer(capacity=10)
+    ingestor = IncidentIngestor(buffer, "incidents", consumer_factory=None)
+    consumer = FakeConsumer({0: 100, 1: 3})
+    ingestor._assign_tail(consumer)
+    assert consumer.seeks == {0: 95, 1: 0}
+
+    ingestor.ingest([Record(0, 95, b'{"id": "a"}'), Record(0, 96, b"not json"), Record(0, 97, b"[1]")])
+    assert [item.get("id") for item in buffer.since(0, 10)[0]] == ["a", None]
+    assert buffer.since(0, 10)[0][1] == {"offset": 1, "value": [1]}
+
+    # После переподключения - с того же места, без повторного хвоста
+    consumer = FakeConsumer({0: 100, 1: 3})
+    ingestor._assign_tail(consumer)
+    assert consumer.seeks == {0: 98, 1: 0}
+    assert consumer.assigned == [TopicPartition("incidents", 0), TopicPartition("incidents", 1)]
+
+
+def test_stream_resumes_from_last_event_id_and_fans_out():
+    async def scenario():
+        buffer = IncidentBuffer(capacity=10, epoch="e")
+        for i in range(3):
+            buffer.append({"id": i})
+        broadcaster = IncidentBroadcaster(buffer)
+        broadcaster.bind(asyncio.get_running_loop())
+
+        resumed = broadcaster.stream(last_event_id=("e", 0))
+        live = broadcaster.stream()
+        chunk = await resumed.__anext__()
+        assert chunk.startswith("id: e:1\nevent: incident\n") and "id: e:2\n" in chunk
+        pending = asyncio.ensure_future(live.__anext__())
+        await asyncio.sleep(0)
+        assert len(broadcaster.clients) == 2
+
+        # Новый инцидент из потока ingestion будит обоих клиентов
+        def ingest():
+            buffer.append({"id": 3})
+            broadcaster.notify()
+        thread = threading.Thread(target=ingest)
+        thread.start()
+        thread.join()
+        assert (await asyncio.wait_for(pending, 1)).startswith("id: e:3\n")
+        assert (await asyncio.wait_for(resumed.__anext__(), 1)).startswith("id: e:3\n")
+
+        await resumed.aclose()
+        await live.aclose()
+        assert not broadcaster.clients
+
+    asyncio.run(scenario())
+
+
+def test_slow_stream_client_is_dropped():
+    async def scenario():
+        buffer = IncidentBuffer(capacity=10, epoch="e")
+        broadcaster = IncidentBroadcaster(buffer, max_lag=2)
+        broadcaster.bind(asyncio.get_running_loop())
+        for i in range(4):
+            buffer.append({"id": i})
+        chunks = [chunk async for chunk in broadcaster.stream(last_event_id=("e", 0))]
+        # id сброса - голова буфера, переподключение начнётся с новых
+        assert chunks == ["id: e:3\nevent: reset\ndata: {}\n\n"]
+        assert not broadcaster.clients
+
+    asyncio.run(scenario())
+
+
+def test_stream_resets_cursor_from_another_epoch():
+    async def scenario():
+        buffer = IncidentBuffer(capacity=10, epoch="new")
+        for i in range(3):
+            buffer.append({"id": i})
+        broadcaster = IncidentBroadcaster(buffer)
+        broadcaster.bind(asyncio.get_running_loop())
+
+        stream = broadcaster.stream(last_event_id=("old", 0))
+        assert await stream.__anext__() == "id: new:2\nevent: reset\ndata: {}\n\n"
+        # Дальше - только новые инциденты этой эпохи
+        pending = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+        buffer.append({"id": 3})
+        broadcaster._fan_out()
+        assert (await asyncio.wait_for(pending, 1)).startswith("id: new:3\n")
+        await stream.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_stream_closes_when_session_is_no_longer_active():
+    async def scenario():
+        buffer = IncidentBuffer(capacity=10, epoch="e")
+        broadcaster = IncidentBroadcaster(buffer, keepalive=0.01)
+        broadcaster.bind(asyncio.get_running_loop())
+        active = [True]
+
+        async def is_active():
+            return active[0]
+
+        stream = broadcaster.stream(is_active=is_active)
+        assert await stream.__anext__() == ": keepalive\n\n"
+        active[0] = False
+        assert [chunk async for chunk in stream] == []
+        assert not broadcaster.clients
+
+    asyncio.run(scenario())
+
+
+def test_parse_event_id():
+    assert parse_event_id("abc:12") == ("abc", 12)
+    assert parse_event_id("12") == (None, 12)
+
+
+def test_buffers_have_distinct_epochs():
+    # После рестарта offset начинаются с нуля - курсор старой эпохи чужой
+    assert IncidentBuffer().epoch != IncidentBuffer().epoch
+    assert IncidentBuffer(epoch="fixed").epoch == "fixed"
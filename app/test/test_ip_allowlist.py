@@ -0,0 +1,71 @@
+import os
+
+from ip_allowlist import ALLOWED, DENIED, INVALID, IPAllowList, RangeTable, ReloadableAllowList
+from metrics import metrics
+
+
+def test_range_table_merges_overlaps():
+    table = RangeTable([(10, 20), (15, 30), (31, 40), (50, 60)])
+    assert table.starts == [10, 50] and table.ends == [40, 60]
+    assert 10 in table and 40 in table and 55 in table
+    assert 9 not in table and 45 not in table and 61 not in table
+
+
+def test_ipv4_and_ipv6():
+    allow_list = IPAllowList.from_string("127.0.0.1, 192.168.1.0/24,10.0.0.0/8,fd00::/8")
+    assert "127.0.0.1" in allow_list
+    assert "192.168.1.77" in allow_list
+    assert "10.200.3.4" in allow_list
+    assert "fd12::1" in allow_list
+    assert "::ffff:192.168.1.5" in allow_list
+    assert "192.168.2.1" not in allow_list
+    assert "127.0.0.2" not in allow_list
+    assert "2001:db8::1" not in allow_list
+
+
+def test_many_networks():
+    networks = [f"10.{i}.0.0/16" for i in range(0, 256, 2)]
+    allow_list = IPAllowList(networks)
+    assert "10.4.1.1" in allow_list
+    assert "10.5.1.1" not in allow_list
+
+
+def test_decisions_counted():
+    metrics.reset()
+    allow_list = ReloadableAllowList("127.0.0.1")
+    assert allow_list.decide("127.0.0.1") == ALLOWED
+    assert allow_list.decide("8.8.8.8") == DENIED
+    assert allow_list.decide("testclient") == INVALID
+    assert metrics.get("ip_allowlist.allowed") == 1
+    assert metrics.get("ip_allowlist.denied") == 1
+    assert metrics.get("ip_allowlist.invalid") == 1
+
+
+def test_decision_counters_in_snapshot_before_first_request():
+    metrics.reset()
+    ReloadableAllowList("127.0.0.1")
+    snapshot = metrics.snapshot()
+    assert {key: snapshot[key] for key in ("ip_allowlist.allowed", "ip_allowlist.denied", "ip_allowlist.invalid")} == {
+        "ip_allowlist.allowed": 0, "ip_allowlist.denied": 0, "ip_allowlist.invalid": 0
+    }
+
+
+def test_hot_reload_from_file(tmp_path):
+    path = tmp_path / "allowed_ips"
+    path.write_text("10.0.0.0/8\n")
+    now = [0.0]
+    allow_list = ReloadableAllowList("127.0.0.1", str(path), reload_interval=5, clock=lambda: now[0])
+    assert allow_list.decide("10.1.1.1") == ALLOWED
+
+    path.write_text("# офис\n172.16.0.0/12\n")
+    os.utime(path, (1, 1))
+    assert allow_list.decide("10.1.1.1") == ALLOWED
+    now[0] = 10
+    assert allow_list.decide("10.1.1.1") == DENIED
+    assert allow_list.decide("172.16.5.5") == ALLOWED
+
+    # Ошибка в файле - остаётся прежний список
+    path.write_text("not-a-network\n")
+    os.utime(path, (2, 2))
+    now[0] = 20
+    assert allow_list.decide("172.16.5.5") == ALLOWED
@@ -0,0 +1,165 @@
+import asyncio
+import json_codec
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from kafka.errors import KafkaTimeoutError
+from kafka.future import Future
+
+from database import transfers
+from database.outbox import claim_events
+from outbox_relay import OutboxRelay
+
+
+class _Transaction:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def tx_conn():
+    conn = AsyncMock()
+    conn.transaction = lambda: _Transaction()
+    return conn
+
+
+def account(user_id, balance=100, status="normal"):
+    return {"user_id": user_id, "balance": balance, "account_status": status}
+
+
+def test_statements_write_event_in_transfer_transaction(tx_conn):
+    tx_conn.fetch.return_value = [account("receiver"), account("sender")]
+    result = asyncio.run(transfers.transfer_with_statements(
+        tx_conn, "tx1", "sender", "receiver", 10, datetime.utcnow(), ("transaction", {"id": "tx1"})
+    ))
+    assert result == (transfers.TRANSFER_OK, 90)
+    outbox_call = tx_conn.execute.call_args_list[-1]
+    assert "INSERT INTO outbox" in outbox_call.args[0]
+    assert outbox_call.args[1:] == ("transaction", json_codec.dumps_str({"id": "tx1"}))
+
+
+def test_rejected_transfer_writes_no_event(tx_conn):
+    tx_conn.fetch.return_value = [account("receiver"), account("sender", balance=5)]
+    asyncio.run(transfers.transfer_with_statements(
+        tx_conn, "tx1", "sender", "receiver", 10, datetime.utcnow(), ("transaction", {"id": "tx1"})
+    ))
+    tx_conn.execute.assert_not_called()
+
+
+def test_procedure_with_event():
+    conn = AsyncMock()
+    conn.fetchrow.return_value = {"status_code": transfers.TRANSFER_OK, "new_balance": 90}
+    asyncio.run(transfers.transfer_via_procedure(
+        conn, "tx1", "sender", "receiver", 10, datetime.utcnow(), ("transaction", {"id": "tx1"})
+    ))
+    query, *args = conn.fetchrow.call_args.args
+    assert "transfer_funds_with_event" in query
+    assert args[-2:] == ["transaction", json_codec.dumps_str({"id": "tx1"})]
+
+
+def test_batch_writes_events_only_for_completed(tx_conn):
+    tx_conn.fetch.return_value = [account("a"), account("sender")]
+    items = [("a", 10), ("missing", 10), ("a", 20)]
+    events = [("transaction", {"i": i}) for i in range(3)]
+    asyncio.run(transfers.transfer_batch(
+        tx_conn, ["tx0", "tx1", "tx2"], "sender", items, datetime.utcnow(), events
+    ))
+    outbox_call = tx_conn.execute.call_args_list[-1]
+    assert "INSERT INTO outbox" in outbox_call.args[0]
+    assert outbox_call.args[1:] == (["transaction", "transaction"], [json_codec.dumps_str({"i": 0}), json_codec.dumps_str({"i": 2})])
+
+
+def test_run_transfer_builds_event_for_final_id():
+    transfer = AsyncMock(side_effect=[(transfers.DUPLICATE_ID, None), (transfers.TRANSFER_OK, 90)])
+    ids = iter(["a", "b"])
+    asyncio.run(transfers.run_transfer(
+        AsyncMock(), transfer, lambda: next(ids), "sender", "receiver", 10, datetime.utcnow(),
+        make_event=lambda tx_id: ("transaction", {"id": tx_id})
+    ))
+    assert transfer.call_args.args[-1] == ("transaction", {"id": "b"})
+
+
+def test_claim_skips_locked_rows():
+    cur = MagicMock()
+    cur.fetchall.return_value = [(2, "transaction", {}), (1, "transaction", {})]
+    rows = claim_events(cur, 100)
+    query, params = cur.execute.call_args.args
+    assert "FOR UPDATE SKIP LOCKED" in query and "DELETE FROM outbox" in query
+    assert params == (100,)
+    assert [row[0] for row in rows] == [1, 2]
+
+
+class FakeProducer:
+    def __init__(self, fail=False):
+        self.sent = []
+        self.fail = fail
+        self._pending = []
+
+    def send(self, topic, value=None):
+        future = Future()
+        self._pending.append(future)
+        self.sent.append((topic, value))
+        return future
+
+    def flush(self, timeout=None):
+        for future in self._pending:
+            if self.fail:
+                future.failure(KafkaTimeoutError("no ack"))
+            else:
+                future.success(None)
+        self._pending = []
+
+
+def relay_conn(rows):
+    conn = MagicMock()
+    conn.cursor.return_value.__enter__.return_value.fetchall.return_value = rows
+    return conn
+
+
+def test_relay_commits_after_ack():
+    conn = relay_conn([(1, "transaction", {"id": "a"}), (2, "transaction", {"id": "b"})])
+    producer = FakeProducer()
+    relay = OutboxRelay("dsn", lambda: producer)
+    assert relay.relay_batch(conn, producer) == 2
+    assert producer.sent == [("transaction", {"id": "a"}), ("transaction", {"id": "b"})]
+    assert conn.__exit__.call_args.args == (None, None, None)
+
+
+def test_relay_rolls_back_when_broker_fails():
+    conn = relay_conn([(1, "transaction", {"id": "a"})])
+    producer = FakeProducer(fail=True)
+    relay = OutboxRelay("dsn", lambda: producer)
+    with pytest.raises(KafkaTimeoutError):
+        relay.relay_batch(conn, producer)
+    assert conn.__exit__.call_args.args[0] is KafkaTimeoutError
+
+
+def test_relay_empty_outbox():
+    conn = relay_conn([])
+    producer = FakeProducer()
+    assert OutboxRelay("dsn", lambda: producer).relay_batch(conn, producer) == 0
+    assert producer.sent == []
+
+
+def test_worker_survives_unexpected_error(monkeypatch):
+    from metrics import metrics
+    metrics.reset()
+    conn = MagicMock(closed=False)
+    monkeypatch.setattr("outbox_relay.psycopg2.connect", lambda dsn: conn)
+    relay = OutboxRelay("dsn", lambda: FakeProducer(), workers=1, poll_interval=0)
+    results = [TypeError("Object of type Decimal is not JSON serializable"), 3, 0]
+
+    def relay_batch(conn, producer):
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    relay.relay_batch = relay_batch
+    assert relay.run(once=True) == 3
+    assert metrics.get("outbox.unexpected_errors") == 1
+    conn.rollback.assert_called_once()
@@ -0,0 +1,64 @@
+from datetime import date, datetime
+from unittest.mock import MagicMock
+
+from audit_consumer.partitions import apply_retention, ensure_partitions, partition_bounds
+
+
+class FakeCursor:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.executed = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql.strip(), params))
+
+    def fetchall(self):
+        return self.bounds
+
+
+def fake_conn(bounds):
+    cur = FakeCursor(bounds)
+    conn = MagicMock()
+    conn.cursor.return_value = cur
+    return conn, cur
+
+
+BOUNDS = [
+    ("audit_logs_legacy", "FOR VALUES FROM (MINVALUE) TO ('2026-01-03 00:00:00')"),
+    ("audit_logs_p20260103", "FOR VALUES FROM ('2026-01-03 00:00:00') TO ('2026-01-04 00:00:00')"),
+    ("audit_logs_default", "DEFAULT"),
+]
+
+
+def test_partition_bounds_skip_default():
+    conn, cur = fake_conn(BOUNDS)
+    assert partition_bounds(cur) == [
+        ("audit_logs_legacy", None, datetime(2026, 1, 3)),
+        ("audit_logs_p20260103", datetime(2026, 1, 3), datetime(2026, 1, 4)),
+    ]
+
+
+def test_ensure_partitions_creates_only_missing_days():
+    conn, cur = fake_conn(BOUNDS)
+    assert ensure_partitions(conn, date(2026, 1, 2), days_ahead=3) == ["audit_logs_p20260104", "audit_logs_p20260105"]
+    creates = [params for sql, params in cur.executed if sql.startswith("CREATE TABLE")]
+    assert creates[0] == (datetime(2026, 1, 4), datetime(2026, 1, 5))
+
+
+def test_retention_detaches_partitions_before_cutoff():
+    conn, cur = fake_conn(BOUNDS)
+    assert apply_retention(conn, date(2026, 1, 5), retention_days=2) == ["audit_logs_legacy"]
+    assert ("ALTER TABLE audit_logs DETACH PARTITION audit_logs_legacy", None) in cur.executed
+    assert not any(sql.startswith("DROP") for sql, _ in cur.executed)
+
+    conn, cur = fake_conn(BOUNDS)
+    assert apply_retention(conn, date(2026, 1, 5), retention_days=1, drop=True) == [
+        "audit_logs_legacy", "audit_logs_p20260103"
+    ]
+    assert ("DROP TABLE audit_logs_p20260103", None) in cur.executed
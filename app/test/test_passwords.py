@@ -0,0 +1,68 @@
+import asyncio
+import threading
+
+import pytest
+from passlib.context import CryptContext
+
+from metrics import metrics
+from passwords import PasswordQueueFull, PasswordVerifier
+
+
+def context(rounds):
+    return CryptContext(
+        schemes=["bcrypt"], deprecated="auto",
+        bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds
+    )
+
+
+def test_verify_in_executor():
+    ctx = context(4)
+    verifier = PasswordVerifier(ctx, max_workers=2)
+    hashed = ctx.hash("secret")
+    assert asyncio.run(verifier.verify_and_update("secret", hashed)) == (True, None)
+    assert asyncio.run(verifier.verify_and_update("wrong", hashed)) == (False, None)
+    assert verifier.verify_and_update_sync("secret", hashed) == (True, None)
+
+
+def test_rehash_when_cost_changes():
+    hashed = context(4).hash("secret")
+    verifier = PasswordVerifier(context(5))
+    ok, new_hash = verifier.verify_and_update_sync("secret", hashed)
+    assert ok and new_hash.startswith("$2b$05$")
+    assert verifier.verify_and_update_sync("secret", new_hash) == (True, None)
+
+
+class BlockingContext:
+    def __init__(self):
+        self.release = threading.Event()
+
+    def verify_and_update(self, password, hashed):
+        self.release.wait(5)
+        return True, None
+
+
+def test_saturated_queue_rejects_immediately():
+    metrics.reset()
+    ctx = BlockingContext()
+    verifier = PasswordVerifier(ctx, max_workers=1, max_queue=1)
+    futures = [verifier._submit("p", "h"), verifier._submit("p", "h")]
+    assert metrics.get("passwords.in_flight") == 1
+    assert metrics.get("passwords.queue_depth") == 1
+    with pytest.raises(PasswordQueueFull):
+        verifier.verify_and_update_sync("p", "h")
+    assert metrics.get("passwords.rejected") == 1
+
+    ctx.release.set()
+    for future in futures:
+        future.result(timeout=5)
+    assert metrics.get("passwords.queue_depth") == 0
+    assert verifier.verify_and_update_sync("p", "h") == (True, None)
+
+
+def test_queue_gauges_in_snapshot_before_first_login():
+    metrics.reset()
+    PasswordVerifier(BlockingContext(), max_workers=1, max_queue=1)
+    snapshot = metrics.snapshot()
+    assert {key: snapshot[key] for key in ("passwords.in_flight", "passwords.queue_depth", "passwords.rejected")} == {
+        "passwords.in_flight": 0, "passwords.queue_depth": 0, "passwords.rejected": 0
+    }
@@ -0,0 +1,144 @@
+import asyncio
+import threading
+from collections import namedtuple
+
+from kafka.errors import KafkaTimeoutError
+from kafka.future import Future
+
+from metrics import metrics
+from producer import KafkaPublisher
+
+RecordMetadata = namedtuple("RecordMetadata", "topic partition offset")
+
+
+class FakeProducer:
+    """Имитация KafkaProducer: подтверждения приходят при flush()."""
+
+    def __init__(self, fail_topics=(), flush_delay=0.0):
+        self.sent = []
+        self.flushes = 0
+        self.closed = False
+        self.fail_topics = set(fail_topics)
+        self.flush_delay = flush_delay
+        self._pending = []
+        self._release = threading.Event()
+        self._release.set()
+
+    def send(self, topic, value=None):
+        future = Future()
+        self._pending.append((future, topic))
+        self.sent.append((topic, value))
+        return future
+
+    def flush(self, timeout=None):
+        self._release.wait()
+        self.flushes += 1
+        for future, topic in self._pending:
+            if topic in self.fail_topics:
+                future.failure(KafkaTimeoutError("no ack"))
+            else:
+                future.success(RecordMetadata(topic, 0, len(self.sent)))
+        self._pending = []
+
+    def close(self, timeout=None):
+        self.closed = True
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_publish_is_batched_and_flushed_on_stop():
+    metrics.reset()
+    fake = FakeProducer()
+    publisher = KafkaPublisher(lambda: fake, batch_size=100, linger=0.05)
+
+    async def scenario():
+        await publisher.start()
+        for i in range(250):
+            assert await publisher.publish("transaction", {"n": i})
+        await publisher.stop()
+
+    run(scenario())
+    assert [v["n"] for _, v in fake.sent] == list(range(250))
+    assert fake.flushes <= 5
+    assert fake.closed
+    assert metrics.get("kafka.enqueued") == 250
+    assert metrics.get("kafka.delivered") == 250
+    assert metrics.get("kafka.queue_depth") == 0
+
+
+def test_publish_does_not_wait_for_broker():
+    metrics.reset()
+    fake = FakeProducer()
+    fake._release.clear()
+    publisher = KafkaPublisher(lambda: fake, linger=0)
+
+    async def scenario():
+        await publisher.start()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for i in range(10):
+            await publisher.publish("transaction", {"n": i})
+        elapsed = loop.time() - started
+        fake._release.set()
+        await publisher.stop()
+        return elapsed
+
+    assert run(scenario()) < 0.5
+    assert metrics.get("kafka.delivered") == 10
+
+
+def test_full_queue_drops_after_timeout():
+    metrics.reset()
+    fake = FakeProducer()
+    fake._release.clear()
+    publisher = KafkaPublisher(lambda: fake, queue_size=2, batch_size=1, linger=0, enqueue_timeout=0.01)
+
+    async def scenario():
+        await publisher.start()
+        results = [await publisher.publish("transaction", {"n": i}) for i in range(10)]
+        fake._release.set()
+        await publisher.stop()
+        return results
+
+    results = run(scenario())
+    assert not all(results)
+    assert metrics.get("kafka.backpressure_waits") > 0
+    assert metrics.get("kafka.dropped") == results.count(False)
+
+
+def test_delivery_failures_are_counted():
+    metrics.reset()
+    fake = FakeProducer(fail_topics={"audit_logs"})
+    publisher = KafkaPublisher(lambda: fake)
+
+    async def scenario():
+        await publisher.start()
+        await publisher.publish("audit_logs", {"n": 1})
+        await publisher.publish("transaction", {"n": 2})
+        await publisher.stop()
+
+    run(scenario())
+    assert metrics.get("kafka.failed") == 1
+    assert metrics.get("kafka.delivered") == 1
+
+
+def test_unavailable_broker_does_not_break_publish():
+    metrics.reset()
+    publisher = KafkaPublisher(lambda: None)
+
+    async def scenario():
+        await publisher.start()
+        accepted = await publisher.publish("transaction", {"n": 1})
+        await publisher.stop()
+        return accepted
+
+    assert run(scenario())
+    assert metrics.get("kafka.failed") == 1
+
+
+def test_publish_before_start_is_dropped():
+    metrics.reset()
+    assert not run(KafkaPublisher(lambda: None).publish("transaction", {}))
+    assert metrics.get("kafka.dropped") == 1
@@ -0,0 +1,10 @@
+from rendering import create_templates, precompile, prerender
+
+
+def test_error_page_prerendered(tmp_path):
+    templates = create_templates("templates", str(tmp_path))
+    assert precompile(templates) > 0
+    assert any(tmp_path.iterdir())
+    page = prerender(templates, "error.html", error="Страница не найдена", code=404)
+    assert "Ошибка 404" in page and "Страница не найдена" in page
+
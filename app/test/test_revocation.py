@@ -0,0 +1,41 @@
+import time
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+from revocation import RevocationCache
+
+
+def test_revoked_until_expiry():
+    cache = RevocationCache(None)
+    cache.add("live", time.time() + 60)
+    cache.add("expired", time.time() - 1)
+    assert cache.is_revoked("live")
+    assert not cache.is_revoked("expired")
+    assert not cache.is_revoked("other")
+    assert not cache.is_revoked(None)
+
+
+def test_evict_expired():
+    cache = RevocationCache(None)
+    cache.add("a", time.time() + 0.05)
+    cache.add("b", time.time() + 60)
+    time.sleep(0.1)
+    assert not cache.is_revoked("a")
+    cache.evict_expired()
+    assert list(cache._revoked) == ["b"]
+    assert [jti for _, jti in cache._expiry] == ["b"]
+
+
+def test_revoke_writes_row_and_cache():
+    cur = MagicMock()
+    conn = MagicMock()
+    conn.cursor.return_value.__enter__.return_value = cur
+    cache = RevocationCache(None)
+    expires_at = datetime.utcnow() + timedelta(minutes=20)
+
+    cache.revoke(conn, "jti-1", expires_at)
+
+    sql, params = cur.execute.call_args.args
+    assert "INSERT INTO revoked_tokens" in sql
+    assert params == ("jti-1", expires_at)
+    assert cache.is_revoked("jti-1")
@@ -0,0 +1,52 @@
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from audit_consumer.rollups import RollupAccumulator, save_rollups
+
+
+def event(timestamp, account="acc1", amount=10, status="completed"):
+    return {"account_id": account, "amount": amount, "status": status,
+            "timestamp": timestamp, "source_ip": "10.0.0.1"}
+
+
+def test_accumulator_sums_per_bucket_and_dimension():
+    accumulator = RollupAccumulator()
+    accumulator.extend([
+        event("2026-01-01T10:15:30"),
+        event("2026-01-01T10:15:59", amount="2.5", status="failed"),
+        event("2026-01-01T11:00:00+03:00", account=None),
+        event("not a timestamp"),
+        event(None),
+    ])
+    assert accumulator.rows("minute") == [
+        ("account_id", "", datetime(2026, 1, 1, 8, 0), 1, Decimal(10)),
+        ("account_id", "acc1", datetime(2026, 1, 1, 10, 15), 2, Decimal("12.5")),
+        ("source_ip", "10.0.0.1", datetime(2026, 1, 1, 8, 0), 1, Decimal(10)),
+        ("source_ip", "10.0.0.1", datetime(2026, 1, 1, 10, 15), 2, Decimal("12.5")),
+        ("status", "completed", datetime(2026, 1, 1, 8, 0), 1, Decimal(10)),
+        ("status", "completed", datetime(2026, 1, 1, 10, 15), 1, Decimal(10)),
+        ("status", "failed", datetime(2026, 1, 1, 10, 15), 1, Decimal("2.5")),
+    ]
+    assert accumulator.rows("day") == [
+        ("account_id", "", datetime(2026, 1, 1), 1, Decimal(10)),
+        ("account_id", "acc1", datetime(2026, 1, 1), 2, Decimal("12.5")),
+        ("source_ip", "10.0.0.1", datetime(2026, 1, 1), 3, Decimal("22.5")),
+        ("status", "completed", datetime(2026, 1, 1), 2, Decimal(20)),
+        ("status", "failed", datetime(2026, 1, 1), 1, Decimal("2.5")),
+    ]
+
+
+def test_save_rollups_upserts_each_table_once():
+    with patch("audit_consumer.rollups.execute_values") as execute_values:
+        save_rollups(MagicMock(), [event("2026-01-01T10:15:30"), event("2026-01-01T12:00:00")])
+    tables = [call.args[1].split()[2] for call in execute_values.call_args_list]
+    assert tables == ["audit_rollup_minute", "audit_rollup_hour", "audit_rollup_day"]
+    assert "ON CONFLICT (dimension, bucket, value) DO UPDATE" in execute_values.call_args.args[1]
+    assert len(execute_values.call_args.args[2]) == 3
+
+
+def test_nothing_to_save_without_timestamps():
+    with patch("audit_consumer.rollups.execute_values") as execute_values:
+        save_rollups(MagicMock(), [event(None)])
+    execute_values.assert_not_called()
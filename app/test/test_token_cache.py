@@ -0,0 +1,71 @@
+import time
+
+import pytest
+from jose import JWTError, jwt
+
+from token_cache import JoseBackend, TokenCache
+
+SECRET = "test-secret"
+
+
+class CountingBackend(JoseBackend):
+    def __init__(self):
+        super().__init__(SECRET, "HS256")
+        self.calls = 0
+
+    def decode(self, token):
+        self.calls += 1
+        return super().decode(token)
+
+
+def make_token(userid, exp):
+    return jwt.encode({"userid": userid, "exp": exp}, SECRET, algorithm="HS256")
+
+
+def test_second_decode_is_cached():
+    backend = CountingBackend()
+    cache = TokenCache(backend)
+    token = make_token("alice", int(time.time()) + 60)
+    assert cache.decode(token)["userid"] == "alice"
+    assert cache.decode(token)["userid"] == "alice"
+    assert backend.calls == 1
+
+
+def test_entry_expires_with_token():
+    backend = CountingBackend()
+    now = [time.time()]
+    cache = TokenCache(backend, clock=lambda: now[0])
+    token = make_token("alice", int(now[0]) + 60)
+    cache.decode(token)
+    now[0] += 30
+    cache.decode(token)
+    assert backend.calls == 1
+    # После exp запись не используется, токен снова проверяет бэкенд
+    now[0] += 31
+    cache.decode(token)
+    assert backend.calls == 2
+
+
+def test_lru_bound_and_evict():
+    backend = CountingBackend()
+    cache = TokenCache(backend, max_size=2)
+    exp = int(time.time()) + 60
+    a, b, c = (make_token(u, exp) for u in "abc")
+    cache.decode(a)
+    cache.decode(b)
+    cache.decode(a)
+    cache.decode(c)
+    assert len(cache) == 2
+    cache.decode(a)
+    assert backend.calls == 3
+
+    cache.evict(a)
+    cache.decode(a)
+    assert backend.calls == 4
+
+
+def test_invalid_token_not_cached():
+    cache = TokenCache(CountingBackend())
+    with pytest.raises(JWTError):
+        cache.decode("not-a-token")
+    assert len(cache) == 0
@@ -0,0 +1,104 @@
+import asyncio
+import uuid
+from datetime import datetime
+from unittest.mock import AsyncMock
+
+import asyncpg
+import pytest
+
+from database import transfers
+from database.ids import CROCKFORD_ALPHABET, get_id_generator
+from metrics import metrics
+
+
+@pytest.mark.parametrize("name", ["token", "ulid", "uuid7"])
+def test_ids_are_unique(name):
+    generate = get_id_generator(name)
+    ids = [generate() for _ in range(10000)]
+    assert len(set(ids)) == len(ids)
+
+
+@pytest.mark.parametrize("name", ["ulid", "uuid7"])
+def test_time_ordered_ids_are_monotonic(name):
+    generate = get_id_generator(name)
+    ids = [generate() for _ in range(10000)]
+    assert ids == sorted(ids)
+
+
+def test_ulid_format():
+    value = get_id_generator("ulid")()
+    assert len(value) == 26
+    assert set(value) <= set(CROCKFORD_ALPHABET)
+
+
+def test_uuid7_format():
+    value = uuid.UUID(get_id_generator("uuid7")())
+    assert value.version == 7
+    assert value.variant == uuid.RFC_4122
+
+
+def test_unknown_generator():
+    with pytest.raises(ValueError):
+        get_id_generator("serial")
+
+
+def unique_violation(table_name):
+    error = asyncpg.UniqueViolationError("duplicate key")
+    error.table_name = table_name
+    return error
+
+
+def run(transfer, generate_id):
+    return asyncio.run(transfers.run_transfer(
+        AsyncMock(), transfer, generate_id, "sender", "receiver", 10, datetime.utcnow()
+    ))
+
+
+def test_run_transfer_retries_on_primary_key_conflict():
+    transfer = AsyncMock(side_effect=[unique_violation("transactions"), (transfers.TRANSFER_OK, 90)])
+    ids = iter(["a", "b"])
+    assert run(transfer, lambda: next(ids)) == ("b", transfers.TRANSFER_OK, 90)
+    assert transfer.call_count == 2
+
+
+def test_run_transfer_retries_on_duplicate_status():
+    transfer = AsyncMock(side_effect=[(transfers.DUPLICATE_ID, 100), (transfers.TRANSFER_OK, 90)])
+    ids = iter(["a", "b"])
+    assert run(transfer, lambda: next(ids)) == ("b", transfers.TRANSFER_OK, 90)
+
+
+def test_run_transfer_gives_up():
+    transfer = AsyncMock(return_value=(transfers.DUPLICATE_ID, 100))
+    with pytest.raises(transfers.TransactionIdConflict):
+        run(transfer, lambda: "a")
+    assert transfer.call_count == transfers.ID_ATTEMPTS
+
+
+def test_run_transfer_reraises_other_unique_violations():
+    transfer = AsyncMock(side_effect=unique_violation("users"))
+    with pytest.raises(asyncpg.UniqueViolationError):
+        run(transfer, lambda: "a")
+
+
+def test_run_transfer_retries_deadlocks(monkeypatch):
+    monkeypatch.setattr(transfers.asyncio, "sleep", AsyncMock())
+    metrics.reset()
+    transfer = AsyncMock(side_effect=[
+        asyncpg.DeadlockDetectedError("deadlock"),
+        asyncpg.SerializationError("serialization"),
+        (transfers.TRANSFER_OK, 90),
+    ])
+    assert run(transfer, lambda: "a") == ("a", transfers.TRANSFER_OK, 90)
+    assert metrics.get("transfers.retries.deadlock") == 1
+    assert metrics.get("transfers.retries.serialization") == 1
+    assert metrics.get("transfers.completed") == 1
+
+
+def test_run_transfer_retries_are_bounded(monkeypatch):
+    monkeypatch.setattr(transfers.asyncio, "sleep", AsyncMock())
+    metrics.reset()
+    transfer = AsyncMock(side_effect=asyncpg.DeadlockDetectedError("deadlock"))
+    with pytest.raises(asyncpg.DeadlockDetectedError):
+        run(transfer, lambda: "a")
+    assert transfer.call_count == transfers.MAX_RETRIES + 1
+    assert metrics.get("transfers.retries_exhausted") == 1
@@ -0,0 +1,73 @@
+from user_cache import UserCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_and_invalidation():
+    calls = []
+    roles = {"alice": ("Alice", "user")}
+
+    def load(username):
+        calls.append(username)
+        return roles.get(username)
+
+    clock = FakeClock()
+    cache = UserCache(load, ttl=60, clock=clock)
+    assert cache.get("alice") == ("Alice", "user")
+    assert cache.get("alice") == ("Alice", "user")
+    assert calls == ["alice"]
+
+    roles["alice"] = ("Alice", "auditor")
+    cache.invalidate("alice")
+    assert cache.get("alice") == ("Alice", "auditor")
+
+    clock.now += 61
+    cache.get("alice")
+    assert calls == ["alice"] * 3
+
+
+def test_missing_user_not_cached():
+    calls = []
+    cache = UserCache(lambda u: calls.append(u), ttl=60)
+    assert cache.get("ghost") is None
+    assert cache.get("ghost") is None
+    assert len(calls) == 2
+
+
+def test_invalidation_during_load_is_not_lost():
+    cache = None
+
+    def load(username):
+        # Уведомление пришло, пока строка читалась
+        cache.invalidate(username)
+        return ("Alice", "user")
+
+    cache = UserCache(load, ttl=60)
+    cache.get("alice")
+    assert "alice" not in cache._entries
+
+
+def test_max_size():
+    cache = UserCache(lambda u: (u, "user"), ttl=60, max_size=2)
+    for name in ("a", "b", "c"):
+        cache.get(name)
+    assert list(cache._entries) == ["b", "c"]
+
+
+def test_loader_args_and_hit_rate():
+    from metrics import metrics
+    metrics.reset()
+    cache = UserCache(lambda u, cur: cur[u], ttl=60, name="profile_cache")
+    rows = {"alice": ("Alice", "normal")}
+    assert cache.get("alice", rows) == ("Alice", "normal")
+    cache.get("alice", rows)
+    cache.get("alice", rows)
+    cache.get("alice", rows)
+    assert metrics.get("profile_cache.misses") == 1
+    assert metrics.get("profile_cache.hit_rate") == 0.75
@@ -0,0 +1,106 @@
+"""Кэш проверенных JWT для verify_token.
+
+Проверка подписи python-jose выполняется на каждом запросе, хотя браузер
+присылает один и тот же токен все 20 минут сессии. TokenCache хранит
+claims уже проверенных токенов в LRU ограниченного размера, ключ -
+sha256 от токена. Запись действует до exp самого токена, при логауте
+удаляется через evict().
+
+Бэкенд декодирования выбирается настройкой JWT_BACKEND:
+jose - python-jose (по умолчанию), pyjwt - PyJWT (pip install PyJWT),
+заметно быстрее на HS256.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from jose import JWTError, jwt
+
+from metrics import metrics
+
+
+class JWTBackend:
+    """Декодирует и проверяет токен, при ошибке бросает jose.JWTError."""
+
+    def __init__(self, secret_key: str, algorithm: str):
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+
+    def decode(self, token: str) -> dict:
+        raise NotImplementedError
+
+
+class JoseBackend(JWTBackend):
+    def decode(self, token: str) -> dict:
+        return jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+
+
+class PyJWTBackend(JWTBackend):
+    def __init__(self, secret_key: str, algorithm: str):
+        super().__init__(secret_key, algorithm)
+        import jwt as pyjwt
+        self._pyjwt = pyjwt
+
+    def decode(self, token: str) -> dict:
+        try:
+            return self._pyjwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        except self._pyjwt.PyJWTError as e:
+            raise JWTError(str(e))
+
+
+def create_backend(name: str, secret_key: str, algorithm: str) -> JWTBackend:
+    if name == "jose":
+        return JoseBackend(secret_key, algorithm)
+    if name == "pyjwt":
+        return PyJWTBackend(secret_key, algorithm)
+    raise ValueError(f"Unknown JWT_BACKEND: {name}")
+
+
+def token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+class TokenCache:
+    def __init__(self, backend: JWTBackend, max_size: int = 10000, clock=time.time):
+        self.backend = backend
+        self.max_size = max_size
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[bytes, Tuple[dict, float]]" = OrderedDict()
+
+    def decode(self, token: str) -> dict:
+        if self.max_size <= 0:
+            return self.backend.decode(token)
+        key = token_digest(token)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                claims, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    metrics.increment("jwt_cache.hits")
+                    return claims
+                del self._entries[key]
+        metrics.increment("jwt_cache.misses")
+        claims = self.backend.decode(token)
+        expires_at = claims.get("exp")
+        # Токены без exp не кэшируем: неизвестно, когда запись устареет
+        if isinstance(expires_at, (int, float)):
+            with self._lock:
+                self._entries[key] = (claims, float(expires_at))
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    metrics.increment("jwt_cache.evictions")
+        return claims
+
+    def evict(self, token: Optional[str]):
+        if token:
+            with self._lock:
+                self._entries.pop(token_digest(token), None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,94 @@
+"""Кэш данных пользователя по username с TTL.
+
+Значение загружается функцией loader(username, *args) при промахе
+(args - то, что передано в get(), например курсор текущего запроса) и живёт
+ttl секунд. Изменения в таблице users приходят через NOTIFY users_changed
+(триггер из миграций), по ним запись удаляется сразу, не дожидаясь TTL.
+После переподключения слушателя кэш очищается целиком, потому что
+уведомления за время разрыва потеряны.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from database.notify import NotifyListener
+from metrics import metrics
+
+CHANNEL = "users_changed"
+
+
+class UserCache:
+    def __init__(
+            self,
+            loader: Callable[[str], Any],
+            ttl: float = 60.0,
+            dsn: Optional[str] = None,
+            max_size: int = 10000,
+            name: str = "user_cache",
+            clock=time.monotonic
+    ):
+        self.loader = loader
+        self.ttl = ttl
+        self.max_size = max_size
+        self.name = name
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[Any, float]] = {}
+        # Растёт при каждой инвалидации: значение, загруженное до неё, не сохраняется
+        self._version = 0
+        self._hits = 0
+        self._misses = 0
+        self._listener = NotifyListener(
+            dsn, CHANNEL, self.invalidate, on_connect=lambda conn: self.clear(), name=name
+        )
+
+    def get(self, username: str, *args) -> Any:
+        now = self.clock()
+        entry = self._entries.get(username)
+        if entry is not None and entry[1] > now:
+            self._record(hit=True)
+            return entry[0]
+        self._record(hit=False)
+        version = self._version
+        value = self.loader(username, *args)
+        # Пользователя нет - не кэшируем, чтобы не держать отрицательные ответы
+        if value is not None:
+            with self._lock:
+                if version == self._version:
+                    self._entries[username] = (value, now + self.ttl)
+                    if len(self._entries) > self.max_size:
+                        self._evict_expired(now)
+        return value
+
+    def _record(self, hit: bool):
+        if hit:
+            self._hits += 1
+            metrics.increment(f"{self.name}.hits")
+        else:
+            self._misses += 1
+            metrics.increment(f"{self.name}.misses")
+        metrics.set_gauge(f"{self.name}.hit_rate", self._hits / (self._hits + self._misses))
+
+    def _evict_expired(self, now: float):
+        for key in [k for k, (_, expires_at) in self._entries.items() if expires_at <= now]:
+            del self._entries[key]
+        # Все записи свежие - сбрасываем самые старые
+        while len(self._entries) > self.max_size:
+            del self._entries[next(iter(self._entries))]
+
+    def invalidate(self, username: str):
+        with self._lock:
+            self._version += 1
+            self._entries.pop(username, None)
+        metrics.increment(f"{self.name}.invalidations")
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+    def start(self):
+        self._listener.start()
+
+    def stop(self):
+        self._listener.stop()